@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark for the class ordering of the SchemaParser. The schemas shipped
+with the tests and any additional schema files given on the command line
+(e.g. the xsd files downloaded from a server via /xapi/schemas) are extended
+with a number of synthetic plugin schemas. Every plugin schema defines chains
+of data types extending each other, listed in reverse order, which is the
+worst case for a multi-pass ordering.
+
+Example::
+
+    python benchmarks/bench_schema_parser.py --plugins 10 50 200 --types 40 xnat.xsd
+"""
+
+import argparse
+import collections
+import io
+import logging
+import os
+import time
+
+from xnat.convert_xsd import SchemaParser
+
+TEST_SCHEMA = os.path.join(os.path.dirname(__file__), '..', 'xnat', 'tests', 'xnat_test_schema.xsd')
+
+PLUGIN_SCHEMA = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema targetNamespace="http://example.com/plugin{index}" xmlns:plugin{index}="http://example.com/plugin{index}"
+           xmlns:xnat="http://nrg.wustl.edu/xnat" xmlns:xs="http://www.w3.org/2001/XMLSchema">
+{types}
+</xs:schema>
+"""
+
+PLUGIN_TYPE = """    <xs:complexType name="{name}">
+        <xs:complexContent>
+            <xs:extension base="{base}">
+                <xs:sequence>
+                    <xs:element name="{name}Value" type="xs:string" minOccurs="0"/>
+                    <xs:element name="{name}Items" minOccurs="0">
+                        <xs:complexType>
+                            <xs:sequence>
+                                <xs:element name="item" type="xs:string" minOccurs="0" maxOccurs="unbounded"/>
+                            </xs:sequence>
+                        </xs:complexType>
+                    </xs:element>
+                </xs:sequence>
+            </xs:extension>
+        </xs:complexContent>
+    </xs:complexType>"""
+
+
+def plugin_schema(index, nr_types, chain_length):
+    prefix = 'plugin{}'.format(index)
+    types = []
+    for type_index in range(nr_types):
+        if type_index % chain_length == 0:
+            base = 'xnat:experimentData'
+        else:
+            base = '{}:type{}'.format(prefix, type_index - 1)
+        types.append(PLUGIN_TYPE.format(name='type{}'.format(type_index), base=base))
+
+    return PLUGIN_SCHEMA.format(index=index, types='\n'.join(reversed(types)))
+
+
+def legacy_order(parser):
+    """
+    The multi-pass ordering used before the topological sort, kept for comparison
+    """
+    visited = set()
+    tries = 0
+    yielded_anything = True
+    while len(visited) < len(parser.class_list) and yielded_anything and tries < 25:
+        yielded_anything = False
+        for key, value in parser.class_list.items():
+            if key in visited:
+                continue
+
+            base = value.base_class
+            if base is not None and not base.startswith('xs:') and base not in visited:
+                continue
+
+            if value.parent_class is not None and value.parent_class not in visited:
+                continue
+
+            visited.add(key)
+            yielded_anything = True
+            yield value
+
+        tries += 1
+
+
+def create_parser(schema_files, nr_plugins, nr_types, chain_length):
+    logger = logging.getLogger('xnatpy_benchmark')
+    parser = SchemaParser(logger=logger)
+
+    for schema_file in schema_files:
+        parser.parse_schema_file(schema_file)
+
+    for index in range(nr_plugins):
+        parser.parse_schema_xmlstring(plugin_schema(index, nr_types, chain_length),
+                                      schema_uri='/xapi/schemas/plugin{}'.format(index))
+
+    # Key the class list by name, which is what SchemaParser.write does before ordering
+    parser.class_list = collections.OrderedDict((value.name, value) for value in parser.class_list.values())
+    return parser
+
+
+def timed(func, repeats):
+    best = None
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('schemas', nargs='*', help='additional xsd files to include')
+    arg_parser.add_argument('--plugins', type=int, nargs='+', default=[0, 10, 50, 200],
+                            help='numbers of synthetic plugin schemas to benchmark')
+    arg_parser.add_argument('--types', type=int, default=30, help='number of types per plugin schema')
+    arg_parser.add_argument('--chain', type=int, default=30, help='length of the chains of extending types')
+    arg_parser.add_argument('--repeats', type=int, default=5, help='number of repeats (best time is reported)')
+    arg_parser.add_argument('--write', action='store_true', help='also time generating the code')
+    args = arg_parser.parse_args()
+
+    schema_files = [TEST_SCHEMA] + args.schemas
+
+    print('{:>8} {:>8} {:>12} {:>8} {:>12} {:>8} {:>10}'.format(
+        'plugins', 'classes', 'topo (ms)', 'ordered', 'legacy (ms)', 'ordered', 'write (ms)'
+    ))
+
+    for nr_plugins in args.plugins:
+        parser = create_parser(schema_files, nr_plugins, args.types, args.chain)
+
+        topo_time, topo_result = timed(lambda: list(parser), args.repeats)
+        legacy_time, legacy_result = timed(lambda: list(legacy_order(parser)), args.repeats)
+
+        if args.write:
+            write_time, _ = timed(lambda: create_parser(schema_files, nr_plugins, args.types,
+                                                        args.chain).write(io.StringIO()), 1)
+            write_time = '{:10.1f}'.format(write_time * 1000)
+        else:
+            write_time = '{:>10}'.format('-')
+
+        print('{:8d} {:8d} {:12.2f} {:8d} {:12.2f} {:8d} {}'.format(
+            nr_plugins, len(parser.class_list),
+            topo_time * 1000, len(topo_result),
+            legacy_time * 1000, len(legacy_result),
+            write_time,
+        ))
+
+
+if __name__ == '__main__':
+    main()
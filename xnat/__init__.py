@@ -22,6 +22,7 @@ xnatbase modules, using the convert_xsd.
 
 import getpass
 import hashlib
+import io
 import importlib.machinery
 import importlib.util
 import logging
@@ -31,16 +32,21 @@ import netrc
 import re
 import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+import requests.adapters
 import requests.cookies
 import urllib3
 from urllib import parse
 
 from . import exceptions, search
 from .session import XNATSession, BaseXNATSession
-from .constants import DEFAULT_SCHEMAS
+from .constants import DEFAULT_SCHEMAS, SCHEMA_RETRIEVAL_WORKERS, POOL_CONNECTIONS, POOL_MAXSIZE, POOL_BLOCK, \
+    OBJECT_CACHE_SIZE
 from .convert_xsd import SchemaParser
+from .core import LazyClassLookup
+from .model_cache import ModelCache
 from .utils import JSessionAuth
 
 GEN_MODULES = {}
@@ -155,24 +161,18 @@ def check_auth(requests_session, server, user, jsession, logger):
         return username
 
 
-def parse_schemas_16(parser, xnat_session, extension_types=True):
+def list_schemas_16(xnat_session, extension_types=True):
     """
-    Retrieve and parse schemas for an XNAT version 1.6.x
+    Determine the uris of the schemas to use for an XNAT version 1.6.x
 
-    :param parser: The parser to use for the parsing
     :param xnat_session: the requests session used for the communication
     :param bool extension_types: flag to enabled/disable scanning for extension types
+    :return: list of schema uris, the main xnat.xsd is always the first entry
     """
-    # Retrieve schema from XNAT server
     schema_uri = '/schemas/xnat/xnat.xsd'
+    schema_uris = [schema_uri]
 
-    success = parser.parse_schema_uri(xnat_session=xnat_session,
-                                      schema_uri=schema_uri)
-
-    if not success:
-        raise RuntimeError('Could not parse the xnat.xsd! See error log for details!')
-
-    # Parse extension types
+    # Find extension types
     if extension_types:
         projects_uri = '/data/projects?format=json'
         try:
@@ -195,24 +195,23 @@ def parse_schemas_16(parser, xnat_session, extension_types=True):
             xnat_session.logger.critical(message)
             raise exception
 
-        schemas = parser.find_schema_uris(response.text)
+        schemas = SchemaParser.find_schema_uris(response.text)
         if schema_uri in schemas:
             xnat_session.logger.debug('Removing schema {} from list'.format(schema_uri))
             schemas.remove(schema_uri)
         xnat_session.logger.info('Found additional schemas: {}'.format(schemas))
+        schema_uris.extend(schemas)
 
-        for schema in schemas:
-            parser.parse_schema_uri(xnat_session=xnat_session,
-                                    schema_uri=schema)
+    return schema_uris
 
 
-def parse_schemas_17(parser, xnat_session, extension_types=True):
+def list_schemas_17(xnat_session, extension_types=True):
     """
-    Retrieve and parse schemas for an XNAT version 1.7.x
+    Determine the uris of the schemas to use for an XNAT version 1.7.x
 
-    :param parser: The parser to use for the parsing
     :param xnat_session: the requests session used for the communication
     :param bool extension_types: flag to enabled/disable scanning for extension types
+    :return: list of schema uris
     """
     if extension_types:
         schemas_uri = '/xapi/schemas'
@@ -225,10 +224,71 @@ def parse_schemas_17(parser, xnat_session, extension_types=True):
     else:
         schema_list = DEFAULT_SCHEMAS
 
-    for schema in schema_list:
-        if extension_types or schema in ['xdat', 'xnat']:
-            parser.parse_schema_uri(xnat_session=xnat_session,
-                                    schema_uri='/xapi/schemas/{schema}'.format(schema=schema))
+    return ['/xapi/schemas/{schema}'.format(schema=schema) for schema in schema_list
+            if extension_types or schema in ['xdat', 'xnat']]
+
+
+def parse_schemas_16(parser, xnat_session, extension_types=True):
+    """
+    Retrieve and parse schemas for an XNAT version 1.6.x
+
+    :param parser: The parser to use for the parsing
+    :param xnat_session: the requests session used for the communication
+    :param bool extension_types: flag to enabled/disable scanning for extension types
+    """
+    schema_uris = list_schemas_16(xnat_session, extension_types=extension_types)
+
+    # Retrieve schema from XNAT server
+    success = parser.parse_schema_uri(xnat_session=xnat_session,
+                                      schema_uri=schema_uris[0])
+
+    if not success:
+        raise RuntimeError('Could not parse the xnat.xsd! See error log for details!')
+
+    # Parse extension types
+    for schema in schema_uris[1:]:
+        parser.parse_schema_uri(xnat_session=xnat_session,
+                                schema_uri=schema)
+
+
+def parse_schemas_17(parser, xnat_session, extension_types=True, max_workers=SCHEMA_RETRIEVAL_WORKERS):
+    """
+    Retrieve and parse schemas for an XNAT version 1.7.x. The schemas are
+    retrieved concurrently, but parsed in the order the server lists them
+    so the resulting model is deterministic.
+
+    :param parser: The parser to use for the parsing
+    :param xnat_session: the requests session used for the communication
+    :param bool extension_types: flag to enabled/disable scanning for extension types
+    :param int max_workers: maximum number of schemas to retrieve simultaneously
+    """
+    schema_uris = list_schemas_17(xnat_session, extension_types=extension_types)
+
+    for schema_uri, data in retrieve_schemas(parser, xnat_session, schema_uris, max_workers=max_workers):
+        parser.parse_schema_data(data, schema_uri=schema_uri)
+
+
+def retrieve_schemas(parser, xnat_session, schema_uris, max_workers=SCHEMA_RETRIEVAL_WORKERS):
+    """
+    Retrieve the text of the schemas from the server. The requests are
+    performed concurrently using a bounded thread pool.
+
+    :param parser: The parser to use for the retrieval
+    :param xnat_session: the requests session used for the communication
+    :param list schema_uris: the uris of the schemas to retrieve
+    :param int max_workers: maximum number of schemas to retrieve simultaneously
+    :return: list of (uri, text) tuples in the order of schema_uris
+    """
+    def retrieve(schema_uri):
+        return parser.retrieve_schema(xnat_session=xnat_session, schema_uri=schema_uri)
+
+    if max_workers is None or max_workers <= 1 or len(schema_uris) <= 1:
+        return [(schema_uri, retrieve(schema_uri)) for schema_uri in schema_uris]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(schema_uris)),
+                            thread_name_prefix='XNATpySchemaRetrieval') as executor:
+        # Executor.map yields the results in the order of the input
+        return list(zip(schema_uris, executor.map(retrieve, schema_uris)))
 
 
 def detect_redirection(response, server, logger):
@@ -326,9 +386,15 @@ def _wipe_jsession(requests_session, server):
     requests_session.close()
 
 
-def build_model(xnat_session, extension_types, connection_id):
+def build_model(xnat_session, extension_types, connection_id, model_cache=None, lazy=False):
     """
     Build the XNAT data model for a given connection
+
+    :param xnat_session: the session to build the model for
+    :param bool extension_types: flag to enabled/disable scanning for extension types
+    :param str connection_id: the id of the connection used to name the module
+    :param ModelCache model_cache: cache for storing/retrieving the generated model, None to disable
+    :param bool lazy: only create the classes of the model when they are first used
     """
     logger = xnat_session.logger
     debug = xnat_session.debug
@@ -340,58 +406,117 @@ def build_model(xnat_session, extension_types, connection_id):
     # Generate module
     parser = SchemaParser(debug=debug, logger=logger)
 
+    # The first schema of an 1.6 server is the xnat.xsd which is required
+    required_schemas = 0
     if xnat_session.xnat_version.startswith('1.6'):
         logger.info('Found an 1.6 version ({})'.format(version))
-        build_function = parse_schemas_16
+        list_function = list_schemas_16
+        required_schemas = 1
     elif version.startswith('1.7'):
         logger.info('Found an 1.7 version ({})'.format(version))
-        build_function = parse_schemas_17
+        list_function = list_schemas_17
     elif version.startswith('1.8'):
         # Can use the same builder as 1.7 for now
         logger.info('Found an 1.8 version ({})'.format(version))
-        build_function = parse_schemas_17
+        list_function = list_schemas_17
     elif version.startswith('ML-BETA'):
         # Can use the same builder as 1.7 for now
         logger.info('Found an ML beta version ({})'.format(version))
-        build_function = parse_schemas_17
+        list_function = list_schemas_17
     else:
         logger.warning('Found an unsupported version ({}), trying 1.7 compatible model builder'.format(version))
-        build_function = parse_schemas_17
-
-    logger.info('Start parsing schemas and building object model')
-    build_function(parser, xnat_session, extension_types=extension_types)
-
-    # Write code to temp file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='_generated_xnat.py', delete=False) as code_file:
-        parser.write(code_file=code_file)
+        list_function = list_schemas_17
+
+    logger.info('Retrieving schemas')
+    schema_uris = list_function(xnat_session, extension_types=extension_types)
+    schemas = retrieve_schemas(parser, xnat_session, schema_uris)
+
+    cached_model = None
+    if model_cache is not None:
+        cache_key = model_cache.compute_key(server=xnat_session._original_uri,
+                                            xnat_version=version,
+                                            xnatpy_version=__version__,
+                                            schemas=schemas,
+                                            extension_types=extension_types,
+                                            lazy=lazy)
+        cached_model = model_cache.load(cache_key)
+
+    if cached_model is None:
+        logger.info('Start parsing schemas and building object model')
+        for index, (schema_uri, data) in enumerate(schemas):
+            success = parser.parse_schema_data(data, schema_uri=schema_uri)
+
+            if not success and index < required_schemas:
+                raise RuntimeError('Could not parse the {}! See error log for details!'.format(schema_uri))
+
+        code = io.StringIO()
+        parser.write(code_file=code, lazy=lazy)
+        code = code.getvalue()
+
+        # Determine the classes to register for all types parsed
+        class_names = [cls.writer.python_name for cls in parser.class_list.values()
+                       if not (cls.name is None or (cls.base_class is not None and cls.base_class.startswith('xs:')))]
+
+        if model_cache is not None:
+            cached_model = model_cache.store(cache_key,
+                                             code=code,
+                                             classes=class_names,
+                                             metadata={'server': xnat_session._original_uri,
+                                                       'xnat_version': version,
+                                                       'xnatpy_version': __version__,
+                                                       'schemas': schema_uris})
+
+    if cached_model is not None:
+        # The cached code file is shared and should not be removed on disconnect
+        code_file_name = cached_model.code_file
+        class_names = cached_model.classes
+        temporary_code_file = None
+    else:
+        # Write code to temp file
+        with tempfile.NamedTemporaryFile(mode='w', suffix='_generated_xnat.py', delete=False) as code_file:
+            code_file.write(code)
+        code_file_name = temporary_code_file = code_file.name
 
-    logger.debug('Code file written to: {}'.format(code_file.name))
+    logger.debug('Code file written to: {}'.format(code_file_name))
 
     # The module is loaded in its private namespace based on the code_file name
     module_name = 'xnat.generated.model_{}'.format(connection_id)
-    loader = importlib.machinery.SourceFileLoader(module_name, code_file.name)
+    loader = importlib.machinery.SourceFileLoader(module_name, code_file_name)
     spec = importlib.util.spec_from_loader(module_name, loader)
     xnat_module = importlib.util.module_from_spec(spec)
     loader.exec_module(xnat_module)
-    xnat_module._SOURCE_CODE_FILE = code_file.name
+    xnat_module._SOURCE_CODE_FILE = code_file_name
 
     logger.debug('Loaded generated module')
 
-    # Register all types parsed
-    for key, cls in parser.class_list.items():
-        if not (cls.name is None or (cls.base_class is not None and cls.base_class.startswith('xs:'))):
-            cls_obj = getattr(xnat_module, cls.writer.python_name, None)
+    if lazy:
+        # Classes are created on first use, the lookup replaces the one in the module
+        class_lookup = LazyClassLookup(namespace=vars(xnat_module),
+                                       sources=xnat_module._CLASS_SOURCES,
+                                       initial=xnat_module.XNAT_CLASS_LOOKUP,
+                                       registered=class_names,
+                                       filename=code_file_name)
+        xnat_module.XNAT_CLASS_LOOKUP = class_lookup
+        xnat_module.__getattr__ = class_lookup.module_getattr
+        xnat_module.__dir__ = class_lookup.module_dir
+    else:
+        # Register all types parsed
+        for class_name in class_names:
+            cls_obj = getattr(xnat_module, class_name, None)
             if cls_obj is not None:
                 cls_obj.__register__(xnat_module.XNAT_CLASS_LOOKUP)
             else:
-                logger.warning("Cannot find class to register for {}".format(cls.name))
+                logger.warning("Cannot find class to register for {}".format(class_name))
 
     xnat_module.SESSION = xnat_session
 
     # Add the required information from the module into the xnat_session object
-    xnat_session.XNAT_CLASS_LOOKUP.update(xnat_module.XNAT_CLASS_LOOKUP)
+    if lazy:
+        xnat_session.XNAT_CLASS_LOOKUP = xnat_module.XNAT_CLASS_LOOKUP
+    else:
+        xnat_session.XNAT_CLASS_LOOKUP.update(xnat_module.XNAT_CLASS_LOOKUP)
     xnat_session.classes = xnat_module
-    xnat_session._source_code_file = code_file.name
+    xnat_session._source_code_file = temporary_code_file
     search.inject_search_fields(xnat_session)
     logger.info('Object model created successfully')
 
@@ -399,7 +524,9 @@ def build_model(xnat_session, extension_types, connection_id):
 def connect(server=None, user=None, password=None, verify=True, netrc_file=None, debug=False,
             extension_types=True, loglevel=None, logger=None, detect_redirect=True,
             no_parse_model=False, default_timeout=300, auth_provider=None, jsession=None,
-            cli=False):
+            cli=False, model_cache=None, lazy_model=False, object_cache='unbounded',
+            object_cache_size=OBJECT_CACHE_SIZE, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+            pool_block=POOL_BLOCK, retry_policy=None):
     """
     Connect to a server and generate the correct classed based on the servers xnat.xsd
     This function returns an object that can be used as a context operator. It will call
@@ -434,6 +561,30 @@ def connect(server=None, user=None, password=None, verify=True, netrc_file=None,
     :param int default_timeout: The default timeout of requests sent by xnatpy, is a 5 minutes
                                 per default.
     :param str auth_provider: Set the auth provider to use to log in to XNAT.
+    :param model_cache: Cache the generated data model on disk and re-use it for later connections
+                        to the same server, as long as the server version and schemas are unchanged.
+                        Can be True to use the default location (``~/.cache/xnatpy/models``), a
+                        path of the directory to use or False to disable the cache. The default (None)
+                        uses the value of the ``XNATPY_MODEL_CACHE`` environment variable and
+                        disables the cache if that is not set.
+    :param bool lazy_model: Only create the classes of the data model the first time they are needed,
+                            this reduces the connect time and memory use if only a few of the data
+                            types of the server are used.
+    :param str object_cache: Policy of the cache of created objects: ``unbounded`` keeps all objects until
+                             the cache is cleared, ``lru`` keeps the ``object_cache_size`` most recently
+                             used objects and ``weak`` only keeps objects that are still in use. The
+                             latter two keep memory use bounded for long-running processes.
+    :param int object_cache_size: Maximum number of objects to cache when using the ``lru`` policy
+    :param int pool_connections: Number of connection pools (one per host) to keep
+    :param int pool_maxsize: Maximum number of connections to keep open per host, this should be at least
+                             the number of threads used to communicate with the server concurrently, so
+                             that every thread can re-use a kept-alive connection
+    :param bool pool_block: Block when all connections to a host are in use, instead of opening an extra
+                            connection that is discarded after the request
+    :param retry_policy: Policy for retrying requests that fail with a transient error (connection errors,
+                         timeouts and 429, 502, 503 and 504 responses) with exponential backoff. Can be an
+                         :py:class:`xnat.retry.RetryPolicy`, the maximum number of retries, or False to
+                         disable retrying. The default (None) retries idempotent requests up to 3 times.
     :return: XNAT session object
     :rtype: XNATSession
 
@@ -516,6 +667,13 @@ def connect(server=None, user=None, password=None, verify=True, netrc_file=None,
 
     requests_session.headers.update({'User-Agent': user_agent})
 
+    # Configure the connection pool so concurrent requests re-use kept-alive connections
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections,
+                                            pool_maxsize=pool_maxsize,
+                                            pool_block=pool_block)
+    requests_session.mount('https://', adapter)
+    requests_session.mount('http://', adapter)
+
     if not verify:
         requests_session.verify = False
 
@@ -607,11 +765,17 @@ def connect(server=None, user=None, password=None, verify=True, netrc_file=None,
         xnat_session = SessionType(server=server, logger=logger,
                                    interface=requests_session, debug=debug,
                                    original_uri=original_uri, logged_in_user=logged_in_user,
-                                   default_timeout=default_timeout, jsession=jsession_token)
+                                   default_timeout=default_timeout, jsession=jsession_token,
+                                   object_cache=object_cache, object_cache_size=object_cache_size,
+                                   retry_policy=retry_policy)
 
         # Parse data model and create classes
         if not no_parse_model:
-            build_model(xnat_session, extension_types=extension_types, connection_id=connection_id)
+            build_model(xnat_session,
+                        extension_types=extension_types,
+                        connection_id=connection_id,
+                        model_cache=ModelCache.from_parameter(model_cache, logger=logger),
+                        lazy=lazy_model)
 
         return xnat_session
     except:
@@ -0,0 +1,984 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Asyncio interface to XNAT. The :py:func:`connect` coroutine logs in and
+builds the data model using the normal :py:func:`xnat.connect` and wraps the
+resulting session in an :py:class:`AsyncXNATSession`. The async session
+sends its requests using a small HTTP/1.1 client built on asyncio streams,
+so a single event loop can keep many requests in flight without threads.
+
+Example::
+
+    >>> import asyncio
+    >>> import xnat.aio
+    >>> async def main():
+    ...     async with await xnat.aio.connect('https://xnat.example.com') as session:
+    ...         async for experiment in session.experiments:
+    ...             print(experiment.label)
+    >>> asyncio.run(main())
+"""
+
+import asyncio
+import base64
+import functools
+import io
+import json
+import os
+import ssl
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Container, Dict, Optional, Tuple, Union
+from urllib import parse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import select_proxy
+
+from . import exceptions
+from .constants import LISTING_PAGE_SIZE, POOL_MAXSIZE
+from .core import XNATListing
+from .session import BaseXNATSession
+from .type_hints import JSONType
+
+# Size of the blocks used to send request bodies and read response bodies
+BLOCK_SIZE = 65536
+
+# Maximum number of redirects followed for a request, the same as requests
+MAX_REDIRECTS = 30
+REDIRECT_STATUS = (301, 302, 303, 307, 308)
+
+ConnectionKey = Tuple[str, str, int]
+
+
+class AsyncHTTPConnection(object):
+    """
+    A single HTTP/1.1 connection to a server
+    """
+    def __init__(self, key: ConnectionKey, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    def close(self):
+        self.writer.close()
+
+
+def create_ssl_context(verify: Union[bool, str] = True,
+                       cert: Union[None, str, Tuple[str, str]] = None) -> ssl.SSLContext:
+    """
+    Create the SSL context for https connections from the ``verify`` and
+    ``cert`` settings in the same form as used by requests
+
+    :param verify: verify the certificates, or the path of a CA bundle file or
+                   directory to verify the certificates with
+    :param cert: the client certificate, either the path of a file containing
+                 the certificate and key or a tuple of the certificate and key paths
+    :return: the SSL context
+    """
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif isinstance(verify, (str, Path)) and os.path.isdir(verify):
+        context = ssl.create_default_context(capath=str(verify))
+    elif isinstance(verify, (str, Path)):
+        context = ssl.create_default_context(cafile=str(verify))
+    else:
+        context = ssl.create_default_context()
+
+    if isinstance(cert, (tuple, list)):
+        context.load_cert_chain(*cert)
+    elif cert is not None:
+        context.load_cert_chain(cert)
+
+    return context
+
+
+class AsyncConnectionPool(object):
+    """
+    Pool of kept-alive connections, with a limit on the number of connections
+    in use per host. If all connections of a host are in use, a new request
+    waits until a connection is released.
+
+    :param int max_connections: the maximum number of connections per host
+    :param verify: verify the certificates of https connections, or the path
+                   of a CA bundle to verify them with
+    :param cert: the client certificate, see :py:func:`create_ssl_context`
+    """
+    def __init__(self,
+                 max_connections: int = POOL_MAXSIZE,
+                 verify: Union[bool, str] = True,
+                 cert: Union[None, str, Tuple[str, str]] = None):
+        self.max_connections = max_connections
+        self._idle = {}
+        self._limits = {}
+        self._in_use = {}
+        self._ssl_context = create_ssl_context(verify, cert)
+
+    def _limit(self, key: ConnectionKey) -> asyncio.Semaphore:
+        if key not in self._limits:
+            self._limits[key] = asyncio.Semaphore(self.max_connections)
+        return self._limits[key]
+
+    async def acquire(self, key: ConnectionKey, timeout: Optional[float] = None) -> AsyncHTTPConnection:
+        """
+        Get a connection to a host, re-using an idle connection if available
+
+        :param key: tuple of the scheme, host and port
+        :param timeout: timeout in seconds for opening a new connection
+        :return: the connection
+        """
+        await self._limit(key).acquire()
+        self._in_use[key] = self._in_use.get(key, 0) + 1
+
+        try:
+            idle = self._idle.get(key)
+            while idle:
+                connection = idle.pop()
+                if not connection.reader.at_eof() and not connection.writer.is_closing():
+                    connection.reused = True
+                    return connection
+                connection.close()
+
+            scheme, host, port = key
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=self._ssl_context if scheme == 'https' else None),
+                timeout=timeout
+            )
+            return AsyncHTTPConnection(key, reader, writer)
+        except BaseException:
+            self._in_use[key] -= 1
+            self._limit(key).release()
+            raise
+
+    def release(self, connection: AsyncHTTPConnection, reuse: bool):
+        """
+        Return a connection to the pool
+
+        :param connection: the connection to release
+        :param reuse: keep the connection alive for re-use, otherwise it is closed
+        """
+        if reuse:
+            self._idle.setdefault(connection.key, []).append(connection)
+        else:
+            connection.close()
+        self._in_use[connection.key] -= 1
+        self._limit(connection.key).release()
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Number of connections in use and idle connections per host
+        """
+        return {'{}://{}:{}'.format(*key): {'maxsize': self.max_connections,
+                                            'in_use': in_use,
+                                            'idle': len(self._idle.get(key, []))}
+                for key, in_use in self._in_use.items()}
+
+    def close(self):
+        for connections in self._idle.values():
+            for connection in connections:
+                connection.close()
+        self._idle.clear()
+
+
+class AsyncHTTPResponse(object):
+    """
+    Response of the async HTTP client, the body is read on demand. The
+    connection is returned to the pool once the body is read completely or
+    the response is closed. Every read of the body waits at most ``timeout``
+    seconds for data.
+    """
+    def __init__(self,
+                 pool: AsyncConnectionPool,
+                 connection: AsyncHTTPConnection,
+                 url: str,
+                 method: str,
+                 status_code: int,
+                 reason: str,
+                 headers: CaseInsensitiveDict,
+                 timeout: Optional[float] = None):
+        self.url = url
+        self.method = method
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.timeout = timeout
+        self._pool = pool
+        self._connection = connection
+        self._content = None
+
+        if method == 'HEAD' or status_code in (204, 304) or 100 <= status_code < 200:
+            self._remaining = 0
+            self._chunked = False
+        elif 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            self._remaining = None
+            self._chunked = True
+        elif 'Content-Length' in headers:
+            self._remaining = int(headers['Content-Length'])
+            self._chunked = False
+        else:
+            # Body is delimited by the server closing the connection
+            self._remaining = -1
+            self._chunked = False
+
+        self._keep_alive = self._remaining != -1 and headers.get('Connection', '').lower() != 'close'
+
+        if self._remaining == 0:
+            self._finish()
+
+    def __repr__(self):
+        return '<AsyncHTTPResponse [{}]>'.format(self.status_code)
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def _finish(self):
+        if self._connection is not None:
+            self._pool.release(self._connection, reuse=self._keep_alive)
+            self._connection = None
+
+    def close(self):
+        """
+        Close the response without reading the rest of the body
+        """
+        if self._connection is not None:
+            self._keep_alive = False
+            self._finish()
+
+    async def discard(self):
+        """
+        Discard the response, small bodies are read so the connection can be re-used
+        """
+        if self._remaining is not None and 0 <= self._remaining <= BLOCK_SIZE:
+            await self.read()
+        else:
+            self.close()
+
+    async def iter_content(self, chunk_size: int = BLOCK_SIZE):
+        """
+        Iterate over the body in chunks
+
+        :param chunk_size: the maximum size of the chunks
+        :raises asyncio.TimeoutError: if the server sends no data within the timeout
+        """
+        if self._content is not None:
+            for offset in range(0, len(self._content), chunk_size):
+                yield self._content[offset:offset + chunk_size]
+            return
+
+        reader = self._connection.reader if self._connection is not None else None
+
+        def timed(coroutine):
+            return asyncio.wait_for(coroutine, timeout=self.timeout)
+
+        try:
+            if self._chunked:
+                while True:
+                    size_line = await timed(reader.readline())
+                    size = int(size_line.split(b';', 1)[0].strip() or b'0', 16)
+                    if size == 0:
+                        # Skip the trailers
+                        while (await timed(reader.readline())).strip():
+                            pass
+                        break
+
+                    remaining = size
+                    while remaining > 0:
+                        data = await timed(reader.read(min(chunk_size, remaining)))
+                        if not data:
+                            raise exceptions.XNATIOError('Connection closed while reading response from {}'.format(self.url))
+                        remaining -= len(data)
+                        yield data
+                    await timed(reader.readexactly(2))
+            elif self._remaining is not None and self._remaining > 0:
+                while self._remaining > 0:
+                    data = await timed(reader.read(min(chunk_size, self._remaining)))
+                    if not data:
+                        raise exceptions.XNATIOError('Connection closed while reading response from {}'.format(self.url))
+                    self._remaining -= len(data)
+                    yield data
+            elif self._remaining == -1:
+                while True:
+                    data = await timed(reader.read(chunk_size))
+                    if not data:
+                        break
+                    yield data
+        except BaseException:
+            self.close()
+            raise
+
+        self._finish()
+
+    async def read(self) -> bytes:
+        """
+        Read the complete body
+        """
+        if self._content is None:
+            self._content = b''.join([x async for x in self.iter_content()])
+        return self._content
+
+    async def text(self) -> str:
+        content = await self.read()
+        encoding = 'utf-8'
+        for part in self.headers.get('Content-Type', '').split(';')[1:]:
+            name, _, value = part.strip().partition('=')
+            if name.lower() == 'charset' and value:
+                encoding = value.strip('"')
+        return content.decode(encoding, errors='replace')
+
+    async def json(self) -> JSONType:
+        return json.loads(await self.text())
+
+
+class AsyncHTTPClient(object):
+    """
+    Minimal HTTP/1.1 client on top of asyncio streams, supporting kept-alive
+    connections, chunked transfer encoding, redirects and streaming request
+    and response bodies. Proxies are not supported.
+
+    :param pool: the connection pool to use
+    :param headers: headers to send with every request
+    :param origin: the host (and port) the default headers are sent to, the
+                   Authorization header is not sent to other hosts
+    """
+    def __init__(self, pool: AsyncConnectionPool, headers: Optional[Dict[str, str]] = None,
+                 origin: Optional[str] = None):
+        self.pool = pool
+        self.headers = dict(headers or {})
+        self.origin = origin
+
+    async def request(self,
+                      method: str,
+                      url: str,
+                      data: Union[None, bytes, str, BinaryIO] = None,
+                      headers: Optional[Dict[str, str]] = None,
+                      timeout: Optional[float] = None) -> AsyncHTTPResponse:
+        """
+        Send a request and wait for the response headers, redirects are
+        followed in the same way as requests does
+
+        :param method: the HTTP method
+        :param url: the full url
+        :param data: the body as bytes, str or binary file-like object
+        :param headers: additional headers
+        :param timeout: timeout in seconds for connecting, waiting for the response
+                        headers and every read of the response body
+        :return: the response, of which the body still needs to be read
+        """
+        headers = dict(headers or {})
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await self._send(method, url, data=data, headers=headers, timeout=timeout)
+            location = response.headers.get('Location')
+            if response.status_code not in REDIRECT_STATUS or not location:
+                return response
+
+            await response.discard()
+            redirect_url = parse.urljoin(url, location)
+
+            if (response.status_code == 303 and method != 'HEAD') or (response.status_code in (301, 302) and method == 'POST'):
+                method = 'GET'
+                data = None
+                headers = {k: v for k, v in headers.items() if k.lower() not in ('content-type', 'content-length')}
+            elif data is not None and not isinstance(data, (bytes, str)):
+                raise exceptions.XNATIOError('Cannot follow redirect of {} to {}, the request body is a stream'
+                                             ' that can only be sent once'.format(url, redirect_url))
+
+            if parse.urlsplit(redirect_url).netloc != parse.urlsplit(url).netloc:
+                # Do not send the credentials to another host
+                headers = {k: v for k, v in headers.items() if k.lower() not in ('authorization', 'cookie')}
+
+            url = redirect_url
+
+        raise exceptions.XNATConnectionError('Exceeded {} redirects for {}'.format(MAX_REDIRECTS, url))
+
+    async def _send(self,
+                    method: str,
+                    url: str,
+                    data: Union[None, bytes, str, BinaryIO],
+                    headers: Dict[str, str],
+                    timeout: Optional[float]) -> AsyncHTTPResponse:
+        parsed = parse.urlsplit(url)
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        key = (parsed.scheme, parsed.hostname, port)
+        target = parsed.path or '/'
+        if parsed.query:
+            target += '?' + parsed.query
+
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        request_headers = CaseInsensitiveDict(self.headers)
+        if parsed.netloc != self.origin:
+            # Do not send the credentials to another host
+            request_headers.pop('Authorization', None)
+        request_headers.update(headers)
+        request_headers['Host'] = parsed.netloc
+        request_headers.setdefault('Accept-Encoding', 'identity')
+
+        if data is None:
+            if method in ('POST', 'PUT', 'PATCH'):
+                request_headers['Content-Length'] = '0'
+        elif isinstance(data, bytes):
+            request_headers['Content-Length'] = str(len(data))
+        else:
+            size = stream_size(data)
+            if size is not None:
+                request_headers['Content-Length'] = str(size)
+            else:
+                request_headers['Transfer-Encoding'] = 'chunked'
+
+        head = '{} {} HTTP/1.1\r\n'.format(method, target)
+        head += ''.join('{}: {}\r\n'.format(name, value) for name, value in request_headers.items())
+        head = (head + '\r\n').encode('latin-1')
+
+        while True:
+            connection = await self.pool.acquire(key, timeout=timeout)
+            try:
+                connection.writer.write(head)
+                await self._send_body(connection.writer, data, chunked='Transfer-Encoding' in request_headers)
+                status_code, reason, response_headers = await asyncio.wait_for(
+                    self._read_head(connection.reader), timeout=timeout
+                )
+            except (ConnectionError, asyncio.IncompleteReadError) as exception:
+                self.pool.release(connection, reuse=False)
+                # A kept-alive connection might have been closed by the server in the mean time
+                if connection.reused and (data is None or isinstance(data, bytes)):
+                    continue
+                raise exceptions.XNATConnectionError('Could not send request to {}: {}'.format(url, exception))
+            except BaseException:
+                self.pool.release(connection, reuse=False)
+                raise
+
+            return AsyncHTTPResponse(self.pool, connection, url, method, status_code, reason, response_headers,
+                                     timeout=timeout)
+
+    @staticmethod
+    async def _send_body(writer: asyncio.StreamWriter, data, chunked: bool):
+        if data is None:
+            pass
+        elif isinstance(data, bytes):
+            writer.write(data)
+        else:
+            loop = asyncio.get_running_loop()
+            while True:
+                # Reading the file can block, so do it in an executor
+                block = await loop.run_in_executor(None, data.read, BLOCK_SIZE)
+                if isinstance(block, str):
+                    block = block.encode('utf-8')
+                if not block:
+                    break
+
+                if chunked:
+                    writer.write('{:x}\r\n'.format(len(block)).encode('ascii') + block + b'\r\n')
+                else:
+                    writer.write(block)
+                await writer.drain()
+
+            if chunked:
+                writer.write(b'0\r\n\r\n')
+
+        await writer.drain()
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader):
+        while True:
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError('Connection closed before receiving a response')
+
+            parts = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+            if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+                raise exceptions.XNATResponseError('Invalid status line in response: {!r}'.format(status_line))
+
+            status_code = int(parts[1])
+            reason = parts[2] if len(parts) > 2 else ''
+
+            headers = CaseInsensitiveDict()
+            while True:
+                line = await reader.readline()
+                line = line.decode('latin-1').rstrip('\r\n')
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip()] = value.strip()
+
+            # Skip informational responses (e.g. 100 Continue)
+            if status_code >= 200 or status_code == 101:
+                return status_code, reason, headers
+
+
+def stream_size(stream) -> Optional[int]:
+    """
+    Determine the number of bytes left in a seekable stream
+
+    :param stream: the file-like object
+    :return: the remaining size or None if it cannot be determined
+    """
+    try:
+        position = stream.tell()
+        size = stream.seek(0, io.SEEK_END)
+        stream.seek(position)
+    except (AttributeError, OSError, ValueError):
+        return None
+
+    if isinstance(stream, io.TextIOBase):
+        return None
+
+    return size - position
+
+
+class AsyncXNATListing(object):
+    """
+    Async iterable view of an :py:class:`XNATListing <xnat.core.XNATListing>`,
+    the rows are retrieved using the async session and the objects are
+    created using the data model of the session.
+
+    :param listing: the listing to wrap
+    :param session: the async session to use for retrieving the rows
+    :param page_size: retrieve the listing in pages of this size, None retrieves
+                      the listing in a single request
+    """
+    def __init__(self, listing: XNATListing, session: 'AsyncXNATSession', page_size: Optional[int] = None):
+        self.listing = listing
+        self.session = session
+        self.page_size = page_size
+
+    def __repr__(self):
+        return '<AsyncXNATListing {}>'.format(self.listing.uri)
+
+    def filter(self, filters=None, **kwargs) -> 'AsyncXNATListing':
+        return AsyncXNATListing(self.listing.filter(filters, **kwargs), self.session, page_size=self.page_size)
+
+    async def _rows(self, query):
+        result = await self.session.get_json(self.listing.uri, query=query)
+        return self.listing._process_result(result)
+
+    async def __aiter__(self):
+        async for page in self._pages(self.listing._listing_query()):
+            for row in page:
+                row = self.listing._compact_row(row)
+                if row is not None:
+                    yield self.listing._create_row_object(row)
+
+    async def _pages(self, query):
+        if self.page_size is None:
+            yield self.listing._filter_rows(await self._rows(query))
+            return
+
+        # See XNATListing.paginate for the detection of servers that ignore paging
+        query['sortBy'] = 'ID'
+        query['limit'] = self.page_size
+        offset = 0
+        first_id = None
+        while True:
+            query['offset'] = offset
+            rows = await self._rows(query)
+
+            if offset > 0 and rows and rows[0]['ID'] == first_id:
+                return
+
+            if offset == 0 and rows:
+                first_id = rows[0]['ID']
+
+            yield self.listing._filter_rows(rows)
+
+            if len(rows) != self.page_size:
+                return
+
+            offset += self.page_size
+
+    async def to_list(self) -> list:
+        """
+        Retrieve all objects in the listing
+        """
+        return [x async for x in self]
+
+
+class AsyncXNATSession(object):
+    """
+    Asyncio counterpart of :py:class:`BaseXNATSession <xnat.session.BaseXNATSession>`.
+    It uses the credentials, settings and data model of an existing session,
+    but sends the requests using an asyncio HTTP client.
+
+    .. note:: Objects created via the async session (e.g. from listings) are
+              regular xnatpy objects, accessing their properties still uses
+              the blocking session.
+
+    The certificate verification (including ``REQUESTS_CA_BUNDLE``) and client
+    certificate of the wrapped session are used. Proxies are not supported.
+
+    :param session: the session to wrap
+    :param max_connections: maximum number of concurrent connections to the server
+    :param close_session: disconnect the wrapped session when closing the async session
+    :raises XNATValueError: if a proxy is configured for the server
+    """
+    def __init__(self, session: BaseXNATSession, max_connections: int = POOL_MAXSIZE, close_session: bool = False):
+        self.session = session
+        self.logger = session.logger
+        self._close_session = close_session
+
+        interface = session.interface
+        headers = {name: value for name, value in interface.headers.items()
+                   if name.lower() not in ('accept-encoding', 'connection')}
+        if isinstance(interface.auth, tuple):
+            credentials = '{}:{}'.format(*interface.auth).encode('utf-8')
+            headers['Authorization'] = 'Basic {}'.format(base64.b64encode(credentials).decode('ascii'))
+
+        # Resolve the settings like requests does, including the environment (e.g. REQUESTS_CA_BUNDLE)
+        server_url = session._original_uri
+        settings = interface.merge_environment_settings(server_url, {}, None, None, None)
+        if select_proxy(server_url, settings['proxies']) is not None:
+            raise exceptions.XNATValueError('A proxy is configured for {}, but the async session does not'
+                                            ' support proxies'.format(server_url))
+
+        self._pool = AsyncConnectionPool(max_connections=max_connections, verify=settings['verify'],
+                                         cert=settings['cert'])
+        self.client = AsyncHTTPClient(self._pool, headers=headers, origin=parse.urlsplit(server_url).netloc)
+
+    def __repr__(self):
+        return '<AsyncXNATSession {}>'.format(self.session._original_uri)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        self._pool.close()
+        if self._close_session:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.session.disconnect)
+
+    @property
+    def classes(self):
+        return self.session.classes
+
+    @property
+    def XNAT_CLASS_LOOKUP(self):
+        return self.session.XNAT_CLASS_LOOKUP
+
+    @property
+    def connection_pool_stats(self) -> Dict[str, Dict[str, int]]:
+        return self._pool.stats
+
+    def _cookie_header(self) -> Optional[str]:
+        # The cookies (e.g. the JSESSIONID) are read every request, as the session might renew them
+        values = ['{}={}'.format(cookie.name, cookie.value) for cookie in self.session.interface.cookies]
+        return '; '.join(values) if values else None
+
+    async def request(self,
+                      method: str,
+                      path: str,
+                      format: Optional[str] = None,
+                      query: Optional[Dict[str, str]] = None,
+                      data: Union[None, bytes, str, BinaryIO] = None,
+                      headers: Optional[Dict[str, str]] = None,
+                      accepted_status: Optional[Container[int]] = None,
+                      timeout: Optional[float] = None,
+                      retry: bool = True) -> AsyncHTTPResponse:
+        """
+        Send a request, transient failures are retried according to the
+        retry policy of the session.
+
+        :param method: the HTTP method
+        :param path: the path of the uri (e.g. "/data/archive/projects")
+        :param format: the format of the request, this will add the format= to the query string
+        :param query: the values to be added to the query string in the uri
+        :param data: the body as bytes, str or binary file-like object
+        :param headers: the HTTP headers to include
+        :param accepted_status: a list of the valid values for the return code, None
+                                does not check the status
+        :param timeout: timeout in seconds
+        :param retry: flag to allow retrying
+        :return: the response, of which the body still needs to be read
+        """
+        self.session._check_connection()
+        uri = self.session._format_uri(path, format, query=query)
+        timeout = timeout or self.session.request_timeout
+        if isinstance(timeout, tuple):
+            timeout = max(timeout)
+
+        request_headers = dict(headers or {})
+        cookie = self._cookie_header()
+        if cookie is not None:
+            request_headers['Cookie'] = cookie
+
+        # Bodies that are streams can only be sent once
+        retry = retry and (data is None or isinstance(data, (bytes, str)))
+        policy = self.session.retry_policy
+        policy.record_request()
+        attempt = 0
+
+        self.logger.info('{} URI {}'.format(method, uri))
+        while True:
+            try:
+                response = await self.client.request(method, uri, data=data, headers=request_headers, timeout=timeout)
+            except (exceptions.XNATConnectionError, asyncio.TimeoutError, OSError) as exception:
+                if not (retry and policy.should_retry(method, attempt, exception=_as_requests_exception(exception))):
+                    raise
+                delay = policy.backoff(attempt)
+                self.logger.warning(f'{method} {uri} failed ({exception}), retried after {delay:.1f} seconds')
+            else:
+                if not (retry and policy.should_retry(method, attempt, response=response)):
+                    break
+                await response.discard()
+                delay = policy.backoff(attempt, response)
+                self.logger.warning(f'{method} {uri} returned status {response.status_code},'
+                                    f' retried after {delay:.1f} seconds')
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if accepted_status is not None and response.status_code not in accepted_status:
+            text = await response.text()
+            raise exceptions.XNATResponseError(
+                f'Invalid status for response from XNATSession for url {uri}'
+                f' (status {response.status_code}, accepted status: {accepted_status}):\n{text}'
+            )
+
+        return response
+
+    async def _request_content(self, method, path, accepted_status, **kwargs) -> AsyncHTTPResponse:
+        response = await self.request(method, path, accepted_status=accepted_status, **kwargs)
+        await response.read()
+        if not self.session.skip_response_content_check and (await response.text()).startswith(('<!DOCTYPE', '<html>')):
+            raise exceptions.XNATResponseError(
+                f'Invalid content in response from XNATSession for url {response.url}'
+                f' (status {response.status_code}):\n{await response.text()}'
+            )
+        return response
+
+    async def get(self, path: str, format: Optional[str] = None, query: Optional[Dict[str, str]] = None,
+                  accepted_status: Optional[Container[int]] = None, timeout: Optional[float] = None,
+                  headers: Optional[Dict[str, str]] = None) -> AsyncHTTPResponse:
+        """
+        Retrieve the content of a given REST directory, see :py:meth:`BaseXNATSession.get`
+        """
+        return await self._request_content('GET', path, accepted_status or self.session.accepted_status_get,
+                                           format=format, query=query, timeout=timeout, headers=headers)
+
+    async def head(self, path: str, accepted_status: Optional[Container[int]] = None,
+                   timeout: Optional[float] = None, headers: Optional[Dict[str, str]] = None) -> AsyncHTTPResponse:
+        """
+        Retrieve the headers for a given REST directory, see :py:meth:`BaseXNATSession.head`
+        """
+        return await self.request('HEAD', path, accepted_status=accepted_status or self.session.accepted_status_get,
+                                  timeout=timeout, headers=headers)
+
+    async def post(self, path: str, data: Optional[Any] = None, json: Optional[JSONType] = None,
+                   format: Optional[str] = None, query: Optional[Dict[str, str]] = None,
+                   accepted_status: Optional[Container[int]] = None, timeout: Optional[float] = None,
+                   headers: Optional[Dict[str, str]] = None) -> AsyncHTTPResponse:
+        """
+        Post data to a given REST directory, see :py:meth:`BaseXNATSession.post`
+        """
+        data, headers = _encode_body(data, json, headers)
+        return await self._request_content('POST', path, accepted_status or self.session.accepted_status_post,
+                                           data=data, format=format, query=query, timeout=timeout, headers=headers)
+
+    async def put(self, path: str, data: Optional[Any] = None, json: Optional[JSONType] = None,
+                  format: Optional[str] = None, query: Optional[Dict[str, str]] = None,
+                  accepted_status: Optional[Container[int]] = None, timeout: Optional[float] = None,
+                  headers: Optional[Dict[str, str]] = None) -> AsyncHTTPResponse:
+        """
+        Put the content of a given REST directory, see :py:meth:`BaseXNATSession.put`
+        """
+        data, headers = _encode_body(data, json, headers)
+        return await self._request_content('PUT', path, accepted_status or self.session.accepted_status_put,
+                                           data=data, format=format, query=query, timeout=timeout, headers=headers)
+
+    async def delete(self, path: str, headers: Optional[Dict[str, str]] = None,
+                     accepted_status: Optional[Container[int]] = None, query: Optional[Dict[str, str]] = None,
+                     timeout: Optional[float] = None) -> AsyncHTTPResponse:
+        """
+        Delete the content of a given REST directory, see :py:meth:`BaseXNATSession.delete`
+        """
+        return await self._request_content('DELETE', path, accepted_status or self.session.accepted_status_delete,
+                                           query=query, timeout=timeout, headers=headers)
+
+    async def get_json(self, uri: str, query: Optional[Dict[str, str]] = None,
+                       accepted_status: Optional[Container[int]] = None) -> JSONType:
+        """
+        Perform a GET with the format set to JSON and parse the result, see
+        :py:meth:`BaseXNATSession.get_json`
+        """
+        response = await self.get(uri, format='json', query=query, accepted_status=accepted_status)
+        try:
+            return await response.json()
+        except ValueError:
+            raise exceptions.XNATValueError('Could not decode JSON from [{}] {}'.format(uri, await response.text()))
+
+    def listing(self, listing: XNATListing, page_size: Optional[int] = None) -> AsyncXNATListing:
+        """
+        Create an async iterable view of a listing
+
+        :param listing: the listing to wrap (e.g. ``session.projects['test'].subjects``)
+        :param page_size: retrieve the listing in pages of this size, None retrieves
+                          the listing in a single request
+        :return: the async listing
+        """
+        return AsyncXNATListing(listing, self, page_size=page_size)
+
+    @property
+    def projects(self) -> AsyncXNATListing:
+        return self.listing(self.session.projects)
+
+    @property
+    def subjects(self) -> AsyncXNATListing:
+        return self.listing(self.session.subjects, page_size=LISTING_PAGE_SIZE)
+
+    @property
+    def experiments(self) -> AsyncXNATListing:
+        return self.listing(self.session.experiments, page_size=LISTING_PAGE_SIZE)
+
+    async def download_stream(self,
+                              uri: str,
+                              target_stream: BinaryIO,
+                              format: Optional[str] = None,
+                              chunk_size: int = 524288,
+                              update_func: Optional[Callable[[int, Optional[int], bool], None]] = None,
+                              timeout: Optional[float] = None) -> int:
+        """
+        Download the given ``uri`` to the given ``target_stream``, see
+        :py:meth:`BaseXNATSession.download_stream`
+
+        :return: the number of bytes downloaded
+        """
+        response = await self.request('GET', uri, format=format, timeout=timeout,
+                                      accepted_status=self.session.accepted_status_get)
+        content_length = response.headers.get('Content-Length')
+        content_length = int(content_length) if content_length is not None else None
+
+        if update_func is None:
+            update_func = lambda *args: None
+
+        bytes_read = 0
+        try:
+            update_func(0, content_length, False)
+            async for chunk in response.iter_content(chunk_size):
+                if bytes_read == 0 and chunk.startswith((b'<!DOCTYPE', b'<html>')):
+                    raise ValueError('Invalid response from XNATSession (status {}):\n{}'.format(response.status_code, chunk))
+
+                bytes_read += len(chunk)
+                target_stream.write(chunk)
+                update_func(bytes_read, content_length, False)
+        finally:
+            response.close()
+            update_func(bytes_read, content_length, True)
+
+        return bytes_read
+
+    async def download(self,
+                       uri: str,
+                       target: Union[str, Path],
+                       format: Optional[str] = None,
+                       update_func: Optional[Callable[[int, Optional[int], bool], None]] = None,
+                       timeout: Optional[float] = None) -> int:
+        """
+        Download uri to a target file
+
+        :return: the number of bytes downloaded
+        """
+        with open(target, 'wb') as out_fh:
+            return await self.download_stream(uri, out_fh, format=format, update_func=update_func, timeout=timeout)
+
+    async def upload_stream(self,
+                            uri: str,
+                            stream: BinaryIO,
+                            retries: int = 1,
+                            query: Optional[Dict[str, str]] = None,
+                            content_type: Optional[str] = None,
+                            method: str = 'put',
+                            overwrite: bool = False,
+                            timeout: Optional[float] = None) -> AsyncHTTPResponse:
+        """
+        Upload data from a stream to XNAT, see :py:meth:`BaseXNATSession.upload_stream`
+        """
+        if method not in ('put', 'post'):
+            raise ValueError('Invalid upload method "{}" should be either put or post.'.format(method))
+
+        if overwrite:
+            query = dict(query or {})
+            query['overwrite'] = 'true'
+
+        headers = {'Content-Type': content_type or 'application/octet-stream'}
+
+        response = None
+        for attempt in range(retries):
+            if attempt > 0:
+                await asyncio.sleep(self.session.retry_policy.backoff(attempt - 1))
+
+            stream.seek(0)
+            response = await self.request(method.upper(), uri, query=query, data=stream,
+                                          headers=headers, timeout=timeout, retry=False)
+            await response.read()
+            if 200 <= response.status_code < 300:
+                return response
+
+        raise exceptions.XNATUploadError(f'Upload failed after {retries} attempts! Status code'
+                                         f' {response.status_code}, response text {await response.text()}')
+
+    async def upload_file(self, uri: str, path: Union[str, Path], **kwargs) -> AsyncHTTPResponse:
+        """
+        Upload a file to XNAT, see :py:meth:`BaseXNATSession.upload_file`
+        """
+        path = Path(path)
+        if not path.is_file():
+            raise FileNotFoundError("The file you are trying to upload does not exist.")
+
+        with open(path, 'rb') as file_handle:
+            return await self.upload_stream(uri, file_handle, **kwargs)
+
+
+def _encode_body(data, json_data, headers):
+    if json_data is not None:
+        headers = dict(headers or {})
+        headers.setdefault('Content-Type', 'application/json')
+        return json.dumps(json_data).encode('utf-8'), headers
+
+    if isinstance(data, dict):
+        headers = dict(headers or {})
+        headers.setdefault('Content-Type', 'application/x-www-form-urlencoded')
+        return parse.urlencode(data, doseq=True).encode('utf-8'), headers
+
+    return data, headers
+
+
+def _as_requests_exception(exception):
+    # Map the exceptions of the async client to the requests exceptions the retry policy expects
+    if isinstance(exception, asyncio.TimeoutError):
+        return requests.exceptions.Timeout(str(exception))
+    return requests.exceptions.ConnectionError(str(exception))
+
+
+async def connect(*args, max_connections: int = POOL_MAXSIZE, **kwargs) -> AsyncXNATSession:
+    """
+    Connect to a server and create an :py:class:`AsyncXNATSession`. The login
+    and the creation of the data model are done using :py:func:`xnat.connect`
+    (in a thread, so the event loop is not blocked) and accept the same arguments.
+
+    :param max_connections: maximum number of concurrent connections to the server
+    :return: the async session, closing it also disconnects the underlying session
+    """
+    from . import connect as sync_connect
+
+    kwargs.setdefault('pool_maxsize', max_connections)
+    loop = asyncio.get_running_loop()
+    session = await loop.run_in_executor(None, functools.partial(sync_connect, *args, **kwargs))
+    return AsyncXNATSession(session, max_connections=max_connections, close_session=True)
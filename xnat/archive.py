@@ -0,0 +1,959 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Streaming extraction of zip archives. The zips created by XNAT are read
+front to back using the local file headers (and data descriptors for entries
+of which the size is not known up front), so the entries are written to the
+target directory while the archive is being downloaded. The central
+directory at the end of the archive is not needed and skipped.
+
+Archives to upload are created in a background thread and handed to the
+request in chunks by a generator, so the archive is sent while it is being
+built without a temporary copy on disk or in memory. The data is compressed
+in blocks on multiple cores: gzip streams consist of one gzip member per
+block and zip entries are deflated in blocks that end on a byte boundary, so
+the compressed blocks can simply be concatenated.
+"""
+
+import collections
+import gzip
+import os
+import queue
+import struct
+import sys
+import tarfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, IO, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from . import exceptions
+
+if TYPE_CHECKING:
+    from .session import BaseXNATSession
+
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+DATA_DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+CENTRAL_DIRECTORY_SIGNATURE = b'PK\x01\x02'
+END_OF_CENTRAL_DIRECTORY_SIGNATURE = b'PK\x05\x06'
+
+ZIP64_END_OF_CENTRAL_DIRECTORY_SIGNATURE = b'PK\x06\x06'
+ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR_SIGNATURE = b'PK\x06\x07'
+
+LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+CENTRAL_DIRECTORY_HEADER = struct.Struct('<4sHHHHHHIIIHHHHHII')
+END_OF_CENTRAL_DIRECTORY = struct.Struct('<4sHHHHIIH')
+ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct('<4sQHHIIQQQQ')
+ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR = struct.Struct('<4sIQI')
+ZIP64_EXTRA_ID = 0x0001
+
+# Same limits as the zipfile module, beyond these zip64 records are used
+ZIP64_LIMIT = (1 << 31) - 1
+ZIP_FILECOUNT_LIMIT = (1 << 16) - 1
+ZIP_VERSION = 20
+ZIP64_VERSION = 45
+
+FLAG_ENCRYPTED = 0x01
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+
+# Maximum amount of decompressed data produced per step
+OUTPUT_CHUNK_SIZE = 1048576
+
+# Size of the chunks of a generated archive and the number of chunks that can
+# be waiting to be sent before the archive writer blocks
+STREAM_CHUNK_SIZE = 1048576
+STREAM_QUEUE_CHUNKS = 8
+
+# Size of the blocks compressed concurrently and the default gzip level (the
+# same as the gzip module)
+COMPRESSION_BLOCK_SIZE = 1048576
+GZIP_COMPRESSION_LEVEL = 9
+
+
+def sanitize_member_path(name: str) -> Optional[str]:
+    """
+    Convert the name of a zip entry to a safe relative path, in the same way
+    :py:meth:`zipfile.ZipFile.extract` does: absolute paths are made relative
+    and ``..`` components are removed.
+
+    :param name: the name of the entry
+    :return: the relative path using os separators, None if nothing remains
+    """
+    parts = [x for x in name.replace('\\', '/').split('/') if x not in ('', '.', '..')]
+    if parts:
+        parts[0] = os.path.splitdrive(parts[0])[1]
+        parts = [x for x in parts if x]
+    return os.path.join(*parts) if parts else None
+
+
+class ZipStreamExtractor(object):
+    """
+    Writable file-like object that extracts a zip archive written to it.
+    Only stored and deflated entries are supported.
+
+    :param target_dir: the directory to extract the archive in
+    """
+    def __init__(self, target_dir: str):
+        self.target_dir = target_dir
+        self.names: List[str] = []
+        self._buffer = bytearray()
+        self._state = 'header'
+        self._entry = None
+        self._output = None
+        self._bytes_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._close_output()
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def tell(self):
+        return self._bytes_written
+
+    def write(self, data: bytes) -> int:
+        self._bytes_written += len(data)
+        if self._state == 'done':
+            # Central directory, nothing left to extract
+            return len(data)
+
+        self._buffer += data
+        while self._step():
+            pass
+
+        return len(data)
+
+    def close(self):
+        """
+        Finish the extraction
+
+        :raises XNATIOError: if the archive is truncated, which includes a
+                             missing central directory
+        """
+        self._close_output()
+        if self._state != 'done':
+            raise exceptions.XNATIOError('Zip archive is truncated, stopped while reading {}'.format(
+                self._entry['name'] if self._entry else
+                'an entry header' if self._buffer else 'the central directory'
+            ))
+
+    def _close_output(self):
+        if self._output is not None:
+            self._output.close()
+            self._output = None
+
+    def _step(self) -> bool:
+        """
+        Process the buffered data as far as possible
+
+        :return: flag indicating that progress was made and another step is possible
+        """
+        if self._state == 'header':
+            return self._read_header()
+        elif self._state == 'data':
+            return self._read_data()
+        elif self._state == 'descriptor':
+            return self._read_descriptor()
+        return False
+
+    def _read_header(self) -> bool:
+        if len(self._buffer) < 4:
+            return False
+
+        signature = bytes(self._buffer[:4])
+        if signature in (CENTRAL_DIRECTORY_SIGNATURE, END_OF_CENTRAL_DIRECTORY_SIGNATURE):
+            self._state = 'done'
+            self._buffer = bytearray()
+            return False
+
+        if signature != LOCAL_HEADER_SIGNATURE:
+            raise exceptions.XNATIOError('Invalid zip archive, expected a local file header'
+                                         ' at byte {}'.format(self._bytes_written - len(self._buffer)))
+
+        if len(self._buffer) < LOCAL_HEADER.size:
+            return False
+
+        (_, _, flags, method, _, _, crc, compressed_size,
+         size, name_length, extra_length) = LOCAL_HEADER.unpack_from(self._buffer)
+
+        header_size = LOCAL_HEADER.size + name_length + extra_length
+        if len(self._buffer) < header_size:
+            return False
+
+        name = bytes(self._buffer[LOCAL_HEADER.size:LOCAL_HEADER.size + name_length])
+        name = name.decode('utf-8' if flags & FLAG_UTF8 else 'cp437')
+        extra = bytes(self._buffer[LOCAL_HEADER.size + name_length:header_size])
+        del self._buffer[:header_size]
+
+        if flags & FLAG_ENCRYPTED:
+            raise exceptions.XNATIOError('Cannot extract encrypted zip entry {}'.format(name))
+
+        if method not in (METHOD_STORED, METHOD_DEFLATED):
+            raise exceptions.XNATIOError('Cannot extract zip entry {}, unsupported compression'
+                                         ' method {}'.format(name, method))
+
+        zip64 = False
+        if compressed_size == 0xFFFFFFFF or size == 0xFFFFFFFF:
+            zip64 = True
+            size, compressed_size = self._parse_zip64_extra(extra, size, compressed_size)
+
+        has_descriptor = bool(flags & FLAG_DATA_DESCRIPTOR)
+        if method == METHOD_STORED and has_descriptor and compressed_size == 0 and not name.endswith('/'):
+            raise exceptions.XNATIOError('Cannot stream zip entry {}, stored entries need a known size'.format(name))
+
+        self._entry = {
+            'name': name,
+            'method': method,
+            'crc': crc,
+            'compressed_size': compressed_size,
+            'size': size,
+            'has_descriptor': has_descriptor,
+            'zip64': zip64,
+            'remaining': compressed_size,
+            'size_read': 0,
+            'crc_read': 0,
+            'decompressor': zlib.decompressobj(-zlib.MAX_WBITS) if method == METHOD_DEFLATED else None,
+        }
+        self.names.append(name)
+        self._open_output(name)
+        self._state = 'data'
+        return True
+
+    @staticmethod
+    def _parse_zip64_extra(extra: bytes, size: int, compressed_size: int):
+        offset = 0
+        while offset + 4 <= len(extra):
+            header_id, data_size = struct.unpack_from('<HH', extra, offset)
+            if header_id == ZIP64_EXTRA_ID:
+                values = extra[offset + 4:offset + 4 + data_size]
+                index = 0
+                if size == 0xFFFFFFFF and index + 8 <= len(values):
+                    size = struct.unpack_from('<Q', values, index)[0]
+                    index += 8
+                if compressed_size == 0xFFFFFFFF and index + 8 <= len(values):
+                    compressed_size = struct.unpack_from('<Q', values, index)[0]
+                break
+            offset += 4 + data_size
+        return size, compressed_size
+
+    def _open_output(self, name: str):
+        path = sanitize_member_path(name)
+        if path is None:
+            return
+
+        path = os.path.join(self.target_dir, path)
+        if name.endswith('/'):
+            os.makedirs(path, exist_ok=True)
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._output = open(path, 'wb')
+
+    def _write_output(self, data: bytes):
+        if not data:
+            return
+        entry = self._entry
+        entry['size_read'] += len(data)
+        entry['crc_read'] = zlib.crc32(data, entry['crc_read'])
+        if self._output is not None:
+            self._output.write(data)
+
+    def _read_data(self) -> bool:
+        entry = self._entry
+
+        if entry['method'] == METHOD_STORED:
+            data = self._buffer[:entry['remaining']]
+            del self._buffer[:len(data)]
+            entry['remaining'] -= len(data)
+            self._write_output(bytes(data))
+            finished = entry['remaining'] == 0
+        else:
+            decompressor = entry['decompressor']
+            if not self._buffer:
+                return False
+            data = bytes(self._buffer)
+            self._buffer = bytearray()
+            while True:
+                self._write_output(decompressor.decompress(data, OUTPUT_CHUNK_SIZE))
+                data = decompressor.unconsumed_tail
+                if decompressor.eof or not data:
+                    break
+
+            finished = decompressor.eof
+            if finished:
+                self._buffer = bytearray(decompressor.unused_data)
+
+        if not finished:
+            return False
+
+        self._close_output()
+        if entry['has_descriptor']:
+            self._state = 'descriptor'
+        else:
+            self._finish_entry(entry['crc'], entry['size'])
+        return True
+
+    def _read_descriptor(self) -> bool:
+        entry = self._entry
+        offset = 4 if self._buffer[:4] == DATA_DESCRIPTOR_SIGNATURE else 0
+
+        # The sizes are either 4 or 8 bytes, check which matches the data read
+        for size_length in (4, 8) if not entry['zip64'] else (8,):
+            length = offset + 4 + 2 * size_length
+            if len(self._buffer) < length:
+                return False
+
+            crc, compressed_size, size = struct.unpack_from('<I{0}{0}'.format('I' if size_length == 4 else 'Q'),
+                                                           self._buffer, offset)
+            if size == entry['size_read'] & (0xFFFFFFFF if size_length == 4 else 0xFFFFFFFFFFFFFFFF):
+                del self._buffer[:length]
+                self._finish_entry(crc, size)
+                return True
+
+        raise exceptions.XNATIOError('Invalid data descriptor for zip entry {}'.format(entry['name']))
+
+    def _finish_entry(self, crc: int, size: int):
+        entry = self._entry
+        if entry['size_read'] != size:
+            raise exceptions.XNATIOError('Size of zip entry {} does not match ({} != {})'.format(
+                entry['name'], entry['size_read'], size
+            ))
+
+        if entry['crc_read'] != crc:
+            raise exceptions.XNATIOError('CRC of zip entry {} does not match'.format(entry['name']))
+
+        self._entry = None
+        self._state = 'header'
+
+
+def download_extract_zip(xnat_session: 'BaseXNATSession',
+                         uri: str,
+                         target_dir: str,
+                         verbose: bool = False,
+                         update_func=None,
+                         timeout=None) -> List[str]:
+    """
+    Download a uri as zip and extract it while downloading
+
+    :param xnat_session: the session to use
+    :param uri: the uri to download (format=zip is added)
+    :param target_dir: the directory to extract the archive in
+    :param verbose: show progress
+    :param update_func: progress callback, see
+                        :py:meth:`BaseXNATSession.download_stream <xnat.session.BaseXNATSession.download_stream>`
+    :param timeout: timeout in seconds, float or (connection timeout, read timeout)
+    :return: the names of the entries in the archive
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    with ZipStreamExtractor(target_dir) as extractor:
+        xnat_session.download_stream(uri, extractor, format='zip', verbose=verbose,
+                                     update_func=update_func, timeout=timeout)
+    return extractor.names
+
+
+class _StreamCancelled(Exception):
+    """
+    Raised in the writer thread when the consumer of the stream stopped
+    """
+
+
+class ChunkQueueWriter(object):
+    """
+    Writable file-like object that hands the data written to it to a queue
+    in chunks of a fixed size
+
+    :param chunks: the queue to put the chunks in
+    :param chunk_size: the size of the chunks
+    :param cancelled: event that is set when the chunks are no longer consumed
+    """
+    def __init__(self, chunks: queue.Queue, chunk_size: int, cancelled: threading.Event):
+        self._chunks = chunks
+        self._chunk_size = chunk_size
+        self._cancelled = cancelled
+        self._buffer = bytearray()
+        self._bytes_written = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def tell(self):
+        return self._bytes_written
+
+    def write(self, data: bytes) -> int:
+        self._bytes_written += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self._chunk_size:
+            self.put(bytes(self._buffer[:self._chunk_size]))
+            del self._buffer[:self._chunk_size]
+        return len(data)
+
+    def flush(self):
+        # Partial chunks are only sent by finish, flushing tar or zip
+        # internals should not result in many small chunks
+        pass
+
+    def finish(self):
+        """
+        Put the remaining buffered data in the queue
+        """
+        if self._buffer:
+            self.put(bytes(self._buffer))
+            self._buffer = bytearray()
+
+    def put(self, item):
+        """
+        Put an item in the queue, waiting for space but giving up once the
+        consumer stopped
+
+        :raises _StreamCancelled: if the consumer stopped
+        """
+        while True:
+            if self._cancelled.is_set():
+                raise _StreamCancelled()
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+def generate_stream(write: Callable[[IO], None],
+                    chunk_size: int = STREAM_CHUNK_SIZE,
+                    queue_chunks: int = STREAM_QUEUE_CHUNKS) -> Iterator[bytes]:
+    """
+    Run a function writing to a file object in a background thread and yield
+    the written data in chunks. The writer blocks when ``queue_chunks`` chunks
+    are waiting, so the data is produced at the pace it is consumed. An
+    exception in the writer is raised by the generator.
+
+    :param write: function that writes the data to the file object it receives
+    :param chunk_size: the size of the chunks to yield
+    :param queue_chunks: the maximum number of chunks waiting to be consumed
+    :return: generator yielding the data
+    """
+    chunks = queue.Queue(maxsize=queue_chunks)
+    cancelled = threading.Event()
+    writer = ChunkQueueWriter(chunks, chunk_size, cancelled)
+
+    def produce():
+        try:
+            write(writer)
+            writer.finish()
+            writer.put(None)
+        except _StreamCancelled:
+            pass
+        except BaseException as exception:
+            try:
+                writer.put(exception)
+            except _StreamCancelled:
+                pass
+
+    thread = threading.Thread(target=produce, name='XNATpyArchiveWriter', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+        thread.join()
+
+
+def deflate_block(data: bytes, level: int, wbits: int, final: bool = True) -> bytes:
+    """
+    Compress a block of data independently of the other blocks. A block that
+    is not final ends with a full flush, so it ends on a byte boundary and
+    the next block can be appended to it.
+
+    :param data: the data to compress
+    :param level: the zlib compression level
+    :param wbits: the zlib wbits, -15 for raw deflate and 31 for a gzip member
+    :param final: flag indicating that this is the last block of the stream
+    :return: the compressed data
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_FULL_FLUSH)
+
+
+class _OrderedPipeline(object):
+    """
+    Run compression jobs concurrently and hand the items to a callback in
+    the order they were submitted. The number of running jobs is bounded, so
+    the memory used does not depend on the size of the input.
+
+    :param handle: callback receiving the item and the result of its job
+                   (None for items without a job)
+    :param max_workers: the number of threads, defaults to the number of cores
+    """
+    def __init__(self, handle: Callable, max_workers: Optional[int] = None):
+        max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self._handle = handle
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='XNATpyCompress')
+        self._pending = collections.deque()
+        self._jobs = 0
+        self._max_jobs = 2 * max_workers
+
+    def submit(self, item, func: Optional[Callable] = None, *args):
+        future = None
+        if func is not None:
+            future = self._executor.submit(func, *args)
+            self._jobs += 1
+        self._pending.append((item, future))
+
+        while self._jobs > self._max_jobs:
+            self._pop()
+
+    def _pop(self):
+        item, future = self._pending.popleft()
+        if future is not None:
+            self._jobs -= 1
+            self._handle(item, future.result())
+        else:
+            self._handle(item, None)
+
+    def finish(self):
+        while self._pending:
+            self._pop()
+        self._executor.shutdown()
+
+    def abort(self):
+        for _, future in self._pending:
+            if future is not None:
+                future.cancel()
+        self._pending.clear()
+        self._executor.shutdown()
+
+
+class ParallelGzipWriter(object):
+    """
+    Writable file-like object that gzips the data written to it on multiple
+    cores. The data is split in blocks that are compressed concurrently, each
+    into a separate gzip member. A concatenation of gzip members is a valid
+    gzip stream that decompresses to the concatenated data.
+
+    :param fileobj: the file object to write the compressed data to, it is
+                    not closed when the writer is closed
+    :param compression_level: the zlib compression level (0-9)
+    :param max_workers: the number of threads, defaults to the number of cores
+    :param block_size: the size of the blocks to compress
+    """
+    def __init__(self,
+                 fileobj: IO,
+                 compression_level: int = GZIP_COMPRESSION_LEVEL,
+                 max_workers: Optional[int] = None,
+                 block_size: int = COMPRESSION_BLOCK_SIZE):
+        self.fileobj = fileobj
+        self.compression_level = compression_level
+        self.block_size = block_size
+        self._pipeline = _OrderedPipeline(lambda item, result: fileobj.write(result), max_workers)
+        self._buffer = bytearray()
+        self._bytes_written = 0
+        self._blocks = 0
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._closed = True
+            self._pipeline.abort()
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def tell(self):
+        return self._bytes_written
+
+    def flush(self):
+        pass
+
+    def write(self, data: bytes) -> int:
+        if self._closed:
+            raise ValueError('I/O operation on closed file.')
+
+        self._bytes_written += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def _submit(self, block: bytes):
+        self._blocks += 1
+        self._pipeline.submit(None, deflate_block, block, self.compression_level, 31)
+
+    def close(self):
+        """
+        Compress the remaining data and wait for all blocks to be written
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        # An empty stream still needs a single (empty) member
+        if self._buffer or self._blocks == 0:
+            self._submit(bytes(self._buffer))
+            self._buffer = bytearray()
+        self._pipeline.finish()
+
+
+def _dos_date_time(timestamp: float) -> Tuple[int, int]:
+    year, month, day, hour, minute, second = time.localtime(timestamp)[:6]
+    if year < 1980:
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    return (year - 1980) << 9 | month << 5 | day, hour << 11 | minute << 5 | second // 2
+
+
+class ParallelZipWriter(object):
+    """
+    Write a zip archive to a file object front to back, deflating the
+    entries on multiple cores. Small files are compressed concurrently with
+    each other and large files are split in blocks that are compressed
+    concurrently. The output does not have to be seekable: deflated entries
+    are followed by a data descriptor and the central directory is written
+    when the writer is closed.
+
+    :param fileobj: the file object to write the archive to, it is not closed
+                    when the writer is closed
+    :param compression_level: the zlib compression level (1-9), 0 stores the
+                              entries without compression which is useful for
+                              data that is already compressed
+    :param max_workers: the number of threads, defaults to the number of cores
+    :param block_size: the size of the blocks to compress
+    """
+    def __init__(self,
+                 fileobj: IO,
+                 compression_level: int = zlib.Z_DEFAULT_COMPRESSION,
+                 max_workers: Optional[int] = None,
+                 block_size: int = COMPRESSION_BLOCK_SIZE):
+        self.fileobj = fileobj
+        self.compression_level = compression_level
+        self.block_size = block_size
+        self.names: List[str] = []
+        self._pipeline = _OrderedPipeline(self._handle, max_workers)
+        self._entries = []
+        self._offset = 0
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._closed = True
+            self._pipeline.abort()
+
+    def tell(self):
+        return self._offset
+
+    def add_file(self, path: str, arcname: str):
+        """
+        Add a file to the archive
+
+        :param path: the path of the file to add
+        :param arcname: the name of the entry in the archive
+        """
+        if self._closed:
+            raise ValueError('Cannot add files to a closed zip writer')
+
+        stat = os.stat(path)
+        name = arcname.replace(os.sep, '/').lstrip('/')
+        date, time_ = _dos_date_time(stat.st_mtime)
+        entry = {
+            'name': name,
+            'flags': 0 if name.isascii() else FLAG_UTF8,
+            'method': METHOD_DEFLATED if self.compression_level != 0 else METHOD_STORED,
+            'date': date,
+            'time': time_,
+            'crc': 0,
+            'compressed_size': 0,
+            'size': 0,
+            'zip64': stat.st_size * 1.05 > ZIP64_LIMIT,
+            'external_attr': (stat.st_mode & 0xFFFF) << 16,
+            'offset': 0,
+        }
+        self.names.append(name)
+        self._entries.append(entry)
+
+        if entry['method'] == METHOD_STORED:
+            self._add_stored(path, entry)
+        else:
+            self._add_deflated(path, entry)
+
+    def _add_stored(self, path: str, entry: dict):
+        # The header of a stored entry needs the crc up front, some readers
+        # do not support data descriptors for stored entries
+        with open(path, 'rb') as input_file:
+            for block in iter(lambda: input_file.read(self.block_size), b''):
+                entry['crc'] = zlib.crc32(block, entry['crc'])
+                entry['size'] += len(block)
+        entry['compressed_size'] = entry['size']
+
+        self._pipeline.submit(('header', entry))
+        size = 0
+        with open(path, 'rb') as input_file:
+            for block in iter(lambda: input_file.read(self.block_size), b''):
+                size += len(block)
+                # Passing the block through the pipeline bounds the blocks held in memory
+                self._pipeline.submit(('data', entry), bytes, block)
+
+        if size != entry['size']:
+            raise exceptions.XNATIOError('File {} changed while adding it to the zip archive'.format(path))
+
+    def _add_deflated(self, path: str, entry: dict):
+        entry['flags'] |= FLAG_DATA_DESCRIPTOR
+        self._pipeline.submit(('header', entry))
+
+        with open(path, 'rb') as input_file:
+            block = input_file.read(self.block_size)
+            while True:
+                next_block = input_file.read(self.block_size) if len(block) == self.block_size else b''
+                entry['crc'] = zlib.crc32(block, entry['crc'])
+                entry['size'] += len(block)
+                final = not next_block
+                self._pipeline.submit(('data', entry), deflate_block, block,
+                                      self.compression_level, -zlib.MAX_WBITS, final)
+                if final:
+                    break
+                block = next_block
+
+        self._pipeline.submit(('descriptor', entry))
+
+    def _write(self, data: bytes):
+        self.fileobj.write(data)
+        self._offset += len(data)
+
+    def _handle(self, item, result):
+        kind, entry = item
+        if kind == 'header':
+            entry['offset'] = self._offset
+            self._write(self._local_header(entry))
+        elif kind == 'data':
+            if entry['method'] == METHOD_DEFLATED:
+                entry['compressed_size'] += len(result)
+            self._write(result)
+        elif kind == 'descriptor':
+            if entry['zip64']:
+                self._write(struct.pack('<4sIQQ', DATA_DESCRIPTOR_SIGNATURE, entry['crc'],
+                                        entry['compressed_size'], entry['size']))
+            else:
+                self._write(struct.pack('<4sIII', DATA_DESCRIPTOR_SIGNATURE, entry['crc'],
+                                        entry['compressed_size'], entry['size']))
+
+    @staticmethod
+    def _local_header(entry: dict) -> bytes:
+        name = entry['name'].encode('utf-8' if entry['flags'] & FLAG_UTF8 else 'ascii')
+        if entry['flags'] & FLAG_DATA_DESCRIPTOR:
+            crc, compressed_size, size = 0, 0, 0
+        else:
+            crc, compressed_size, size = entry['crc'], entry['compressed_size'], entry['size']
+
+        extra = b''
+        if entry['zip64']:
+            extra = struct.pack('<HHQQ', ZIP64_EXTRA_ID, 16, size, compressed_size)
+            compressed_size, size = 0xFFFFFFFF, 0xFFFFFFFF
+
+        return LOCAL_HEADER.pack(
+            LOCAL_HEADER_SIGNATURE, ZIP64_VERSION if entry['zip64'] else ZIP_VERSION, entry['flags'],
+            entry['method'], entry['time'], entry['date'], crc, compressed_size, size, len(name), len(extra),
+        ) + name + extra
+
+    @staticmethod
+    def _central_directory_header(entry: dict) -> bytes:
+        name = entry['name'].encode('utf-8' if entry['flags'] & FLAG_UTF8 else 'ascii')
+        size, compressed_size, offset = entry['size'], entry['compressed_size'], entry['offset']
+
+        values = []
+        if size > ZIP64_LIMIT:
+            values.append(size)
+            size = 0xFFFFFFFF
+        if compressed_size > ZIP64_LIMIT:
+            values.append(compressed_size)
+            compressed_size = 0xFFFFFFFF
+        if offset > ZIP64_LIMIT:
+            values.append(offset)
+            offset = 0xFFFFFFFF
+
+        extra = b''
+        if values:
+            extra = struct.pack('<HH{}Q'.format(len(values)), ZIP64_EXTRA_ID, 8 * len(values), *values)
+
+        version = ZIP64_VERSION if values or entry['zip64'] else ZIP_VERSION
+        create_system = 0 if sys.platform == 'win32' else 3
+        return CENTRAL_DIRECTORY_HEADER.pack(
+            CENTRAL_DIRECTORY_SIGNATURE, create_system << 8 | version, version, entry['flags'], entry['method'],
+            entry['time'], entry['date'], entry['crc'], compressed_size, size, len(name), len(extra), 0, 0, 0,
+            entry['external_attr'], offset,
+        ) + name + extra
+
+    def close(self):
+        """
+        Wait for all entries to be written and write the central directory
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._pipeline.finish()
+
+        start = self._offset
+        for entry in self._entries:
+            self._write(self._central_directory_header(entry))
+        size = self._offset - start
+
+        count = len(self._entries)
+        if count > ZIP_FILECOUNT_LIMIT or start > ZIP64_LIMIT or size > ZIP64_LIMIT:
+            zip64_offset = self._offset
+            self._write(ZIP64_END_OF_CENTRAL_DIRECTORY.pack(
+                ZIP64_END_OF_CENTRAL_DIRECTORY_SIGNATURE, ZIP64_END_OF_CENTRAL_DIRECTORY.size - 12,
+                ZIP64_VERSION, ZIP64_VERSION, 0, 0, count, count, size, start,
+            ))
+            self._write(ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR.pack(
+                ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR_SIGNATURE, 0, zip64_offset, 1,
+            ))
+            count = min(count, 0xFFFF)
+            size = min(size, 0xFFFFFFFF)
+            start = min(start, 0xFFFFFFFF)
+
+        self._write(END_OF_CENTRAL_DIRECTORY.pack(
+            END_OF_CENTRAL_DIRECTORY_SIGNATURE, 0, 0, count, count, size, start, 0,
+        ))
+
+
+def write_tar(fileobj: IO,
+              directory: str,
+              compress: bool = False,
+              compression_level: Optional[int] = None,
+              max_workers: Optional[int] = None):
+    """
+    Write a tar archive of a directory to a file object, the paths in the
+    archive are relative to the directory
+
+    :param fileobj: the file object to write to, it does not have to be seekable
+    :param directory: the directory to archive
+    :param compress: flag to gzip the archive
+    :param compression_level: the gzip compression level (0-9), defaults to 9
+    :param max_workers: the number of compression threads, if given the archive is
+                        compressed by a :py:class:`ParallelGzipWriter` into multiple
+                        gzip members, otherwise into a single gzip member
+    """
+    if compress:
+        level = compression_level if compression_level is not None else GZIP_COMPRESSION_LEVEL
+        if max_workers is None:
+            gzip_writer = gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=level, mtime=0)
+        else:
+            gzip_writer = ParallelGzipWriter(fileobj, compression_level=level, max_workers=max_workers)
+
+        with gzip_writer:
+            write_tar(gzip_writer, directory)
+        return
+
+    with tarfile.open(mode='w|', fileobj=fileobj) as tar_file:
+        tar_file.add(directory, '')
+
+
+def write_zip(fileobj: IO,
+              files: Iterable[Tuple[str, str]],
+              compression_level: Optional[int] = None,
+              max_workers: Optional[int] = None):
+    """
+    Write a zip archive of a number of files to a file object
+
+    :param fileobj: the file object to write to, it does not have to be seekable
+    :param files: the paths of the files and their names in the archive
+    :param compression_level: the deflate compression level (1-9), 0 stores the
+                              files, defaults to the zlib default
+    :param max_workers: the number of compression threads, defaults to the number of cores
+    """
+    level = compression_level if compression_level is not None else zlib.Z_DEFAULT_COMPRESSION
+    with ParallelZipWriter(fileobj, compression_level=level, max_workers=max_workers) as zip_writer:
+        for path, arcname in files:
+            zip_writer.add_file(path, arcname)
+
+
+def stream_tar(directory: str,
+               compress: bool = False,
+               compression_level: Optional[int] = None,
+               max_workers: Optional[int] = None,
+               chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Create a tar archive of a directory while it is being consumed, the
+    paths in the archive are relative to the directory
+
+    :param directory: the directory to archive
+    :param compress: flag to gzip the archive
+    :param compression_level: the gzip compression level (0-9), defaults to 9
+    :param max_workers: the number of compression threads, by default the archive
+                        is compressed on a single thread
+    :param chunk_size: the size of the chunks to yield
+    :return: generator yielding the archive
+    """
+    def write(fileobj):
+        write_tar(fileobj, directory, compress=compress,
+                  compression_level=compression_level, max_workers=max_workers)
+
+    return generate_stream(write, chunk_size=chunk_size)
+
+
+def stream_zip(files: Iterable[Tuple[str, str]],
+               compression_level: Optional[int] = None,
+               max_workers: Optional[int] = None,
+               chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Create a zip archive of a number of files while it is being consumed,
+    the central directory is written at the end of the stream
+
+    :param files: the paths of the files and their names in the archive
+    :param compression_level: the deflate compression level (1-9), 0 stores the
+                              files, defaults to the zlib default
+    :param max_workers: the number of compression threads, defaults to the number of cores
+    :param chunk_size: the size of the chunks to yield
+    :return: generator yielding the archive
+    """
+    def write(fileobj):
+        write_zip(fileobj, files, compression_level=compression_level, max_workers=max_workers)
+
+    return generate_stream(write, chunk_size=chunk_size)
@@ -1,7 +1,11 @@
+import sys
+
 import click
 import xnat
 
 from xnat import exceptions
+from xnat.constants import IMPORT_WORKERS
+from xnat.services import read_import_manifest, write_import_results
 from .utils import unpack_context
 
 @click.group(name="import")
@@ -43,3 +47,49 @@ def experiment(ctx,
             session.logger.info("Import complete!")
     except exceptions.XNATLoginFailedError:
         print(f"ERROR Failed to login")
+
+
+@importing.command()
+@click.argument('manifest', type=click.Path(exists=True, dir_okay=False))
+@click.option('--results', type=click.Path(dir_okay=False), help="File to write the results table (CSV) to, defaults to stdout.")
+@click.option('--workers', type=int, default=IMPORT_WORKERS, show_default=True, help="Number of directories to import concurrently.")
+@click.option('--destination', help="The destination to upload the scans to.")
+@click.option('--import_handler')
+@click.option('--quarantine', is_flag=True, help="Flag to indicate sessions should be quarantined.")
+@click.option('--trigger_pipelines', is_flag=True, help="Indicate that importing should trigger pipelines.")
+@click.option('--retries', type=int, default=1, help="Number of attempts for every import.")
+@click.pass_context
+def bulk(ctx,
+         manifest,
+         results,
+         workers,
+         destination,
+         import_handler,
+         quarantine,
+         trigger_pipelines,
+         retries):
+    """
+    Import the experiment folders listed in a CSV manifest to XNAT. The manifest
+    has a header and the columns directory, project, subject and experiment.
+    """
+    try:
+        ctx = unpack_context(ctx)
+        jobs = read_import_manifest(manifest)
+        with xnat.connect(ctx.host, user=ctx.user, netrc_file=ctx.netrc, jsession=ctx.jsession,
+                          cli=True, no_parse_model=True, loglevel=ctx.loglevel) as session:
+            import_results = session.services.bulk_import(jobs, max_workers=workers, quarantine=quarantine,
+                                                          destination=destination, trigger_pipelines=trigger_pipelines,
+                                                          import_handler=import_handler, retries=retries)
+
+        if results:
+            with open(results, 'w', newline='') as output:
+                write_import_results(import_results, output)
+        else:
+            write_import_results(import_results, sys.stdout)
+
+        failed = sum(1 for x in import_results if x.error is not None)
+        if failed:
+            click.echo(f"ERROR {failed} of {len(import_results)} imports failed", err=True)
+            exit(1)
+    except exceptions.XNATLoginFailedError:
+        print(f"ERROR Failed to login")
@@ -91,3 +91,59 @@ DEFAULT_SCHEMAS: List[str] = [
     "xdat/instance",
     "xdat/PlexiViewer"
 ]
+
+# Maximum number of schemas that are retrieved concurrently when building the data model
+SCHEMA_RETRIEVAL_WORKERS: int = 8
+
+# Default number of rows requested per page when paginating through a listing
+LISTING_PAGE_SIZE: int = 1000
+
+# Filters the REST API applies server side, per field name of the listing. The
+# value indicates what patterns the server supports: 'exact' only matches
+# literal values, 'wildcard' also supports * in the pattern. All other filters
+# are applied locally after retrieving the listing.
+SERVER_SIDE_FILTERS: Dict[str, Dict[str, str]] = {
+    'projects': {
+        'ID': 'wildcard',
+        'secondary_ID': 'wildcard',
+        'name': 'wildcard',
+    },
+    'subjects': {
+        'ID': 'wildcard',
+        'label': 'wildcard',
+        'project': 'exact',
+    },
+    'experiments': {
+        'ID': 'wildcard',
+        'label': 'wildcard',
+        'project': 'exact',
+        'xsiType': 'exact',
+        'date': 'exact',
+    },
+}
+
+# Default settings of the connection pool of the requests session: the number of
+# hosts to keep a pool for, the maximum number of connections to keep per host and
+# whether to block when all connections of a host are in use
+POOL_CONNECTIONS: int = 10
+POOL_MAXSIZE: int = 32
+POOL_BLOCK: bool = False
+
+# Default maximum number of objects kept by the lru object cache of a session
+OBJECT_CACHE_SIZE: int = 10000
+
+# Default number of files downloaded concurrently by the parallel download methods
+DOWNLOAD_WORKERS: int = 8
+
+# Size of the byte ranges requested concurrently when downloading a single large file
+RANGED_DOWNLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024
+
+# Block size and number of cached blocks of the seekable file objects backed by HTTP Range requests
+RANGE_FILE_BLOCK_SIZE: int = 64 * 1024
+RANGE_FILE_CACHE_BLOCKS: int = 32
+
+# Default number of files uploaded concurrently by the parallel upload methods
+UPLOAD_WORKERS: int = 8
+
+# Default number of directories imported concurrently by the bulk import
+IMPORT_WORKERS: int = 4
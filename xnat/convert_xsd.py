@@ -780,6 +780,9 @@ class ListingPropertyWriter(AttributeWriter):
 
 
 class SchemaParser(object):
+    # Size of the chunks in which schemas are fed to the XML parser
+    CHUNK_SIZE = 65536
+
     def __init__(self, logger, debug=False):
         # Manage XML namespaces
         self.namespaces = {'xnatpy': XNATPY_NAMESPACE}
@@ -798,31 +801,60 @@ class SchemaParser(object):
         self.logger = logger
 
     def parse_schema_xmlstring(self, xml, schema_uri):
-        self.current_schema = schema_uri
-        root = ElementTree.fromstring(xml)
+        """
+        Parse a schema from a string
 
-        # Get the namespaces from the XML document (ElementTree loses them, so
-        # get them by hand) and register them
-        xml_schema_element_match = re.search('<xs:schema([^>]*)>', xml)
+        :param str xml: the text of the schema
+        :param str schema_uri: the uri of the schema
+        :return: flag indicating if the parsing was successful
+        """
+        chunks = (xml[offset:offset + self.CHUNK_SIZE] for offset in range(0, len(xml), self.CHUNK_SIZE))
+        return self.parse_schema_stream(chunks, schema_uri=schema_uri)
 
-        if xml_schema_element_match is None:
-            result = []
-        else:
-            xml_schema_element = xml_schema_element_match.group(1)
-            result = re.findall(r'xmlns:(?P<prefix>\w+)="(?P<ns>\S+)"', xml_schema_element)
+    def parse_schema_file(self, filepath):
+        filepath = os.path.abspath(filepath)
+        filepath = os.path.normpath(filepath)
 
-        for prefix, namespace in result:
-            self.logger.debug('Registering namespace: {}  ->  {}'.format(
-                prefix, namespace)
-            )
-            self.namespace_prefixes[namespace] = prefix
-            self.namespaces[prefix] = namespace
+        schema_uri = 'file://{}'.format(filepath)
 
-        # Register schema as being loaded
-        self.schemas.append(schema_uri)
+        with open(filepath, 'rb') as fin:
+            chunks = iter(lambda: fin.read(self.CHUNK_SIZE), b'')
+            return self.parse_schema_stream(chunks, schema_uri=schema_uri)
 
-        # Parse xml schema
-        self.parse(root, toplevel=True)
+    def parse_schema_stream(self, chunks, schema_uri):
+        """
+        Parse a schema incrementally. The namespaces are collected from the
+        start-ns events and every top-level definition of the schema is parsed
+        as soon as it is read and discarded afterwards, so the full element
+        tree is never kept in memory.
+
+        If the data is not valid XML an ElementTree.ParseError is raised and
+        all classes created from the schema so far are removed again.
+
+        :param chunks: iterable with chunks (str or bytes) of the schema
+        :param str schema_uri: the uri of the schema
+        :return: flag indicating if the parsing was successful
+        """
+        self.current_schema = schema_uri
+        known_classes = set(self.class_list)
+        pull_parser = ElementTree.XMLPullParser(events=('start-ns', 'start', 'end'))
+        state = {'depth': 0, 'root': None}
+
+        try:
+            for chunk in chunks:
+                pull_parser.feed(chunk)
+                self._handle_schema_events(pull_parser.read_events(), state)
+
+            pull_parser.close()
+            self._handle_schema_events(pull_parser.read_events(), state)
+        except ElementTree.ParseError:
+            # Do not keep a partially parsed schema
+            for key in set(self.class_list) - known_classes:
+                del self.class_list[key]
+            if schema_uri in self.schemas:
+                self.schemas.remove(schema_uri)
+            self.current_schema = None
+            raise
 
         if self.debug:
             self.logger.debug('Found {} unknown tags: {}'.format(len(self.unknown_tags),
@@ -831,23 +863,60 @@ class SchemaParser(object):
         self.current_schema = None
         return True
 
-    def parse_schema_file(self, filepath):
-        filepath = os.path.abspath(filepath)
-        filepath = os.path.normpath(filepath)
-
-        schema_uri = 'file://{}'.format(filepath)
-
-        with open(filepath) as fin:
-            data = fin.read()
-
-        self.parse_schema_xmlstring(data, schema_uri=schema_uri)
+    def _handle_schema_events(self, events, state):
+        for event, data in events:
+            if event == 'start-ns':
+                prefix, namespace = data
+                # The default namespace has no prefix to refer to it
+                if prefix:
+                    self.logger.debug('Registering namespace: {}  ->  {}'.format(
+                        prefix, namespace)
+                    )
+                    self.namespace_prefixes[namespace] = prefix
+                    self.namespaces[prefix] = namespace
+            elif event == 'start':
+                if state['depth'] == 0:
+                    state['root'] = data
+                    if data.tag == '{http://www.w3.org/2001/XMLSchema}schema':
+                        # Register schema as being loaded
+                        self.schemas.append(self.current_schema)
+                        self.target_namespace = data.get("targetNamespace", '')
+                state['depth'] += 1
+            elif event == 'end':
+                state['depth'] -= 1
+                root = state['root']
+
+                if state['depth'] == 1 and root.tag == '{http://www.w3.org/2001/XMLSchema}schema':
+                    # A top-level definition is complete, parse and discard it
+                    self._parse_schema_child(data)
+                    root.remove(data)
+                elif state['depth'] == 0 and root.tag != '{http://www.w3.org/2001/XMLSchema}schema':
+                    self.parse(root, toplevel=True)
+
+    def retrieve_schema(self, xnat_session, schema_uri):
+        """
+        Retrieve the text of a schema from the XNAT server without parsing it
 
-    def parse_schema_uri(self, xnat_session, schema_uri):
+        :param xnat_session: the session to use for the request
+        :param str schema_uri: the uri of the schema to retrieve
+        :return: the schema as text
+        :rtype: str
+        """
         self.logger.debug('Retrieving schema from {}'.format(schema_uri))
 
         resp = xnat_session.get(schema_uri, headers={'Accept-Encoding': None})
-        data = resp.text
+        return resp.text
 
+    def parse_schema_data(self, data, schema_uri):
+        """
+        Parse a schema that was previously retrieved, log a sensible
+        message if the data was not a valid schema.
+
+        :param str data: the text of the schema
+        :param str schema_uri: the uri the schema was retrieved from
+        :return: flag indicating if the parsing was successful
+        :rtype: bool
+        """
         try:
             return self.parse_schema_xmlstring(data, schema_uri=schema_uri)
         except ElementTree.ParseError as exception:
@@ -860,10 +929,13 @@ class SchemaParser(object):
                 self.logger.info('Could not parse schema from {}, no valid XML found'.format(schema_uri))
 
                 if self.debug:
-                    self.logger.debug('XML schema request returned the following response: [{}] {}'.format(resp.status_code,
-                                                                                                           data))
+                    self.logger.debug('XML schema request returned the following response: {}'.format(data))
             return False
 
+    def parse_schema_uri(self, xnat_session, schema_uri):
+        data = self.retrieve_schema(xnat_session=xnat_session, schema_uri=schema_uri)
+        return self.parse_schema_data(data, schema_uri=schema_uri)
+
     @staticmethod
     def find_schema_uris(text):
         try:
@@ -876,49 +948,115 @@ class SchemaParser(object):
 
         return schemas
 
+    def dependencies(self, cls):
+        """
+        Get the classes that need to be defined before a class can be defined
+
+        :param ClassPrototype cls: the class to get the dependencies for
+        :return: list of the keys of the classes in the class list
+        """
+        dependencies = []
+        base = cls.base_class
+        if base is not None and not base.startswith('xs:'):
+            dependencies.append(base)
+
+        if cls.parent_class is not None:
+            dependencies.append(cls.parent_class)
+
+        return dependencies
+
     def __iter__(self):
+        """
+        Iterate over the classes in an order such that base and parent classes
+        are always visited before the classes that depend on them. This is a
+        topological sort (Kahn's algorithm) over the base-class and parent-class
+        edges. Classes that are part of a cycle or depend on an unknown class
+        cannot be ordered, these are reported and skipped.
+        """
+        in_degree = {}
+        dependents = collections.defaultdict(list)
+        unknown = {}
+
+        for key, value in self.class_list.items():
+            dependencies = self.dependencies(value)
+            missing = [x for x in dependencies if x not in self.class_list]
+            if missing:
+                unknown[key] = missing
+
+            in_degree[key] = len(dependencies)
+            for dependency in dependencies:
+                dependents[dependency].append(key)
+
+        ready = collections.deque(key for key, degree in in_degree.items() if degree == 0)
         visited = set()
-        nr_previsited = len(visited)
-        tries = 0
-        yielded_anything = True
-        while len(visited) < len(self.class_list) and yielded_anything and tries < 25:
-            if self.debug:
-                self.logger.info(f"============ Iteration {tries} ============")
-            yielded_anything = False
-            for key, value in self.class_list.items():
-                if key in visited:
-                    continue
 
-                base = value.base_class
-                if base is not None and not base.startswith('xs:') and base not in visited:
-                    if self.debug:
-                        self.logger.info("Wait with processing {} because base {} is not yet processed".format(
-                            value.name, base
-                        ))
-                    continue
+        while ready:
+            key = ready.popleft()
+            visited.add(key)
 
-                if value.parent_class is not None and value.parent_class not in visited:
-                    if self.debug:
-                        self.logger.info("Wait with processing {} because parent {} is not yet processed".format(
-                            value.name, value.parent_class
-                        ))
-                    continue
+            value = self.class_list[key]
+            self.logger.debug('Processing {} (base class {})'.format(value.name, value.base_class))
+            yield value
+
+            for dependent in dependents[key]:
+                in_degree[dependent] -= 1
+                if in_degree[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(visited) < len(self.class_list):
+            missed = [x for x in self.class_list if x not in visited]
+
+            for key, missing in unknown.items():
+                self.logger.warning('Cannot define {}, depends on unknown class(es): {}'.format(key, ', '.join(missing)))
 
-                visited.add(key)
-                yielded_anything = True
-                self.logger.debug('Processing {} (base class {})'.format(value.name, value.base_class))
-                yield value
+            for cycle in self.find_cycles(missed):
+                self.logger.error('Found cyclic dependency between classes: {}'.format(' -> '.join(cycle)))
 
-            tries += 1
+            self.logger.info('Missed: {}'.format(sorted(missed)))
 
-        expected = len(self.class_list) + nr_previsited  # We started with two "visited" classes
-        if len(visited) < expected:
-            missed = sorted(set(self.class_list) - visited)
-            self.logger.debug('Visited: {}, expected: {}'.format(len(visited), expected))
-            self.logger.debug('Visited: {}'.format(visited))
-            self.logger.info('Missed: {}'.format(missed))
-            self.logger.info('Missed base class: {}'.format([self.class_list[x].base_class for x in missed]))
-            self.logger.debug('Spent {} iterations'.format(tries))
+    def find_cycles(self, keys):
+        """
+        Find the dependency cycles between a set of classes
+
+        :param keys: the keys of the classes to search
+        :return: list of cycles, every cycle is a list of keys which starts and ends with the same key
+        """
+        keys = set(keys)
+        cycles = []
+        done = set()
+
+        for start in self.class_list:
+            if start not in keys or start in done:
+                continue
+
+            # Follow dependencies depth-first, a key found on the current path closes a cycle
+            path = []
+            on_path = {}
+            stack = [(start, iter(self.dependencies(self.class_list[start])))]
+            on_path[start] = 0
+            path.append(start)
+
+            while stack:
+                key, dependencies = stack[-1]
+                for dependency in dependencies:
+                    if dependency not in keys or dependency in done:
+                        continue
+
+                    if dependency in on_path:
+                        cycles.append(path[on_path[dependency]:] + [dependency])
+                        continue
+
+                    on_path[dependency] = len(path)
+                    path.append(dependency)
+                    stack.append((dependency, iter(self.dependencies(self.class_list[dependency]))))
+                    break
+                else:
+                    stack.pop()
+                    path.pop()
+                    del on_path[key]
+                    done.add(key)
+
+        return cycles
 
     @contextlib.contextmanager
     def _descend(self, new_class=None, new_property=None, property_prefix=None):
@@ -1128,21 +1266,24 @@ class SchemaParser(object):
         self.target_namespace = element.get("targetNamespace", '')
 
         for child in list(element):
-            if child.tag in [
-                '{http://www.w3.org/2001/XMLSchema}complexType',
-                '{http://www.w3.org/2001/XMLSchema}simpleType'
-            ]:
-                self.parse(child)
-            elif child.tag == '{http://www.w3.org/2001/XMLSchema}element':
-                name = child.get('name')
-                type_ = child.get('type')
+            self._parse_schema_child(child)
 
-                if self.debug:
-                    self.logger.debug('Adding {} -> {} to class name map'.format(name, type_))
-                self.class_names[type_] = name
-            else:
-                if self.debug:
-                    self.logger.debug('Skipping non-class top-level tag {}'.format(child.tag))
+    def _parse_schema_child(self, child):
+        if child.tag in [
+            '{http://www.w3.org/2001/XMLSchema}complexType',
+            '{http://www.w3.org/2001/XMLSchema}simpleType'
+        ]:
+            self.parse(child)
+        elif child.tag == '{http://www.w3.org/2001/XMLSchema}element':
+            name = child.get('name')
+            type_ = child.get('type')
+
+            if self.debug:
+                self.logger.debug('Adding {} -> {} to class name map'.format(name, type_))
+            self.class_names[type_] = name
+        else:
+            if self.debug:
+                self.logger.debug('Skipping non-class top-level tag {}'.format(child.tag))
 
     def _parse_sequence(self, element):
         self._parse_children(element)
@@ -1317,7 +1458,16 @@ class SchemaParser(object):
 
                 # Attempt to find listings with simple type
 
-    def write(self, code_file):
+    def write(self, code_file, lazy=False):
+        """
+        Write the generated code to a file
+
+        :param code_file: file object to write the code to
+        :param bool lazy: if True, the classes are not written as code but
+                          the source of each class is stored in the
+                          _CLASS_SOURCES table, so that classes can be created
+                          on demand by a :py:class:`xnat.core.LazyClassLookup`
+        """
         if self.debug:
             self.logger.debug('namespaces: {}'.format(self.namespaces))
             self.logger.debug('namespace prefixes: {}'.format(self.namespace_prefixes))
@@ -1343,4 +1493,22 @@ class SchemaParser(object):
         code_file.write(FILE_HEADER.format(schemas=schemas,
                                            file_secondary_lookup=SECONDARY_LOOKUP_FIELDS['xnat:fileData']))
 
-        code_file.write('\n\n\n'.join(c.tostring().strip() for c in self if c.name is not None))
+        if not lazy:
+            code_file.write('\n\n\n'.join(c.tostring().strip() for c in self if c.name is not None))
+            return
+
+        # Store the sources of the classes with the information required to create them later on
+        code_file.write('# Sources of the classes, these are created on demand by the LazyClassLookup\n')
+        code_file.write('_CLASS_SOURCES = {\n')
+        for cls in self:
+            if cls.name is None:
+                continue
+
+            dependencies = [cls.writer.python_base_class]
+            if cls.parent_class is not None:
+                dependencies.append(cls.writer.python_parent_class)
+
+            code_file.write('    {!r}: (\n        {!r},\n        {!r},\n        {!r},\n    ),\n'.format(
+                cls.writer.python_name, cls.name, dependencies, cls.tostring().strip() + '\n'
+            ))
+        code_file.write('}\n')
@@ -22,14 +22,16 @@ import fnmatch
 import io
 import keyword
 import re
-from functools import update_wrapper
-from typing import Any, Callable, Dict, List, Optional, Union, TYPE_CHECKING
+import threading
+import weakref
+from functools import lru_cache, update_wrapper
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union, TYPE_CHECKING
 
 from . import exceptions
 from .datatypes import convert_from, convert_to
-from .constants import TYPE_HINTS, DATA_FIELD_HINTS
+from .constants import TYPE_HINTS, DATA_FIELD_HINTS, LISTING_PAGE_SIZE, SERVER_SIDE_FILTERS
 from .type_hints import TimeoutType, JSONType
-from .utils import mixedproperty, pythonize_attribute_name
+from .utils import mixedproperty, normalize_uri, pythonize_attribute_name
 from.search import SearchField
 
 try:
@@ -680,8 +682,302 @@ class XNATSubObject(XNATBaseObject):
         self.parent.clearcache()
 
 
+class ListingRegistry(object):
+    """
+    Registry of all listings, used to find the listings that need to be
+    cleared when an object is removed. The listings are only weakly
+    referenced, so the registry does not keep them alive. For every
+    listing the uris of the objects it contains are indexed, so finding
+    the listings that contain an object does not require scanning all
+    listings.
+
+    .. note:: Listings are mappings and therefore not hashable, so they
+              are tracked by their id and a weak reference.
+    """
+    def __init__(self):
+        self._listings = {}
+        self._keys = {}
+        self._index = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._listings)
+
+    def __iter__(self):
+        with self._lock:
+            listings = [ref() for ref in self._listings.values()]
+        return iter([x for x in listings if x is not None])
+
+    @staticmethod
+    def object_key(obj) -> Optional[str]:
+        """
+        Get the key to index an object by, only objects with their own REST
+        uri are indexed (nested and sub objects share the uri of their parent).
+
+        :param obj: the object to get the key for
+        :return: the normalised uri or None if the object should not be indexed
+        """
+        if not isinstance(obj, XNATObject) or obj._uri is None:
+            return None
+        return normalize_uri(obj._uri)
+
+    def register(self, listing: 'XNATBaseListing'):
+        """
+        Add a listing to the registry
+
+        :param listing: the listing to register
+        """
+        listing_id = id(listing)
+        with self._lock:
+            # The callback removes the entries of the listing once it is garbage collected
+            self._listings[listing_id] = weakref.ref(listing, lambda ref: self._remove(listing_id, ref))
+            self._keys[listing_id] = set()
+
+    def index(self, listing: 'XNATBaseListing', objects):
+        """
+        (Re-)index the objects contained in a listing
+
+        :param listing: the listing containing the objects
+        :param objects: iterable of the objects in the listing
+        """
+        self.index_uris(listing, (self.object_key(obj) for obj in objects))
+
+    def index_uris(self, listing: 'XNATBaseListing', uris):
+        """
+        (Re-)index the objects contained in a listing by their uri, this
+        avoids having to create the objects to index them
+
+        :param listing: the listing containing the objects
+        :param uris: iterable of the uris of the objects in the listing
+        """
+        listing_id = id(listing)
+        with self._lock:
+            if listing_id not in self._listings:
+                self.register(listing)
+
+            self._remove_keys(listing_id)
+            keys = self._keys[listing_id]
+            for uri in uris:
+                if uri is None:
+                    continue
+
+                key = normalize_uri(uri)
+                keys.add(key)
+                self._index.setdefault(key, set()).add(listing_id)
+
+    def unindex(self, listing: 'XNATBaseListing'):
+        """
+        Remove the index entries of a listing, e.g. when the cached data of the listing is cleared
+
+        :param listing: the listing to remove from the index
+        """
+        with self._lock:
+            self._remove_keys(id(listing))
+
+    def listings_for(self, obj) -> List['XNATBaseListing']:
+        """
+        Find all listings containing an object
+
+        :param obj: the object to look for
+        :return: list of the listings
+        """
+        key = self.object_key(obj)
+        if key is None:
+            return []
+
+        with self._lock:
+            listings = [self._listings[x]() for x in self._index.get(key, ())]
+        return [x for x in listings if x is not None]
+
+    def contains(self, listing: 'XNATBaseListing', obj) -> bool:
+        """
+        Check if a listing contains an object according to the index
+
+        :param listing: the listing to check
+        :param obj: the object to look for
+        :return: flag indicating if the object is in the listing
+        """
+        key = self.object_key(obj)
+        with self._lock:
+            return key is not None and id(listing) in self._index.get(key, ())
+
+    def _remove_keys(self, listing_id):
+        keys = self._keys.get(listing_id)
+        if not keys:
+            return
+
+        for key in keys:
+            entry = self._index.get(key)
+            if entry is not None:
+                entry.discard(listing_id)
+                if not entry:
+                    del self._index[key]
+        keys.clear()
+
+    def _remove(self, listing_id, ref):
+        with self._lock:
+            # Make sure the id was not re-used for a new listing in the mean time
+            if self._listings.get(listing_id) is not ref:
+                return
+            self._remove_keys(listing_id)
+            del self._listings[listing_id]
+            del self._keys[listing_id]
+
+
+# Split of the filters of a listing in the filters sent to the server and the
+# filters that need to be matched locally
+FilterPlan = namedtuple('FilterPlan', ['server', 'local'])
+
+# Characters that have a special meaning in fnmatch patterns
+_WILDCARD_CHARACTERS = re.compile(r'[*?\[]')
+
+
+@lru_cache(maxsize=256)
+def compile_filter_pattern(pattern: str) -> Callable:
+    """
+    Compile an fnmatch pattern to the match function of the equivalent regex
+
+    :param pattern: the fnmatch pattern
+    :return: match function returning a match object for matching values
+    """
+    return re.compile(fnmatch.translate(pattern)).match
+
+
+def plan_filters(field_name: str, filters: Dict[str, str]) -> FilterPlan:
+    """
+    Determine which filters can be sent to the REST endpoint of a listing and
+    which filters need to be applied locally. A filter is only sent to the
+    server if the endpoint supports the filter and the pattern used, see
+    :py:data:`xnat.constants.SERVER_SIDE_FILTERS`.
+
+    :param field_name: the field name of the listing (e.g. experiments)
+    :param filters: the filters to apply (form of {'variable': 'filter*'})
+    :return: the plan with the server filters (dict) and the local filters
+             (tuple of key and compiled match function pairs)
+    """
+    supported = SERVER_SIDE_FILTERS.get(field_name, {})
+    server = {}
+    local = []
+    for key, pattern in filters.items():
+        support = supported.get(key)
+        special = set(_WILDCARD_CHARACTERS.findall(pattern))
+        if (support == 'wildcard' and special <= {'*'}) or (support == 'exact' and not special):
+            server[key] = pattern
+        else:
+            local.append((key, compile_filter_pattern(pattern)))
+
+    return FilterPlan(server=server, local=tuple(local))
+
+
+def filter_columns(columns: Sequence[str], plan: FilterPlan) -> List[str]:
+    """
+    Add the keys of the local filters of a filter plan to the columns to
+    request, the local filters can only be matched if the rows contain them
+
+    :param columns: the columns requested
+    :param plan: the filter plan
+    :return: the columns to request
+    """
+    columns = list(columns)
+    columns.extend(key for key, _ in plan.local if key not in columns)
+    return columns
+
+
+def apply_local_filters(rows: List[Dict[str, Any]], plan: FilterPlan) -> List[Dict[str, Any]]:
+    """
+    Apply the local filters of a filter plan to a list of rows, a row that
+    does not contain the key of a filter does not match
+
+    :param rows: the rows to filter
+    :param plan: the filter plan
+    :return: list of the rows matching all local filters
+    """
+    if not plan.local:
+        return rows
+
+    return [x for x in rows if all(k in x and match(x[k]) for k, match in plan.local)]
+
+
+# Compact representation of a row in a listing, enough to create the object
+ListingRow = namedtuple('ListingRow', ['uri', 'xsi_type', 'id', 'fieldname', 'secondary_lookup_value'])
+
+
+class LazyObjectTable(object):
+    """
+    Table of listing rows for which the objects are only created when they
+    are first accessed.
+
+    :param rows: list of the rows in the table
+    :param factory: callable creating the object for a row
+    """
+    def __init__(self, rows: List[ListingRow], factory: Callable):
+        self.rows = rows
+        self._factory = factory
+        self._objects = [None] * len(rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def created(self) -> int:
+        """
+        The number of objects created so far
+        """
+        return sum(x is not None for x in self._objects)
+
+    def get(self, index: int):
+        obj = self._objects[index]
+        if obj is None:
+            obj = self._objects[index] = self._factory(self.rows[index])
+        return obj
+
+
+class LazyObjectSequence(Sequence):
+    """
+    Sequence view on a LazyObjectTable
+    """
+    def __init__(self, table: LazyObjectTable):
+        self._table = table
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._table.get(x) for x in range(len(self._table))[index]]
+        return self._table.get(range(len(self._table))[index])
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class LazyObjectMap(Mapping):
+    """
+    Mapping view on a LazyObjectTable, maps keys to the row index
+    """
+    def __init__(self, table: LazyObjectTable, index: Dict[Any, int]):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key):
+        return self._table.get(self._index[key])
+
+    def __contains__(self, key) -> bool:
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
 class XNATBaseListing(Mapping, Sequence, metaclass=ABCMeta):
-    __ALL_LISTINGS__ = []
+    # Registry of all listings, to find the listings containing an object
+    LISTING_REGISTRY = ListingRegistry()
 
     def __init__(self,
                  parent: XNATBaseObject,
@@ -718,7 +1014,7 @@ class XNATBaseListing(Mapping, Sequence, metaclass=ABCMeta):
         self.secondary_lookup_field = secondary_lookup_field
 
         # Register listing
-        self.__ALL_LISTINGS__.append(self)
+        self.LISTING_REGISTRY.register(self)
 
     def sanitize_name(self, name: str) -> str:
         name = re.sub('[^0-9a-zA-Z]+', '_', name)
@@ -832,6 +1128,7 @@ class XNATBaseListing(Mapping, Sequence, metaclass=ABCMeta):
 
     def clearcache(self):
         self._cache.clear()
+        self.LISTING_REGISTRY.unindex(self)
 
     # This needs to be at the end of the class because it shadows the caching
     # decorator for the remainder of the scope.
@@ -855,7 +1152,7 @@ class XNATBaseListing(Mapping, Sequence, metaclass=ABCMeta):
     # in the listings
     @classmethod
     def delete_item_from_listings(cls, obj):
-        for listing in cls.__ALL_LISTINGS__:
+        for listing in cls.LISTING_REGISTRY.listings_for(obj):
             listing.delete_item_from_cache(obj)
 
     def delete_item_from_cache(self, obj):
@@ -864,7 +1161,7 @@ class XNATBaseListing(Mapping, Sequence, metaclass=ABCMeta):
         if data_maps is None:
             return
 
-        if obj in data_maps[0].values() or obj in data_maps[1].values() or obj in data_maps[3]:
+        if self.LISTING_REGISTRY.contains(self, obj):
             self.clearcache()
 
 
@@ -877,6 +1174,7 @@ class XNATListing(XNATBaseListing):
 
         # Manager the filters
         self._used_filters = filter or {}
+        self._filter_plan = plan_filters(self.field_name, self._used_filters)
 
     @property
     def uri(self) -> str:
@@ -885,16 +1183,71 @@ class XNATListing(XNATBaseListing):
     @property
     @caching
     def data_maps(self):
-        columns = 'ID,URI'
+        # Only store compact rows, the objects are created when they are accessed
+        rows = [x for x in map(self._compact_row, self._filter_rows(self._fetch_rows(self._listing_query())))
+                if x is not None]
+        table = LazyObjectTable(rows, self._create_row_object)
+
+        # Create index dictionaries
+        id_index = {}
+        key_index = {}
+        non_unique = {None}
+        for index, row in enumerate(rows):
+            if self.secondary_lookup_field is not None:
+                if row.secondary_lookup_value in key_index:
+                    non_unique.add(row.secondary_lookup_value)
+                key_index[row.secondary_lookup_value] = index
+
+            id_index[row.id] = index
+
+        self.LISTING_REGISTRY.index_uris(self, (row.uri for row in rows))
+
+        return LazyObjectMap(table, id_index), LazyObjectMap(table, key_index), non_unique, LazyObjectSequence(table)
+
+    def __iter__(self):
+        # The rows contain the ID of every object, no need to create the objects
+        return iter(self.data)
+
+    def __contains__(self, item) -> bool:
+        if isinstance(item, int):
+            return -len(self) <= item < len(self)
+
+        if item in self.data:
+            return True
+
+        return item not in self.non_unique_keys and item in self.key_map
+
+    def _listing_query(self):
+        """
+        The query used to retrieve the rows of this listing
+        """
+        columns = ['ID', 'URI']
         if self.secondary_lookup_field is not None:
-            columns = '{},{}'.format(columns, self.secondary_lookup_field)
+            columns.append(self.secondary_lookup_field)
         if self._xsi_type is None:
-            columns += ',xsiType'
+            columns.append('xsiType')
 
-        query = dict(self.used_filters)
-        query['columns'] = columns
-        result = self.xnat_session.get_json(self.uri, query=query)
+        query = dict(self._filter_plan.server)
+        query['columns'] = ','.join(filter_columns(columns, self._filter_plan))
+        return query
 
+    def _fetch_rows(self, query):
+        """
+        Retrieve the rows of this listing from the server
+
+        :param dict query: the query parameters to use
+        :return: list of row dictionaries
+        """
+        return self._process_result(self.xnat_session.get_json(self.uri, query=query))
+
+    def _process_result(self, result):
+        """
+        Extract the rows from the result of a listing query and fix up the
+        rows that miss an ID or URI.
+
+        :param result: the decoded JSON of the query result
+        :return: list of row dictionaries
+        """
         try:
             result = result['ResultSet']['Result']
         except KeyError:
@@ -913,44 +1266,113 @@ class XNATListing(XNATBaseListing):
             else:
                 entry['URI'] = '{}/{}'.format(self.uri, entry['ID'])
 
-        # Post filter result if server side query did not work
-        if self.used_filters:
-            result = [x for x in result if all(fnmatch.fnmatch(x[k], v) for k, v in self.used_filters.items() if k in x)]
+        return result
 
-        # Create object dictionaries
-        id_map = {}
-        key_map = {}
-        listing = []
-        non_unique = {None}
-        for x in result:
-            # HACK: xsi_type of resources is called element_name... yay!
-            xsi_type = x.get('xsiType', x.get('element_name', self._xsi_type)).strip()
-            if x['ID'].strip() == "" or xsi_type == "":
-                self.logger.warning("Found empty object {}, skipping!".format(x.get('URI')))
-                continue
+    def _filter_rows(self, rows):
+        # Only the filters the server does not support need to be matched locally
+        return apply_local_filters(rows, self._filter_plan)
 
-            if self.secondary_lookup_field is not None:
-                secondary_lookup_value = x.get(self.secondary_lookup_field)
-                # Note that if XNAT has the secondary_lookup field with a capital, we want it to be lowercase for
-                # create object argument, as we like python-style names
-                new_object = self.xnat_session.create_object(x['URI'],
-                                                             type_=xsi_type,
-                                                             id_=x['ID'],
-                                                             fieldname=x.get('fieldname'),
-                                                             **{self.secondary_lookup_field.lower(): secondary_lookup_value})
-                if secondary_lookup_value in key_map:
-                    non_unique.add(secondary_lookup_value)
-                key_map[secondary_lookup_value] = new_object
-            else:
-                new_object = self.xnat_session.create_object(x['URI'],
-                                                             type_=xsi_type,
-                                                             id_=x['ID'],
-                                                             fieldname=x.get('fieldname'))
+    def _compact_row(self, row) -> Optional[ListingRow]:
+        """
+        Convert a row of the listing to the compact row containing all that
+        is needed to create the object
 
-            listing.append(new_object)
-            id_map[x['ID']] = new_object
+        :param dict row: the row data
+        :return: the compact row or None if the row is empty
+        """
+        # HACK: xsi_type of resources is called element_name... yay!
+        xsi_type = row.get('xsiType', row.get('element_name', self._xsi_type)).strip()
+        if row['ID'].strip() == "" or xsi_type == "":
+            self.logger.warning("Found empty object {}, skipping!".format(row.get('URI')))
+            return None
 
-        return id_map, key_map, non_unique, listing
+        if self.secondary_lookup_field is not None:
+            secondary_lookup_value = row.get(self.secondary_lookup_field)
+        else:
+            secondary_lookup_value = None
+
+        return ListingRow(uri=row['URI'],
+                          xsi_type=xsi_type,
+                          id=row['ID'],
+                          fieldname=row.get('fieldname'),
+                          secondary_lookup_value=secondary_lookup_value)
+
+    def _create_row_object(self, row: ListingRow):
+        """
+        Create the object for a row of the listing
+
+        :param ListingRow row: the compact row
+        :return: the created object
+        """
+        if self.secondary_lookup_field is not None:
+            # Note that if XNAT has the secondary_lookup field with a capital, we want it to be lowercase for
+            # create object argument, as we like python-style names
+            return self.xnat_session.create_object(row.uri,
+                                                   type_=row.xsi_type,
+                                                   id_=row.id,
+                                                   fieldname=row.fieldname,
+                                                   **{self.secondary_lookup_field.lower(): row.secondary_lookup_value})
+        else:
+            return self.xnat_session.create_object(row.uri,
+                                                   type_=row.xsi_type,
+                                                   id_=row.id,
+                                                   fieldname=row.fieldname)
+
+    def paginate(self, page_size: int = LISTING_PAGE_SIZE):
+        """
+        Iterate over the objects in this listing while retrieving them from the
+        server in pages. In contrast to iterating over the listing itself, this
+        does not retrieve the full listing in a single request and does not
+        build (and cache) the lookup maps for all objects first. Objects are
+        yielded as soon as their page arrives, so the memory use is bounded by
+        the page size (if the session uses an ``lru`` or ``weak`` object cache).
+
+        The pages are requested using the ``offset``, ``limit`` and ``sortBy``
+        query parameters of the REST API. If the server ignores these, the
+        full listing is returned in the first response and its objects are
+        yielded one by one.
+
+        For example::
+
+            >>> for experiment in session.experiments.paginate(page_size=500):
+            ...     print(experiment.label)
+
+        :param int page_size: the number of rows to request per page
+        :return: generator yielding the objects in the listing
+        """
+        if page_size < 1:
+            raise exceptions.XNATValueError('The page size should be a positive integer, found {}'.format(page_size))
+
+        query = self._listing_query()
+        query['sortBy'] = 'ID'
+        query['limit'] = page_size
+
+        offset = 0
+        first_id = None
+        while True:
+            query['offset'] = offset
+            rows = self._fetch_rows(query)
+
+            if offset > 0 and rows and rows[0]['ID'] == first_id:
+                # The server ignored the offset and returned the first page again
+                self.logger.debug('Server ignored the paging parameters for {}'.format(self.uri))
+                return
+
+            if offset == 0 and rows:
+                first_id = rows[0]['ID']
+
+            for row in self._filter_rows(rows):
+                row = self._compact_row(row)
+                if row is not None:
+                    yield self._create_row_object(row)
+
+            # A short page is the last one, a long page means paging is not supported and everything is returned
+            if len(rows) != page_size:
+                if len(rows) > page_size:
+                    self.logger.debug('Server ignored the paging parameters for {}'.format(self.uri))
+                return
+
+            offset += page_size
 
     def _tabulate(self, columns=None, filter=None):
         """
@@ -973,14 +1395,12 @@ class XNATListing(XNATBaseListing):
         else:
             filter = self.merge_filters(self.used_filters, filter)
 
-        query = dict()
-        query['columns'] = ','.join(columns)
+        plan = plan_filters(self.field_name, filter)
+        query = dict(plan.server)
+        query['columns'] = ','.join(filter_columns(columns, plan))
 
         result = self.xnat_session.get_json(self.uri, query=query)
-        result = result['ResultSet']['Result']
-
-        if filter:
-            result = [x for x in result if all(fnmatch.fnmatch(x[k], v) for k, v in filter.items() if k in x)]
+        result = apply_local_filters(result['ResultSet']['Result'], plan)
 
         if len(result) > 0:
 
@@ -1339,3 +1759,245 @@ class XNATSubListing(XNATBaseListing, MutableMapping, MutableSequence):
     def clearcache(self):
         super(XNATSubListing, self).clearcache()
         self.parent.clearcache()
+
+
+class LazyClassLookup(MutableMapping):
+    """
+    Class lookup (xsi type to class) for a generated data model of which the
+    classes are only created when they are first needed. The generated module
+    contains the source of every class instead of the classes themselves, the
+    source of a class (and the classes it depends on) is executed in the
+    namespace of the module on first access.
+
+    :param dict namespace: the namespace (globals) of the generated module
+    :param dict sources: mapping of python class name to a tuple with the
+                         xsi type, names of dependencies and source of the class
+    :param dict initial: lookup entries for classes that already exist
+    :param registered: python class names that should be registered under their xsi type
+    :param str filename: name of the generated file, used in tracebacks
+    """
+    def __init__(self, namespace, sources, initial=None, registered=None, filename='<generated>'):
+        self._namespace = namespace
+        self._sources = sources
+        self._filename = filename
+        self._lookup = dict(initial or {})
+        self._create_hooks = []
+        self._lock = threading.RLock()
+
+        if registered is None:
+            registered = sources.keys()
+
+        self._xsi_types = OrderedDict(
+            (sources[name][0], name) for name in registered if name in sources and sources[name][0] is not None
+        )
+
+    def __repr__(self) -> str:
+        return '<LazyClassLookup {} classes ({} created)>'.format(len(self), len(self._lookup))
+
+    def __getitem__(self, item: str):
+        try:
+            return self._lookup[item]
+        except KeyError:
+            pass
+
+        if item not in self._xsi_types:
+            raise KeyError(item)
+
+        self.create_class(self._xsi_types[item])
+        return self._lookup[item]
+
+    def __setitem__(self, key: str, value):
+        self._lookup[key] = value
+
+    def __delitem__(self, key: str):
+        self._lookup.pop(key, None)
+        self._xsi_types.pop(key, None)
+
+    def __contains__(self, item) -> bool:
+        return item in self._lookup or item in self._xsi_types
+
+    def __iter__(self):
+        yield from self._lookup
+        for key in self._xsi_types:
+            if key not in self._lookup:
+                yield key
+
+    def __len__(self) -> int:
+        return len(self._lookup) + sum(1 for key in self._xsi_types if key not in self._lookup)
+
+    @property
+    def created(self) -> Dict[str, type]:
+        """
+        The classes which are already created, mapped by xsi type
+        """
+        return dict(self._lookup)
+
+    def add_create_hook(self, hook: Callable):
+        """
+        Add a function that will be called for every class registered in the
+        lookup when it is created, with the xsi type and class as arguments.
+        The hook is also called for the classes that are already created.
+        """
+        with self._lock:
+            self._create_hooks.append(hook)
+            for xsi_type, cls in list(self._lookup.items()):
+                hook(xsi_type, cls)
+
+    def create_class(self, name: str) -> type:
+        """
+        Get a class by python name, creating it and its dependencies if needed
+
+        :param name: python name of the class
+        :return: the class
+        """
+        with self._lock:
+            if name in self._namespace:
+                return self._namespace[name]
+
+            if name not in self._sources:
+                raise AttributeError('Generated model has no class {}'.format(name))
+
+            xsi_type, dependencies, source = self._sources[name]
+            for dependency in dependencies:
+                if dependency not in self._namespace and dependency in self._sources:
+                    self.create_class(dependency)
+
+            code = compile(source, '{}:{}'.format(self._filename, name), 'exec')
+            exec(code, self._namespace)
+            cls = self._namespace[name]
+
+            if xsi_type in self._xsi_types and self._xsi_types[xsi_type] == name:
+                cls.__register__(self._lookup)
+                for hook in self._create_hooks:
+                    hook(xsi_type, cls)
+
+            return cls
+
+    def module_getattr(self, name: str):
+        """
+        Function to use as module level ``__getattr__`` for the generated
+        module, so classes can be accessed as attributes of the module.
+        """
+        try:
+            return self.create_class(name)
+        except AttributeError:
+            raise AttributeError("module {!r} has no attribute {!r}".format(self._namespace.get('__name__'), name))
+
+    def module_dir(self) -> List[str]:
+        """
+        Function to use as module level ``__dir__`` for the generated module
+        """
+        return sorted(set(self._namespace) | set(self._sources))
+
+
+class ObjectCache(MutableMapping):
+    """
+    Cache for the objects created by :py:meth:`create_object <xnat.session.BaseXNATSession.create_object>`,
+    mapping ``(uri, fieldname)`` to the object. The cache can use one of the
+    following policies:
+
+    * ``unbounded``: keep every object until the cache is cleared (default)
+    * ``lru``: keep at most ``max_size`` objects, the least recently used objects are evicted first
+    * ``weak``: only keep weak references, objects are dropped when they are no longer used elsewhere
+
+    Evicted objects remain usable, but a new object will be created for the
+    same uri when it is requested again.
+
+    :param str policy: the cache policy to use
+    :param int max_size: maximum number of objects (only used for the lru policy)
+    """
+    POLICIES = ('unbounded', 'lru', 'weak')
+
+    def __init__(self, policy: str = 'unbounded', max_size: Optional[int] = None):
+        if policy not in self.POLICIES:
+            raise exceptions.XNATValueError('Invalid object cache policy {}, should be one of: {}'.format(
+                policy, ', '.join(self.POLICIES)
+            ))
+
+        if policy == 'lru' and (max_size is None or max_size < 1):
+            raise exceptions.XNATValueError('The lru object cache policy requires a max_size of at least 1')
+
+        self.policy = policy
+        self.max_size = max_size if policy == 'lru' else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._data = self._create_storage()
+
+    def __repr__(self) -> str:
+        return '<ObjectCache {} ({} objects, {} hits, {} misses)>'.format(
+            self.policy, len(self), self.hits, self.misses
+        )
+
+    def _create_storage(self):
+        if self.policy == 'weak':
+            return weakref.WeakValueDictionary()
+        return OrderedDict()
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._data[key]
+            if self.policy == 'lru':
+                self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            if self.policy == 'lru':
+                self._data.move_to_end(key)
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __iter__(self):
+        with self._lock:
+            keys = list(self._data.keys())
+        return iter(keys)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def lookup(self, key):
+        """
+        Get an object from the cache and record the hit or miss
+
+        :param key: the key to look up
+        :return: the object or None if it is not in the cache
+        """
+        with self._lock:
+            value = self.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def clear(self):
+        """
+        Remove all objects from the cache, the statistics are retained
+        """
+        with self._lock:
+            self._data = self._create_storage()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """
+        Statistics of the cache use
+        """
+        return {
+            'policy': self.policy,
+            'max_size': self.max_size,
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
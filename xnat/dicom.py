@@ -0,0 +1,165 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Bulk retrieval of DICOM headers. For every experiment a single file listing
+is requested to find the first DICOM file of each scan, after which the
+headers of these files are read concurrently. Only the bytes up to the pixel
+data are transferred if the server supports range requests.
+"""
+
+import re
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Sequence, Tuple
+
+from .constants import DOWNLOAD_WORKERS
+from .utils import RangeRequestsFileLike, RequestsFileLike
+
+try:
+    PYDICOM_LOADED = True
+    import pydicom
+    from pydicom.multival import MultiValue
+    from pydicom.valuerep import PersonName
+except ImportError:
+    PYDICOM_LOADED = False
+
+if TYPE_CHECKING:
+    from .session import BaseXNATSession
+
+# Header fields included if no fields are requested
+DEFAULT_HEADER_FIELDS = (
+    'PatientID',
+    'StudyInstanceUID',
+    'SeriesInstanceUID',
+    'SeriesNumber',
+    'SeriesDescription',
+    'Modality',
+    'Manufacturer',
+    'Rows',
+    'Columns',
+)
+
+# Resources containing the DICOM files of a scan, in order of preference
+DICOM_RESOURCES = ('DICOM', 'secondary')
+
+SCAN_FILE_REGEX = re.compile(r'/scans/(?P<scan>[^/]+)/resources/(?P<resource>[^/]+)/files/(?P<path>.+)$')
+
+# An experiment to read the headers of: a label for the table and the uri of the experiment
+HeaderSource = namedtuple('HeaderSource', ['experiment', 'uri'])
+
+
+def first_scan_files(rows: Iterable[Dict[str, str]]) -> Dict[str, str]:
+    """
+    Select the first DICOM file of every scan from a file listing of an experiment
+
+    :param rows: the rows of the ``scans/ALL/files`` listing
+    :return: mapping of the scan id to the uri of the first file
+    """
+    candidates = {}
+    for row in rows:
+        match = SCAN_FILE_REGEX.search(row['URI'])
+        if match is None:
+            continue
+
+        resource = row.get('collection') or match.group('resource')
+        if resource not in DICOM_RESOURCES:
+            continue
+
+        key = (DICOM_RESOURCES.index(resource), match.group('path'))
+        scan = match.group('scan')
+        if scan not in candidates or key < candidates[scan][0]:
+            candidates[scan] = (key, row['URI'])
+
+    return OrderedDict((scan, candidates[scan][1]) for scan in sorted(candidates, key=_scan_sort_key))
+
+
+def _scan_sort_key(scan: str):
+    return (0, int(scan), scan) if scan.isdigit() else (1, 0, scan)
+
+
+def convert_value(value):
+    """
+    Convert a pydicom value to a plain Python value
+    """
+    if isinstance(value, MultiValue):
+        return [convert_value(x) for x in value]
+    if isinstance(value, PersonName):
+        return str(value)
+    return value
+
+
+def read_header(xnat_session: 'BaseXNATSession', uri: str, fields: Sequence[str]) -> Dict[str, object]:
+    """
+    Read the header fields of a remote DICOM file, only the bytes up to the
+    pixel data are read
+
+    :param xnat_session: the session to use
+    :param uri: the uri of the DICOM file
+    :param fields: the keywords of the fields to read
+    :return: mapping of the keyword to the value (None if not present)
+    """
+    file_like = RangeRequestsFileLike.from_uri(xnat_session, uri)
+    if file_like is None:
+        file_like = RequestsFileLike(xnat_session.interface.get(xnat_session._format_uri(uri), stream=True))
+
+    with file_like:
+        header = pydicom.dcmread(file_like, stop_before_pixels=True, force=True)
+
+    return {field: convert_value(header.get(field)) for field in fields}
+
+
+def harvest_headers(xnat_session: 'BaseXNATSession',
+                    sources: Iterable[HeaderSource],
+                    fields: Optional[Sequence[str]] = None,
+                    max_workers: int = DOWNLOAD_WORKERS) -> Tuple[tuple, ...]:
+    """
+    Read the DICOM header of the first file of every scan of a number of
+    experiments. Both the file listings of the experiments and the headers
+    are retrieved concurrently.
+
+    :param xnat_session: the session to use
+    :param sources: the experiments to read the headers of
+    :param fields: the keywords of the header fields to include, defaults to
+                   :py:data:`DEFAULT_HEADER_FIELDS`
+    :param max_workers: the maximum number of concurrent requests
+    :return: table as a tuple of named tuples with the experiment, scan, uri and
+             error (None if the header was read) followed by the requested fields
+    """
+    if not PYDICOM_LOADED:
+        raise RuntimeError('Cannot read DICOM, missing required dependency: pydicom')
+
+    fields = tuple(fields) if fields is not None else DEFAULT_HEADER_FIELDS
+    rowtype = namedtuple('DicomHeaderRow', ('experiment', 'scan', 'uri', 'error') + fields)
+    sources = list(sources)
+
+    def list_files(source):
+        rows = xnat_session.get_json(source.uri + '/scans/ALL/files')['ResultSet']['Result']
+        return source, first_scan_files(rows)
+
+    def read_row(experiment, scan, uri):
+        try:
+            values = read_header(xnat_session, uri, fields)
+        except Exception as exception:
+            xnat_session.logger.warning('Could not read DICOM header of {}: {}'.format(uri, exception))
+            return rowtype(experiment, scan, uri, str(exception), *([None] * len(fields)))
+        return rowtype(experiment, scan, uri, None, *(values[x] for x in fields))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='XNATpyHeaders') as executor:
+        listings = list(executor.map(list_files, sources))
+        futures = [executor.submit(read_row, source.experiment, scan, uri)
+                   for source, scan_files in listings
+                   for scan, uri in scan_files.items()]
+        return tuple(x.result() for x in futures)
@@ -0,0 +1,561 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Download many files concurrently. Every file is downloaded with its own
+request directly to its final location, the requests share the connection
+pool of the session so kept-alive connections are re-used.
+
+Downloads are written to a partial file first, next to which a small state
+file records the validators (``ETag``, ``Last-Modified`` and size) of the
+response. An interrupted download is resumed with a ``Range`` request that
+is only honoured by the server if the file did not change in the meantime.
+"""
+
+import json
+import os
+import re
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib import parse
+
+from progressbar import AdaptiveETA, AdaptiveTransferSpeed, Bar, BouncingBar, \
+    DataSize, Percentage, ProgressBar, UnknownLength
+
+from . import exceptions
+from .archive import download_extract_zip
+from .constants import DOWNLOAD_WORKERS, RANGED_DOWNLOAD_CHUNK_SIZE
+from .utils import probe_range_support, range_validator
+
+if TYPE_CHECKING:
+    from .session import BaseXNATSession
+
+# A file to download: the uri to download from, the path to write to and the
+# expected size (None if unknown)
+DownloadItem = namedtuple('DownloadItem', ['uri', 'target', 'size'])
+
+# Suffix of files that are being downloaded, they are moved in place once complete
+PARTIAL_SUFFIX = '.part'
+
+# Suffix of the state file stored next to a partial file
+STATE_SUFFIX = '.json'
+
+CONTENT_RANGE_REGEX = re.compile(r'^bytes\s+(?:(\d+)-(\d+)|\*)/(\d+|\*)$')
+
+
+def default_update_func(total) -> Callable[[str, str, bool], None]:
+    """
+    Set up a default update function to be used by the
+    :class:`Session.download_stream` method. This function configures a
+    ``progressbar.ProgressBar`` object which displays progress as a file
+    is downloaded.
+
+    :param int total: Total number of bytes to be downloaded (might be
+                      ``None``)
+
+    :returns: A function to be used as the ``update_func`` by the
+              ``Session.download_stream`` method.
+    """
+
+    if total is not None:
+        widgets = [
+            Percentage(),
+            ' of ', DataSize('max_value'),
+            ' ', Bar(),
+            ' ', AdaptiveTransferSpeed(),
+            ' ', AdaptiveETA(),
+        ]
+    else:
+        total = UnknownLength
+        widgets = [
+            DataSize(),
+            ' ', BouncingBar(),
+            ' ', AdaptiveTransferSpeed(),
+        ]
+
+    progress_bar = ProgressBar(widgets=widgets, max_value=total)
+
+    # The real update function which gets called by download_stream
+    def do_update(nbytes, total, finished, progress_bar=progress_bar):
+
+        if nbytes == 0:
+            progress_bar.start()
+        elif finished:
+            progress_bar.finish()
+        else:
+            progress_bar.update(nbytes)
+
+    return do_update
+
+
+def parse_content_range(value: Optional[str]) -> Optional[Tuple[Optional[int], Optional[int], Optional[int]]]:
+    """
+    Parse the value of a Content-Range header
+
+    :param value: the header value, e.g. ``bytes 100-199/1000``
+    :return: tuple with the first byte, last byte and total size (any of which can
+             be None if not given) or None if the value cannot be parsed
+    """
+    if value is None:
+        return None
+
+    match = CONTENT_RANGE_REGEX.match(value.strip())
+    if match is None:
+        return None
+
+    first, last, total = match.groups()
+    return (int(first) if first is not None else None,
+            int(last) if last is not None else None,
+            int(total) if total != '*' else None)
+
+
+def response_size(response, offset: int = 0) -> Optional[int]:
+    """
+    Get the size of the complete file from a (partial) response
+
+    :param response: the response
+    :param offset: the offset requested with a Range header
+    :return: the size in bytes or None if unknown
+    """
+    if response.status_code == 206:
+        content_range = parse_content_range(response.headers.get('Content-Range'))
+        if content_range is not None and content_range[2] is not None:
+            return content_range[2]
+    else:
+        offset = 0
+
+    if response.headers.get('Content-Encoding', 'identity').lower() != 'identity':
+        # The length is that of the encoded data, not of the file
+        return None
+
+    content_length = response.headers.get('Content-Length')
+    if content_length is None or not content_length.isdigit():
+        return None
+
+    return offset + int(content_length)
+
+
+def can_resume(state: Optional[dict]) -> bool:
+    """
+    Check if a partial download can be resumed. This needs a validator or the
+    size of the file to check the data against, without them (e.g. for zips
+    that are generated for every request) the partial data cannot be trusted.
+
+    :param state: the state of the partial download
+    :return: flag indicating the download can be resumed
+    """
+    return state is not None and (state.get('validator') is not None or state.get('size') is not None)
+
+
+def read_download_state(partial_target: str) -> Optional[dict]:
+    """
+    Read the state of a partial download
+
+    :param partial_target: the path of the partial file
+    :return: the state or None if the partial file cannot be resumed
+    """
+    if not os.path.isfile(partial_target):
+        return None
+
+    try:
+        with open(partial_target + STATE_SUFFIX) as state_file:
+            state = json.load(state_file)
+    except (OSError, ValueError):
+        return None
+
+    return state if isinstance(state, dict) and can_resume(state) else None
+
+
+def write_download_state(partial_target: str, state: dict):
+    with open(partial_target + STATE_SUFFIX, 'w') as state_file:
+        json.dump(state, state_file)
+
+
+def remove_download_state(partial_target: str):
+    for path in (partial_target, partial_target + STATE_SUFFIX):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class DownloadProgress(object):
+    """
+    Combines the progress of concurrent downloads into a single progress
+    callback, with the same signature as the ``update_func`` of
+    :py:meth:`BaseXNATSession.download_stream <xnat.session.BaseXNATSession.download_stream>`:
+    the number of bytes downloaded so far, the total number of bytes (None if
+    unknown) and a flag indicating that all downloads are finished.
+
+    :param update_func: the callback to call with the combined progress
+    :param total: the total number of bytes to download (None if unknown)
+    """
+    def __init__(self, update_func: Optional[Callable[[int, Optional[int], bool], None]], total: Optional[int]):
+        self.update_func = update_func
+        self.total = total
+        self.bytes_done = 0
+        self.files_done = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.update_func is not None:
+            self.update_func(0, self.total, False)
+
+    def finish(self):
+        if self.update_func is not None:
+            self.update_func(self.bytes_done, self.total, True)
+
+    def file_callback(self) -> Callable[[int, Optional[int], bool], None]:
+        """
+        Create the update function for a single download
+        """
+        state = {'bytes': 0}
+
+        def update(nbytes, total, finished):
+            with self._lock:
+                self.bytes_done += nbytes - state['bytes']
+                state['bytes'] = nbytes
+                if finished:
+                    self.files_done += 1
+                bytes_done = self.bytes_done
+
+            if self.update_func is not None and nbytes > 0:
+                self.update_func(bytes_done, self.total, False)
+
+        return update
+
+
+def download_file(xnat_session: 'BaseXNATSession',
+                  item: DownloadItem,
+                  update_func: Optional[Callable[[int, Optional[int], bool], None]] = None):
+    """
+    Download a single file to its target, the data is written to a partial
+    file first which is moved in place once the download is complete. A
+    partial file left by an earlier attempt is resumed.
+
+    :param xnat_session: the session to use
+    :param item: the file to download
+    :param update_func: progress callback for the download
+    """
+    target_dir = os.path.dirname(item.target)
+    if target_dir:
+        os.makedirs(target_dir, exist_ok=True)
+
+    xnat_session.download(item.uri, item.target, verbose=False, resume=True, update_func=update_func)
+
+    if item.size is not None and os.path.getsize(item.target) != item.size:
+        actual_size = os.path.getsize(item.target)
+        os.remove(item.target)
+        raise exceptions.XNATIOError('Downloaded size of {} does not match expected size ({} != {})'.format(
+            item.uri, actual_size, item.size
+        ))
+
+
+def download_files(xnat_session: 'BaseXNATSession',
+                   items: Iterable[DownloadItem],
+                   max_workers: int = DOWNLOAD_WORKERS,
+                   update_func: Optional[Callable[[int, Optional[int], bool], None]] = None) -> List[str]:
+    """
+    Download files concurrently using a pool of threads
+
+    :param xnat_session: the session to use
+    :param items: the files to download
+    :param max_workers: the maximum number of concurrent downloads
+    :param update_func: shared progress callback, see :py:class:`DownloadProgress`
+    :return: list of the paths of the downloaded files
+    :raises XNATIOError: if any of the downloads failed (after all other downloads finished)
+    """
+    items = list(items)
+    sizes = [x.size for x in items]
+    total = sum(sizes) if None not in sizes else None
+
+    progress = DownloadProgress(update_func, total)
+    progress.start()
+
+    failures = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='XNATpyDownload') as executor:
+            futures = [(item, executor.submit(download_file, xnat_session, item, progress.file_callback()))
+                       for item in items]
+
+            for item, future in futures:
+                exception = future.exception()
+                if exception is not None:
+                    xnat_session.logger.error('Failed to download {}: {}'.format(item.uri, exception))
+                    failures.append((item, exception))
+    finally:
+        progress.finish()
+
+    if failures:
+        raise exceptions.XNATIOError('Failed to download {} of {} files, first error for {}: {}'.format(
+            len(failures), len(items), failures[0][0].uri, failures[0][1]
+        )) from failures[0][1]
+
+    return [x.target for x in items]
+
+
+class RangeNotSupported(Exception):
+    """
+    Raised when the server does not honour a range request
+    """
+
+
+def download_range(xnat_session: 'BaseXNATSession',
+                   uri: str,
+                   partial_target: str,
+                   first: int,
+                   last: int,
+                   validator: str,
+                   update_func: Callable[[int, Optional[int], bool], None],
+                   timeout=None):
+    """
+    Download a byte range of a file into its place in a partial file
+
+    :param xnat_session: the session to use
+    :param uri: the uri of the file
+    :param partial_target: the (pre-allocated) partial file to write to
+    :param first: the first byte of the range
+    :param last: the last byte of the range (inclusive)
+    :param validator: the validator for the If-Range header
+    :param update_func: progress callback for the range
+    :param timeout: timeout in seconds, float or (connection timeout, read timeout)
+    :raises RangeNotSupported: if the server did not send the requested range
+    """
+    response = xnat_session.get(uri,
+                                accepted_status=[200, 206],
+                                timeout=timeout,
+                                headers={'Range': 'bytes={}-{}'.format(first, last), 'If-Range': validator})
+
+    content_range = parse_content_range(response.headers.get('Content-Range'))
+    if response.status_code != 206 or content_range is None or content_range[:2] != (first, last):
+        raise RangeNotSupported('Server did not honour range {}-{} of {}'.format(first, last, uri))
+
+    data = response.content
+    if len(data) != last - first + 1:
+        raise exceptions.XNATIOError('Received {} bytes for range {}-{} of {}'.format(len(data), first, last, uri))
+
+    with open(partial_target, 'r+b') as target_stream:
+        target_stream.seek(first)
+        target_stream.write(data)
+
+    update_func(len(data), len(data), True)
+
+
+def download_ranged(xnat_session: 'BaseXNATSession',
+                    uri: str,
+                    target: str,
+                    chunk_size: int = RANGED_DOWNLOAD_CHUNK_SIZE,
+                    max_workers: int = DOWNLOAD_WORKERS,
+                    verbose: bool = False,
+                    update_func: Optional[Callable[[int, Optional[int], bool], None]] = None,
+                    timeout=None) -> bool:
+    """
+    Download a single file using concurrent range requests. This is only done
+    if the server advertises range support and offers a validator that
+    guarantees all ranges come from the same version of the file, and if the
+    file spans at least two chunks.
+
+    :param xnat_session: the session to use
+    :param uri: the uri of the file
+    :param target: the path to write the file to
+    :param chunk_size: the size of the ranges requested
+    :param max_workers: the maximum number of concurrent requests
+    :param verbose: show progress if no update_func is given
+    :param update_func: combined progress callback, see :py:class:`DownloadProgress`
+    :param timeout: timeout in seconds, float or (connection timeout, read timeout)
+    :return: flag indicating if the file was downloaded, if False the caller should
+             fall back to a normal download
+    """
+    probe = probe_range_support(xnat_session, uri)
+    if probe is None:
+        return False
+
+    size, validator = probe
+    if validator is None or size < 2 * chunk_size:
+        return False
+
+    if update_func is None and verbose:
+        update_func = default_update_func(size)
+
+    target = str(target)
+    target_dir = os.path.dirname(target)
+    if target_dir:
+        os.makedirs(target_dir, exist_ok=True)
+
+    partial_target = target + PARTIAL_SUFFIX
+    with open(partial_target, 'wb') as target_stream:
+        target_stream.truncate(size)
+
+    progress = DownloadProgress(update_func, size)
+    progress.start()
+    futures = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='XNATpyDownload') as executor:
+            for first in range(0, size, chunk_size):
+                last = min(first + chunk_size, size) - 1
+                futures.append(executor.submit(download_range, xnat_session, uri, partial_target,
+                                               first, last, validator, progress.file_callback(), timeout))
+
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        os.replace(partial_target, target)
+    except RangeNotSupported as exception:
+        xnat_session.logger.info('{}, falling back to a normal download'.format(exception))
+        os.remove(partial_target)
+        return False
+    except BaseException:
+        if os.path.exists(partial_target):
+            os.remove(partial_target)
+        raise
+    finally:
+        progress.finish()
+
+    return True
+
+
+# A zip download job for the DownloadScheduler: a description for progress
+# messages, the uri to download as zip and the directory to extract it in
+DownloadJob = namedtuple('DownloadJob', ['description', 'uri', 'target_dir'])
+
+
+class DownloadScheduler(object):
+    """
+    Runs zip download jobs (e.g. the experiments or scans of a project)
+    concurrently. Every job downloads a zip and extracts it in its target
+    directory while downloading; if the file listing of a job is empty only
+    the target directory is created. Failing jobs do not abort the other jobs,
+    the failures are collected and reported once all jobs are finished.
+
+    :param xnat_session: the session to use
+    :param max_workers: the maximum number of concurrent jobs
+    :param max_per_host: the maximum number of concurrent jobs per host (None for no limit)
+    :param update_func: combined byte progress callback, see :py:class:`DownloadProgress`
+    :param progress_callback: function called with a progress string after each job
+    """
+    def __init__(self,
+                 xnat_session: 'BaseXNATSession',
+                 max_workers: int = DOWNLOAD_WORKERS,
+                 max_per_host: Optional[int] = None,
+                 update_func: Optional[Callable[[int, Optional[int], bool], None]] = None,
+                 progress_callback: Optional[Callable[[str], None]] = None):
+        self.xnat_session = xnat_session
+        self.max_workers = max(1, max_workers)
+        self.max_per_host = max_per_host
+        self.update_func = update_func
+        self.progress_callback = progress_callback
+        self.jobs: List[DownloadJob] = []
+        self.failures: List[Tuple[DownloadJob, BaseException]] = []
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._jobs_done = 0
+
+    def add(self, description: str, uri: str, target_dir: str) -> DownloadJob:
+        """
+        Add a job to the queue
+
+        :param description: description of the job used in progress messages
+        :param uri: the uri of the file listing to download as zip
+        :param target_dir: the directory to extract the zip in
+        :return: the job
+        """
+        job = DownloadJob(description=description, uri=uri, target_dir=target_dir)
+        self.jobs.append(job)
+        return job
+
+    def _host_limit(self, uri: str) -> Optional[threading.BoundedSemaphore]:
+        if self.max_per_host is None:
+            return None
+
+        host = parse.urlparse(self.xnat_session._format_uri(uri)).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_limits[host]
+
+    def _run_job(self, job: DownloadJob, update_func: Callable[[int, Optional[int], bool], None]):
+        host_limit = self._host_limit(job.uri)
+        if host_limit is not None:
+            host_limit.acquire()
+
+        try:
+            # XNAT cannot create a zip without files, so check the listing first
+            file_list = self.xnat_session.get_json(job.uri)
+            if len(file_list['ResultSet']['Result']) == 0:
+                os.makedirs(job.target_dir, exist_ok=True)
+                return
+
+            download_extract_zip(self.xnat_session, job.uri, job.target_dir, update_func=update_func)
+        finally:
+            if host_limit is not None:
+                host_limit.release()
+
+    def _job_finished(self, job: DownloadJob, exception: Optional[BaseException]):
+        with self._lock:
+            self._jobs_done += 1
+            if exception is not None:
+                self.failures.append((job, exception))
+            jobs_done = self._jobs_done
+
+        if exception is not None:
+            self.xnat_session.logger.error('Failed to download {}: {}'.format(job.description, exception))
+
+        if self.progress_callback is not None:
+            self.progress_callback('{} {} ({} of {})'.format(
+                'Failed' if exception is not None else 'Downloaded',
+                job.description,
+                jobs_done,
+                len(self.jobs)
+            ))
+
+    def run(self) -> List[DownloadJob]:
+        """
+        Run all queued jobs
+
+        :return: the jobs that were run
+        :raises XNATIOError: if any of the jobs failed (after all other jobs finished),
+                             the failures are available in :py:attr:`failures`
+        """
+        progress = DownloadProgress(self.update_func, None)
+        progress.start()
+        self.failures = []
+        self._jobs_done = 0
+
+        def run_job(job, update_func):
+            try:
+                self._run_job(job, update_func)
+            except Exception as exception:
+                self._job_finished(job, exception)
+            else:
+                self._job_finished(job, None)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='XNATpyScheduler') as executor:
+                for job in self.jobs:
+                    executor.submit(run_job, job, progress.file_callback())
+        finally:
+            progress.finish()
+
+        if self.failures:
+            raise exceptions.XNATIOError('Failed to download {} of {} jobs, first error for {}: {}'.format(
+                len(self.failures), len(self.jobs), self.failures[0][0].description, self.failures[0][1]
+            )) from self.failures[0][1]
+
+        return list(self.jobs)
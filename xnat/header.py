@@ -23,8 +23,10 @@ from zipfile import ZipFile  # Needed by generated code
 from io import BytesIO  # Needed by generated code
 
 from xnat import search, mixin
+from xnat.constants import DOWNLOAD_WORKERS
 from xnat.core import XNATObject, XNATNestedObject, XNATSubObject, XNATListing, XNATSimpleListing, XNATSubListing, caching
-from xnat.utils import mixedproperty, RequestsFileLike
+from xnat.download import PARTIAL_SUFFIX, download_ranged, read_download_state
+from xnat.utils import mixedproperty, RangeRequestsFileLike, RequestsFileLike
 
 try:
     PYDICOM_LOADED = True
@@ -102,13 +104,43 @@ class FileData(XNATObjectMixin):
     def delete(self):
         self.xnat_session.delete(self.uri)
 
-    def download(self, *args, **kwargs):
-        self.xnat_session.download(self.uri, *args, **kwargs)
+    def download(self, target, format=None, verbose=True, timeout=None, resume=False, parallel=False,
+                 max_workers=DOWNLOAD_WORKERS):
+        """
+        Download the file to a target path. With ``parallel`` large files are
+        downloaded using concurrent range requests if the server supports them,
+        this costs an extra HEAD request. Otherwise (or if a partial download
+        can be resumed) a single resumable download is used.
+
+        :param target: path of the file to write to
+        :param format: request format
+        :param verbose: show progress
+        :param timeout: timeout in seconds, float or (connection timeout, read timeout)
+        :param resume: resume an interrupted download of the file
+        :param parallel: use concurrent range requests for large files
+        :param max_workers: the maximum number of concurrent range requests
+        """
+        target = str(target)
+        if parallel and format is None and read_download_state(target + PARTIAL_SUFFIX) is None:
+            if download_ranged(self.xnat_session, self.uri, target, max_workers=max_workers,
+                               verbose=verbose, timeout=timeout):
+                return
+
+        self.xnat_session.download(self.uri, target, format=format, verbose=verbose, timeout=timeout, resume=resume)
 
     def download_stream(self, *args, **kwargs):
-        self.xnat_session.download_stream(self.uri, *args, **kwargs)
-
-    def open(self):
+        return self.xnat_session.download_stream(self.uri, *args, **kwargs)
+
+    def open(self, random_access=True):
+        """
+        Open the file for reading. If the file is not available on a mounted
+        filesystem, it is read over HTTP. With ``random_access`` (and a server
+        supporting range requests) only the parts of the file that are read
+        are transferred, otherwise the file is streamed from the start.
+
+        :param bool random_access: use range requests if possible
+        :return: a binary file-like object
+        """
         data_path = self.data_path
 
         if data_path is not None:
@@ -117,6 +149,11 @@ class FileData(XNATObjectMixin):
         else:
             self.logger.info('Opening file over http!')
 
+        if random_access:
+            file_like = RangeRequestsFileLike.from_uri(self.xnat_session, self.uri)
+            if file_like is not None:
+                return file_like
+
         uri = self.xnat_session._format_uri(self.uri)
         request = self.xnat_session.interface.get(uri, stream=True)
         return RequestsFileLike(request)
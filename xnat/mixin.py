@@ -15,15 +15,20 @@
 
 import os
 from pathlib import Path
+import re
 import tempfile
-from zipfile import ZipFile
-import tarfile
 import shutil
-from typing import Optional, Union, IO
+from typing import Callable, Iterable, Optional, Union, IO
 
 from io import BytesIO
 
+from .archive import download_extract_zip, stream_tar, write_tar
+from .constants import DOWNLOAD_WORKERS, UPLOAD_WORKERS
 from .core import caching, XNATBaseObject, XNATListing
+from .dicom import HeaderSource, harvest_headers
+from .download import DownloadItem, DownloadScheduler, default_update_func, download_files
+from .sync import SyncSource, sync_sources
+from .upload import UploadItem, upload_files
 from .search import SearchField
 from .users import Users
 from .utils import mixedproperty, pythonize_attribute_name
@@ -36,6 +41,18 @@ except ImportError:
     PYDICOM_LOADED = False
 
 
+def _create_scheduler(xnat_session, verbose, progress_callback, max_workers, max_per_host):
+    update_func = None
+    if verbose:
+        update_func = default_update_func(None)
+
+    return DownloadScheduler(xnat_session,
+                             max_workers=max_workers,
+                             max_per_host=max_per_host,
+                             update_func=update_func,
+                             progress_callback=progress_callback)
+
+
 class ProjectData(XNATBaseObject):
     SECONDARY_LOOKUP_FIELD = 'name'
     FROM_SEARCH_URI = '{session_uri}/projects/{id}'
@@ -107,7 +124,8 @@ class ProjectData(XNATBaseObject):
 
         return resource
 
-    def download_dir(self, target_dir, verbose=True, progress_callback=None):
+    def download_dir(self, target_dir, verbose=True, progress_callback=None, max_workers=DOWNLOAD_WORKERS,
+                     max_per_host=None, per_scan=False):
         """
         Download the entire project and unpack it in a given directory. Note
         that this method will create a directory structure following
@@ -115,26 +133,77 @@ class ProjectData(XNATBaseObject):
         and unzip the experiment zips as given by XNAT into that. If
         the $target_dir/{project.name} does not exist, it will be created.
 
+        The experiments (or scans) are downloaded concurrently using a
+        :py:class:`xnat.download.DownloadScheduler`, a failed download does
+        not stop the other downloads.
+
         :param str target_dir: directory to create project directory in
         :param bool verbose: show progress
         :param progress_callback: function to call with progress string
                                   should be a function with one argument
+        :param int max_workers: the number of concurrent downloads
+        :param int max_per_host: the maximum number of concurrent downloads per host
+        :param bool per_scan: download every scan separately instead of every experiment
+        :raises XNATIOError: if any of the downloads failed
         """
 
         project_dir = os.path.join(target_dir, self.name)
         if not os.path.isdir(project_dir):
             os.mkdir(project_dir)
 
-        number_of_subjects = len(self.subjects)
+        scheduler = _create_scheduler(self.xnat_session, verbose, progress_callback, max_workers, max_per_host)
+        for subject in self.subjects.values():
+            subject._schedule_download(scheduler, os.path.join(project_dir, subject.label), per_scan=per_scan)
+        scheduler.run()
 
-        for n, subject in enumerate(self.subjects.values(), start=1):
-            if progress_callback:
-                progress_callback("Downloading subject {} of {}".format(n, number_of_subjects))
+        if verbose:
+            self.logger.info('Downloaded project to {}'.format(project_dir))
 
-            subject.download_dir(project_dir, verbose=verbose, progress_callback=progress_callback)
+    def sync_dir(self, target_dir, delete=False, verbose=True, max_workers=DOWNLOAD_WORKERS):
+        """
+        Synchronise the files of the project to $target_dir/{project.name},
+        only files that are missing locally or changed in XNAT are downloaded.
+        The files of each experiment are placed in
+        $target_dir/{project.name}/{subject.label}/{experiment.label} using
+        their path within the experiment (e.g. scans/1/resources/DICOM/files/1.dcm).
+        See :py:mod:`xnat.sync` for details.
+
+        :param str target_dir: directory to create project directory in
+        :param bool delete: remove previously synchronised files that no longer exist in XNAT
+        :param bool verbose: show progress
+        :param int max_workers: the number of concurrent downloads
+        :return: the result of the synchronisation
+        :rtype: xnat.sync.SyncResult
+        """
+        project_dir = os.path.join(target_dir, self.name)
+        result = sync_sources(self.xnat_session, self._sync_sources(''), project_dir,
+                              delete=delete, max_workers=max_workers, verbose=verbose)
 
         if verbose:
-            self.logger.info('Downloaded project to {}'.format(project_dir))
+            self.logger.info('Synchronised project to {}: {} files downloaded, {} unchanged, {} deleted'.format(
+                project_dir, len(result.downloaded), len(result.unchanged), len(result.deleted)
+            ))
+        return result
+
+    def dicom_headers(self, fields=None, max_workers=DOWNLOAD_WORKERS):
+        """
+        Read the DICOM header of the first file of every scan in all image
+        sessions of the project. The file listings and headers are retrieved
+        concurrently and only the bytes up to the pixel data are transferred
+        (if the server supports range requests). See
+        :py:func:`xnat.dicom.harvest_headers`.
+
+        :param list fields: the keywords of the header fields to include
+        :param int max_workers: the maximum number of concurrent requests
+        :return: table as a tuple of named tuples, one per scan
+        """
+        sources = [HeaderSource(experiment=experiment.label, uri=experiment.fulluri)
+                   for experiment in self.experiments.values() if isinstance(experiment, ImageSessionData)]
+        return harvest_headers(self.xnat_session, sources, fields=fields, max_workers=max_workers)
+
+    def _sync_sources(self, prefix):
+        for subject in self.subjects.values():
+            yield from subject._sync_sources('/'.join(x for x in (prefix, subject.label) if x))
 
     def cli_str(self):
         return "Project {name}: id={id}, full URI:{uri}".format(name=self.name, id=self.id, uri=self.fulluri)
@@ -212,7 +281,8 @@ class SubjectData(XNATBaseObject):
                            secondary_lookup_field='Name',
                            xsi_type='xnat:fileData')
 
-    def download_dir(self, target_dir, verbose=True, progress_callback=None):
+    def download_dir(self, target_dir, verbose=True, progress_callback=None, max_workers=DOWNLOAD_WORKERS,
+                     max_per_host=None, per_scan=False):
         """
         Download the entire subject and unpack it in a given directory. Note
         that this method will create a directory structure following
@@ -220,25 +290,79 @@ class SubjectData(XNATBaseObject):
         and unzip the experiment zips as given by XNAT into that. If
         the $target_dir/{subject.label} does not exist, it will be created.
 
+        The experiments (or scans) are downloaded concurrently using a
+        :py:class:`xnat.download.DownloadScheduler`, a failed download does
+        not stop the other downloads.
+
         :param str target_dir: directory to create subject directory in
         :param bool verbose: show progress
         :param progress_callback: function to call with progress string
                                   should be a function with one argument
+        :param int max_workers: the number of concurrent downloads
+        :param int max_per_host: the maximum number of concurrent downloads per host
+        :param bool per_scan: download every scan separately instead of every experiment
+        :raises XNATIOError: if any of the downloads failed
         """
         subject_dir = os.path.join(target_dir, self.label)
         if not os.path.isdir(subject_dir):
             os.mkdir(subject_dir)
 
-        number_of_experiments = len(self.experiments)
-
-        for n, experiment in enumerate(self.experiments.values(), start=1):
-            if progress_callback is not None:
-                progress_callback("Downloading experiment {} of {}".format(n, number_of_experiments))
-            experiment.download_dir(subject_dir, verbose=verbose)
+        scheduler = _create_scheduler(self.xnat_session, verbose, progress_callback, max_workers, max_per_host)
+        self._schedule_download(scheduler, subject_dir, per_scan=per_scan)
+        scheduler.run()
 
         if verbose:
             self.logger.info('Downloaded subject to {}'.format(subject_dir))
 
+    def _schedule_download(self, scheduler, subject_dir, per_scan=False):
+        os.makedirs(subject_dir, exist_ok=True)
+        for experiment in self.experiments.values():
+            # Only image sessions have scans to download
+            if not isinstance(experiment, ImageSessionData):
+                self.logger.info('Skipping experiment {}, it is not an image session'.format(experiment.label))
+                continue
+
+            if per_scan:
+                for scan in experiment.scans.values():
+                    scheduler.add('scan {} of {}/{}'.format(scan.id, self.label, experiment.label),
+                                  scan.uri + '/files',
+                                  subject_dir)
+            else:
+                scheduler.add('experiment {}/{}'.format(self.label, experiment.label),
+                              experiment.fulluri + '/scans/ALL/files',
+                              subject_dir)
+
+    def sync_dir(self, target_dir, delete=False, verbose=True, max_workers=DOWNLOAD_WORKERS):
+        """
+        Synchronise the files of the subject to $target_dir/{subject.label},
+        only files that are missing locally or changed in XNAT are downloaded.
+        The files of each experiment are placed in
+        $target_dir/{subject.label}/{experiment.label} using their path within
+        the experiment. See :py:mod:`xnat.sync` for details.
+
+        :param str target_dir: directory to create subject directory in
+        :param bool delete: remove previously synchronised files that no longer exist in XNAT
+        :param bool verbose: show progress
+        :param int max_workers: the number of concurrent downloads
+        :return: the result of the synchronisation
+        :rtype: xnat.sync.SyncResult
+        """
+        subject_dir = os.path.join(target_dir, self.label)
+        result = sync_sources(self.xnat_session, self._sync_sources(''), subject_dir,
+                              delete=delete, max_workers=max_workers, verbose=verbose)
+
+        if verbose:
+            self.logger.info('Synchronised subject to {}: {} files downloaded, {} unchanged, {} deleted'.format(
+                subject_dir, len(result.downloaded), len(result.unchanged), len(result.deleted)
+            ))
+        return result
+
+    def _sync_sources(self, prefix):
+        for experiment in self.experiments.values():
+            # Only image sessions have files that can be synchronised
+            if isinstance(experiment, ImageSessionData):
+                yield from experiment._sync_sources('/'.join(x for x in (prefix, experiment.label) if x))
+
     def share(self, project, label=None):
         # Create the uri for sharing
         share_uri = '{}/projects/{}'.format(self.fulluri, project)
@@ -398,15 +522,56 @@ class ImageSessionData(XNATBaseObject):
                 os.mkdir(target_dir)
             return
 
-        with tempfile.TemporaryFile() as temp_path:
-            self.xnat_session.download_stream(self.fulluri + '/scans/ALL/files', temp_path, format='zip', verbose=verbose)
-
-            with ZipFile(temp_path) as zip_file:
-                zip_file.extractall(target_dir)
+        # Extract the zip while it is downloaded
+        download_extract_zip(self.xnat_session, self.fulluri + '/scans/ALL/files', target_dir, verbose=verbose)
 
         if verbose:
             self.logger.info('\nDownloaded image session to {}'.format(target_dir))
 
+    def sync_dir(self, target_dir, delete=False, verbose=True, max_workers=DOWNLOAD_WORKERS):
+        """
+        Synchronise the scan files of the experiment to
+        $target_dir/{experiment.label}, only files that are missing locally or
+        changed in XNAT are downloaded. The files are placed using their path
+        within the experiment (e.g. scans/1/resources/DICOM/files/1.dcm). See
+        :py:mod:`xnat.sync` for details.
+
+        :param str target_dir: directory to create experiment directory in
+        :param bool delete: remove previously synchronised files that no longer exist in XNAT
+        :param bool verbose: show progress
+        :param int max_workers: the number of concurrent downloads
+        :return: the result of the synchronisation
+        :rtype: xnat.sync.SyncResult
+        """
+        experiment_dir = os.path.join(target_dir, self.label)
+        result = sync_sources(self.xnat_session, self._sync_sources(''), experiment_dir,
+                              delete=delete, max_workers=max_workers, verbose=verbose)
+
+        if verbose:
+            self.logger.info('Synchronised image session to {}: {} files downloaded, {} unchanged, {} deleted'.format(
+                experiment_dir, len(result.downloaded), len(result.unchanged), len(result.deleted)
+            ))
+        return result
+
+    def _sync_sources(self, prefix):
+        yield SyncSource(listing_uri=self.fulluri + '/scans/ALL/files', prefix=prefix)
+
+    def dicom_headers(self, fields=None, max_workers=DOWNLOAD_WORKERS):
+        """
+        Read the DICOM header of the first file of every scan in the
+        experiment. The headers are read concurrently and only the bytes up
+        to the pixel data are transferred (if the server supports range
+        requests). See :py:func:`xnat.dicom.harvest_headers`.
+
+        :param list fields: the keywords of the header fields to include
+        :param int max_workers: the maximum number of concurrent requests
+        :return: table as a tuple of named tuples, one per scan
+        """
+        return harvest_headers(self.xnat_session,
+                               [HeaderSource(experiment=self.label, uri=self.fulluri)],
+                               fields=fields,
+                               max_workers=max_workers)
+
     def share(self, project, label=None):
         # Create the uri for sharing
         share_uri = '{}/projects/{}'.format(self.fulluri, project)
@@ -502,11 +667,8 @@ class ImageScanData(XNATBaseObject):
         self.xnat_session.download_zip(self.uri + '/files', path, verbose=verbose)
 
     def download_dir(self, target_dir, verbose=True):
-        with tempfile.TemporaryFile() as temp_path:
-            self.xnat_session.download_stream(self.uri + '/files', temp_path, format='zip', verbose=verbose)
-
-            with ZipFile(temp_path) as zip_file:
-                zip_file.extractall(target_dir)
+        # Extract the zip while it is downloaded
+        download_extract_zip(self.xnat_session, self.uri + '/files', target_dir, verbose=verbose)
 
         if verbose:
             self.logger.info('Downloaded image scan data to {}'.format(target_dir))
@@ -660,52 +822,123 @@ class AbstractResource(XNATBaseObject):
     def download(self, path, verbose=True):
         self.xnat_session.download_zip(self.uri + '/files', path, verbose=verbose)
 
-    def download_dir(self, target_dir, verbose=True, flatten_dirs=False):
+    def download_dir(self, target_dir, verbose=True, flatten_dirs=False, method='zip',
+                     max_workers=DOWNLOAD_WORKERS, progress_callback=None):
         """
         Download the entire resource and unpack it in a given directory
 
+        The method has 2 options, default is zip:
+
+        #. ``zip``: Let the server create a zip of the resource, download it and
+           unpack it. The files are placed in the directory structure of the
+           zip created by XNAT.
+        #. ``parallel``: List the files of the resource and download them
+           concurrently, each directly to its final location. The files are
+           placed in ``target_dir`` using their path within the resource.
+
         :param str target_dir: directory to unpack to
         :param bool verbose: show progress
+        :param bool flatten_dirs: do not create the directory structure
+        :param str method: the method to use
+        :param int max_workers: the number of concurrent downloads for the ``parallel`` method
+        :param progress_callback: progress callback for the ``parallel`` method, see
+                                  :py:class:`xnat.download.DownloadProgress`
+        :return: the directory containing the downloaded files
         """
-        with tempfile.TemporaryFile() as temp_path:
-            self.xnat_session.download_stream(self.uri + '/files', temp_path, format='zip', verbose=verbose)
+        if method == 'parallel':
+            return self._download_dir_parallel(target_dir,
+                                               verbose=verbose,
+                                               flatten_dirs=flatten_dirs,
+                                               max_workers=max_workers,
+                                               progress_callback=progress_callback)
+        elif method != 'zip':
+            raise exceptions.XNATValueError('Invalid download method "{}", should be either zip or parallel'.format(method))
+
+        # Extract the zip while it is downloaded
+        extracted_files = download_extract_zip(self.xnat_session, self.uri + '/files', target_dir, verbose=verbose)
+
+        extraction_sub_directories = [os.path.dirname(os.path.normpath(i_extracted_file)) for i_extracted_file in extracted_files]
+        unique_extraction_sub_directories = list(set(extraction_sub_directories))
+        # Check if we have multiple resources
+        multiple_resources = len(unique_extraction_sub_directories) > 1
+
+        if flatten_dirs:
+            for i_extracted_file in extracted_files:
+                new_resource_path = target_dir
+                if multiple_resources:
+                    # With multiple resources we keep the subfolder
+                    new_resource_path = os.path.join(new_resource_path, os.path.basename(os.path.dirname(os.path.normpath(i_extracted_file))))
+                if not os.path.exists(new_resource_path):
+                    os.makedirs(new_resource_path)
 
-            with ZipFile(temp_path) as zip_file:
-                zip_file.extractall(target_dir)
-                extracted_files = zip_file.namelist()
+                new_resource_path = os.path.join(new_resource_path,  os.path.basename(os.path.normpath(i_extracted_file)))
 
-            extraction_sub_directories = [os.path.dirname(os.path.normpath(i_extracted_file)) for i_extracted_file in extracted_files]
-            unique_extraction_sub_directories = list(set(extraction_sub_directories))
-            # Check if we have multiple resources
-            multiple_resources = len(unique_extraction_sub_directories) > 1
+                shutil.move(os.path.join(target_dir, i_extracted_file), new_resource_path)
 
-            if flatten_dirs:
-                for i_extracted_file in extracted_files:
-                    new_resource_path = target_dir
-                    if multiple_resources:
-                        # With multiple resources we keep the subfolder
-                        new_resource_path = os.path.join(new_resource_path, os.path.basename(os.path.dirname(os.path.normpath(i_extracted_file))))
-                    if not os.path.exists(new_resource_path):
-                        os.makedirs(new_resource_path)
-
-                    new_resource_path = os.path.join(new_resource_path,  os.path.basename(os.path.normpath(i_extracted_file)))
-
-                    shutil.move(os.path.join(target_dir, i_extracted_file), new_resource_path)
-
-                # Remove the original download directory
-                root_extraction_sub_dir = os.path.join(target_dir, os.path.normpath(extraction_sub_directories[0]).split(os.sep)[0])
-                shutil.rmtree(root_extraction_sub_dir)
-                scan_directory = target_dir
+            # Remove the original download directory
+            root_extraction_sub_dir = os.path.join(target_dir, os.path.normpath(extraction_sub_directories[0]).split(os.sep)[0])
+            shutil.rmtree(root_extraction_sub_dir)
+            scan_directory = target_dir
+        else:
+            if multiple_resources:
+                scan_directory = os.path.join(target_dir, os.path.dirname(os.path.normpath(unique_extraction_sub_directories[0])))
             else:
-                if multiple_resources:
-                    scan_directory = os.path.join(target_dir, os.path.dirname(os.path.normpath(unique_extraction_sub_directories[0])))
-                else:
-                    scan_directory = os.path.join(target_dir, unique_extraction_sub_directories[0])
+                scan_directory = os.path.join(target_dir, unique_extraction_sub_directories[0])
 
         if verbose:
             self.logger.info('Downloaded resource path to {}'.format(scan_directory))
         return scan_directory
 
+    def _download_dir_parallel(self, target_dir, verbose, flatten_dirs, max_workers, progress_callback):
+        rows = self.xnat_session.get_json(self.uri + '/files')['ResultSet']['Result']
+        target_dir = os.path.abspath(target_dir)
+
+        items = []
+        targets = set()
+        for row in rows:
+            path = re.sub(r'^.*/resources/[^/]+/files/', '', row['URI'], 1)
+            if flatten_dirs:
+                path = path.rsplit('/', 1)[-1]
+
+            target = os.path.normpath(os.path.join(target_dir, *path.split('/')))
+            if os.path.commonpath([target_dir, target]) != target_dir:
+                raise exceptions.XNATValueError('File {} would be written outside of {}'.format(path, target_dir))
+
+            if target in targets:
+                raise exceptions.XNATValueError('Multiple files would be written to {}, cannot flatten the'
+                                                ' directories of this resource'.format(target))
+            targets.add(target)
+
+            size = row.get('Size', '')
+            size = int(size) if str(size).strip().isdigit() else None
+            items.append(DownloadItem(uri=row['URI'], target=target, size=size))
+
+        if progress_callback is None and verbose:
+            sizes = [x.size for x in items]
+            progress_callback = default_update_func(sum(sizes) if None not in sizes else None)
+
+        os.makedirs(target_dir, exist_ok=True)
+        download_files(self.xnat_session, items, max_workers=max_workers, update_func=progress_callback)
+
+        if verbose:
+            self.logger.info('Downloaded {} files of resource to {}'.format(len(items), target_dir))
+        return target_dir
+
+    @staticmethod
+    def _upload_query(extract, file_content, file_format, file_tags):
+        query = {}
+
+        if extract:
+            query['extract'] = 'true'
+        if file_content is not None:
+            query['content'] = file_content
+        if file_format is not None:
+            query['format'] = file_format
+        if file_tags is not None:
+            query['tags'] = file_tags
+
+        return query
+
     def upload(self,
                path: Union[str, Path],
                remotepath: str,
@@ -727,22 +960,13 @@ class AbstractResource(XNATBaseObject):
         :param file_tags: Set the tags of the file on XNAT
         """
         uri = f"{self.uri}/files/{remotepath.lstrip('/')}"
-        query = {}
-
-        if extract:
-            query['extract'] = 'true'
-        if file_content is not None:
-            query['content'] = file_content
-        if file_format is not None:
-            query['format'] = file_format
-        if file_tags is not None:
-            query['tags'] = file_tags
+        query = self._upload_query(extract, file_content, file_format, file_tags)
 
         self.xnat_session.upload_file(uri, path=path, overwrite=overwrite, query=query, **kwargs)
         self.files.clearcache()
 
     def upload_data(self,
-                    data: Union[str, bytes, IO],
+                    data: Union[str, bytes, IO, Callable[[], Iterable[bytes]]],
                     remotepath: str,
                     overwrite: bool = False,
                     extract: bool = False,
@@ -753,7 +977,9 @@ class AbstractResource(XNATBaseObject):
         """
         Upload a file as an XNAT resource.
 
-        :param str data: The data to upload, either a str, bytes or an IO object
+        :param str data: The data to upload, either a str, bytes, an IO object or a
+                         callable returning an iterable of bytes (see
+                         :py:meth:`upload_stream <xnat.session.BaseXNATSession.upload_stream>`)
         :param str remotepath: The remote path to which to uploadt
         :param bool overwrite: Flag to force overwriting of files
         :param bool extract: Extract the files on the XNAT server
@@ -762,16 +988,7 @@ class AbstractResource(XNATBaseObject):
         :param str file_tags: Set the tags of the file on XNAT
         """
         uri = f"{self.uri}/files/{remotepath.lstrip('/')}"
-        query = {}
-
-        if extract:
-            query['extract'] = 'true'
-        if file_content is not None:
-            query['content'] = file_content
-        if file_format is not None:
-            query['format'] = file_format
-        if file_tags is not None:
-            query['tags'] = file_tags
+        query = self._upload_query(extract, file_content, file_format, file_tags)
 
         if isinstance(data, (str, bytes)):
             self.xnat_session.upload_string(uri, data=data, overwrite=overwrite, query=query, **kwargs)
@@ -784,28 +1001,49 @@ class AbstractResource(XNATBaseObject):
                    directory: Union[str, Path],
                    overwrite: bool = False,
                    method: str = 'tgz_file',
+                   max_workers: int = UPLOAD_WORKERS,
+                   compression_level: Optional[int] = None,
+                   compression_workers: Optional[int] = None,
                    **kwargs):
         """
         Upload a directory to an XNAT resource. This means that if you do
         resource.upload_dir(directory) that if there is a file directory/a.txt
         it will be uploaded to resource/files/a.txt
 
-        The method has 5 options, default is tgz_file:
+        The method has 8 options, default is tgz_file:
 
         #. ``per_file``: Scans the directory and uploads file by file
+        #. ``parallel_per_file``: Scans the directory and uploads the files
+           concurrently using ``max_workers`` threads
         #. ``tar_memory``: Create a tar archive in memory and upload it in one go
         #. ``tgz_memory``: Create a gzipped tar file in memory and upload that
         #. ``tar_file``: Create a temporary tar file and upload that
         #. ``tgz_file``: Create a temporary gzipped tar file and upload that
+        #. ``tar_stream``: Create a tar archive while uploading it
+        #. ``tgz_stream``: Create a gzipped tar archive while uploading it
 
         The considerations are that sometimes you can fit things in memory so
         you can save disk IO by putting it in memory. The per file does not
         create additional archives, but has one request per file so might be
-        slow when uploading many files.
+        slow when uploading many files. The parallel per file method overlaps
+        these requests, which helps for many small files. The stream methods
+        send the archive as a chunked request body while it is being created,
+        so they need neither a temporary file nor memory for the archive and
+        compression overlaps with the upload. The gzipped methods create a single
+        gzip member, unless ``compression_workers`` is given: then the archive is
+        compressed in blocks on that many cores (as multiple gzip members).
 
         :param directory: The directory to upload
         :param overwrite: Flag to force overwriting of files
         :param method: The method to use
+        :param max_workers: The number of concurrent uploads for ``parallel_per_file``
+        :param compression_level: The gzip compression level (0-9) for the tgz methods,
+                                  defaults to 9; use 0 for data that is already compressed
+        :param compression_workers: The number of threads compressing for the tgz methods,
+                                    by default the archive is compressed on a single thread
+        :return: for ``parallel_per_file`` the :py:class:`xnat.upload.UploadResult`
+        :raises XNATUploadError: if files failed to upload with ``parallel_per_file``,
+                                 after all other files are uploaded
         """
         if not isinstance(directory, Path):
             directory = Path(directory)
@@ -823,17 +1061,18 @@ class AbstractResource(XNATBaseObject):
 
                 target_path = str(file_path.relative_to(directory))
                 self.upload(file_path, target_path, overwrite=overwrite, **kwargs)
+        elif method == 'parallel_per_file':
+            return self._upload_dir_parallel(directory, overwrite=overwrite, max_workers=max_workers, **kwargs)
         elif method == 'tar_memory':
             fh = BytesIO()
-            with tarfile.open(mode='w', fileobj=fh) as tar_file:
-                tar_file.add(directory, '')
+            write_tar(fh, str(directory))
             fh.seek(0)
             self.upload_data(fh, 'upload.tar', overwrite=overwrite, extract=True, **kwargs)
             fh.close()
         elif method == 'tgz_memory':
             fh = BytesIO()
-            with tarfile.open(mode='w:gz', fileobj=fh) as tar_file:
-                tar_file.add(directory, '')
+            write_tar(fh, str(directory), compress=True,
+                      compression_level=compression_level, max_workers=compression_workers)
 
             fh.seek(0)
             self.upload_data(fh, 'upload.tar.gz', overwrite=overwrite, extract=True, **kwargs)
@@ -841,21 +1080,60 @@ class AbstractResource(XNATBaseObject):
         elif method == 'tar_file':
             # Max-size is 256 MB
             with tempfile.SpooledTemporaryFile(max_size=268435456, mode='wb+') as fh:
-                with tarfile.open(mode='w', fileobj=fh) as tar_file:
-                    tar_file.add(directory, '')
+                write_tar(fh, str(directory))
                 fh.seek(0)
                 self.upload_data(fh, 'upload.tar', overwrite=overwrite, extract=True, **kwargs)
         elif method == 'tgz_file':
             # Max-size is 256 MB
             with tempfile.SpooledTemporaryFile(max_size=268435456, mode='wb+') as fh:
-                with tarfile.open(mode='w:gz', fileobj=fh) as tar_file:
-                        tar_file.add(directory, '')
+                write_tar(fh, str(directory), compress=True,
+                          compression_level=compression_level, max_workers=compression_workers)
 
                 fh.seek(0)
                 self.upload_data(fh, 'upload.tar.gz', overwrite=overwrite, extract=True, **kwargs)
+        elif method == 'tar_stream':
+            self.upload_data(lambda: stream_tar(str(directory)), 'upload.tar',
+                             overwrite=overwrite, extract=True, **kwargs)
+        elif method == 'tgz_stream':
+            self.upload_data(lambda: stream_tar(str(directory), compress=True, compression_level=compression_level,
+                                                max_workers=compression_workers),
+                             'upload.tar.gz', overwrite=overwrite, extract=True, **kwargs)
         else:
             self.logger.warning('Selected invalid upload directory method!')
 
+    def _upload_dir_parallel(self, directory, overwrite, max_workers, extract=False, file_content=None,
+                             file_format=None, file_tags=None, **kwargs):
+        # The same query parameters as upload creates for a single file
+        query = self._upload_query(extract, file_content, file_format, file_tags)
+        items = []
+        for file_path in sorted(directory.rglob('*')):
+            if not file_path.is_file() or os.path.getsize(file_path) == 0:
+                continue
+
+            target_path = file_path.relative_to(directory).as_posix()
+            items.append(UploadItem(path=file_path,
+                                    uri=f"{self.uri}/files/{target_path}",
+                                    size=os.path.getsize(file_path)))
+
+        try:
+            result = upload_files(self.xnat_session, items, max_workers=max_workers, overwrite=overwrite,
+                                  query=query, **kwargs)
+        finally:
+            # Clear the cache once instead of after every file
+            self.files.clearcache()
+
+        self.logger.info('Uploaded {} files ({:.1f} MB) in {:.1f} seconds ({:.1f} MB/s)'.format(
+            len(result.uploaded), result.bytes_uploaded / 1e6, result.duration, result.throughput / 1e6
+        ))
+
+        if result.failed:
+            failed_files = sorted(str(item.path) for item, _ in result.failed)
+            raise exceptions.XNATUploadError('Failed to upload {} of {} files: {}'.format(
+                len(failed_files), len(items), ', '.join(failed_files)
+            ))
+
+        return result
+
     @property
     def parent_obj(self):
         return self.xnat_session.create_object(self.uri.split('/resources/')[0])
@@ -0,0 +1,262 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+On-disk cache for the data model generated from the XNAT schemas. Generating
+the model requires parsing all schemas of a server and generating and
+compiling a large python module. As the schemas of a server rarely change,
+the generated module can be re-used across connections.
+
+A cache entry is keyed by the server url, the XNAT version, the xnatpy
+version, a fingerprint of the code generator and the text of every schema
+used. If any of these changes, a new model is generated and stored.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CachedModel = namedtuple('CachedModel', ['key', 'code_file', 'classes', 'manifest'])
+
+MODEL_CACHE_ENV = 'XNATPY_MODEL_CACHE'
+CODE_FILE_NAME = 'generated_xnat.py'
+MANIFEST_FILE_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Files that determine the generated code, changes in these invalidate the cache
+_GENERATOR_FILES = ('convert_xsd.py', 'header.py')
+
+
+def default_cache_dir() -> str:
+    """
+    Determine the default location for the model cache. This is the
+    ``xnatpy/models`` directory in ``$XDG_CACHE_HOME`` (or ``~/.cache``
+    if that is not set).
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'xnatpy', 'models')
+
+
+def generator_fingerprint() -> str:
+    """
+    Create a fingerprint of the code generator, so that changes to the
+    generator (e.g. in a development install) invalidate the cache.
+    """
+    hasher = hashlib.sha256()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for filename in _GENERATOR_FILES:
+        with open(os.path.join(package_dir, filename), 'rb') as fin:
+            hasher.update(fin.read())
+    return hasher.hexdigest()
+
+
+class ModelCache(object):
+    """
+    Cache of generated data model modules stored on disk. Every entry is a
+    directory named after the cache key which contains the generated code
+    and a manifest with the classes to register and some metadata.
+
+    :param str path: directory in which to store the cache, defaults to
+                     :py:func:`default_cache_dir`
+    :param logger: logger to use for reporting
+    """
+    def __init__(self, path: Optional[str] = None, logger: Optional[logging.Logger] = None):
+        if path is None:
+            path = default_cache_dir()
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.logger = logger or logging.getLogger('xnat')
+
+    def __repr__(self):
+        return '<ModelCache {}>'.format(self.path)
+
+    @classmethod
+    def from_parameter(cls, value, logger=None) -> Optional['ModelCache']:
+        """
+        Create a model cache based on the ``model_cache`` parameter of
+        :py:func:`xnat.connect`.
+
+        :param value: None to use the ``XNATPY_MODEL_CACHE`` environment variable (cache disabled
+                      if not set), True for the default location, False to disable, a str to use as
+                      cache directory or an existing ModelCache
+        :param logger: logger to use for reporting
+        :return: ModelCache or None if caching is disabled
+        """
+        if isinstance(value, ModelCache):
+            return value
+
+        if value is None:
+            value = os.environ.get(MODEL_CACHE_ENV, '')
+            if value.lower() in ['', '0', 'false', 'no']:
+                value = False
+            elif value.lower() in ['1', 'true', 'yes']:
+                value = True
+
+        if value is False:
+            return None
+
+        if value is True:
+            return cls(logger=logger)
+
+        return cls(path=value, logger=logger)
+
+    @staticmethod
+    def compute_key(server: str,
+                    xnat_version: str,
+                    xnatpy_version: str,
+                    schemas: Iterable[Tuple[str, str]],
+                    **options) -> str:
+        """
+        Compute the cache key for a model
+
+        :param server: url of the server
+        :param xnat_version: the version of the XNAT server
+        :param xnatpy_version: the version of xnatpy generating the model
+        :param schemas: iterable of (uri, text) pairs of all schemas used
+        :param options: additional options that influence the generated model
+        :return: hex digest to use as cache key
+        """
+        hasher = hashlib.sha256()
+
+        def update(value):
+            value = str(value).encode('utf-8')
+            # Prefix length to avoid ambiguity when concatenating values
+            hasher.update('{}:'.format(len(value)).encode('ascii'))
+            hasher.update(value)
+
+        update(server.rstrip('/'))
+        update(xnat_version)
+        update(xnatpy_version)
+        update(generator_fingerprint())
+
+        for key in sorted(options):
+            update(key)
+            update(options[key])
+
+        for uri, text in schemas:
+            update(uri)
+            update(text)
+
+        return hasher.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key)
+
+    def load(self, key: str) -> Optional[CachedModel]:
+        """
+        Look up an entry in the cache
+
+        :param key: the cache key
+        :return: the cached model or None if it is not (validly) cached
+        """
+        entry_path = self.entry_path(key)
+        code_file = os.path.join(entry_path, CODE_FILE_NAME)
+        manifest_file = os.path.join(entry_path, MANIFEST_FILE_NAME)
+
+        if not (os.path.isfile(code_file) and os.path.isfile(manifest_file)):
+            self.logger.debug('Model cache miss for {}'.format(key))
+            return None
+
+        try:
+            with open(manifest_file) as fin:
+                manifest = json.load(fin)
+        except (IOError, ValueError) as exception:
+            self.logger.warning('Ignoring corrupt model cache entry {}: {}'.format(entry_path, exception))
+            return None
+
+        if manifest.get('manifest_version') != MANIFEST_VERSION or manifest.get('key') != key:
+            self.logger.info('Ignoring incompatible model cache entry {}'.format(entry_path))
+            return None
+
+        self.logger.info('Using cached data model from {}'.format(entry_path))
+        return CachedModel(key=key, code_file=code_file, classes=manifest['classes'], manifest=manifest)
+
+    def store(self, key: str, code: str, classes: List[str], metadata: Optional[Dict] = None) -> Optional[CachedModel]:
+        """
+        Store a generated model in the cache. The entry is written to a
+        temporary directory first and moved in place afterwards, so other
+        processes never see a partially written entry.
+
+        :param key: the cache key
+        :param code: the generated code
+        :param classes: names of the generated classes to register
+        :param metadata: additional information to store in the manifest
+        :return: the cached model or None if it could not be stored
+        """
+        manifest = dict(metadata or {})
+        manifest.update({
+            'manifest_version': MANIFEST_VERSION,
+            'key': key,
+            'created': datetime.datetime.now().isoformat(),
+            'classes': list(classes),
+        })
+
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            temp_dir = tempfile.mkdtemp(prefix='.tmp_{}_'.format(key[:8]), dir=self.path)
+        except OSError as exception:
+            self.logger.warning('Could not create model cache in {}: {}'.format(self.path, exception))
+            return None
+
+        try:
+            with open(os.path.join(temp_dir, CODE_FILE_NAME), 'w') as code_file:
+                code_file.write(code)
+
+            with open(os.path.join(temp_dir, MANIFEST_FILE_NAME), 'w') as manifest_file:
+                json.dump(manifest, manifest_file, indent=2)
+
+            try:
+                os.replace(temp_dir, self.entry_path(key))
+            except OSError:
+                # Another process stored the same entry in the mean time, use that one
+                self.logger.debug('Model cache entry {} already exists'.format(key))
+        except OSError as exception:
+            self.logger.warning('Could not write model cache entry {}: {}'.format(key, exception))
+            return None
+        finally:
+            if os.path.isdir(temp_dir):
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+        return self.load(key)
+
+    def entries(self) -> List[str]:
+        """
+        List the keys of all entries in the cache
+        """
+        if not os.path.isdir(self.path):
+            return []
+
+        return sorted(x for x in os.listdir(self.path)
+                      if not x.startswith('.') and os.path.isdir(os.path.join(self.path, x)))
+
+    def remove(self, key: str):
+        """
+        Remove an entry from the cache
+
+        :param key: the cache key
+        """
+        shutil.rmtree(self.entry_path(key), ignore_errors=True)
+
+    def clear(self):
+        """
+        Remove all entries from the cache
+        """
+        for key in self.entries():
+            self.remove(key)
@@ -23,7 +23,7 @@ import requests
 
 from .core import XNATBaseObject, caching
 from .datatypes import to_date, to_time
-from .utils import RequestsFileLike
+from .utils import RangeRequestsFileLike, RequestsFileLike
 from .type_hints import JSONType
 
 if TYPE_CHECKING:
@@ -424,8 +424,15 @@ class PrearchiveFile(XNATBaseObject):
 
         self._fulldata = datafields
 
-    def open(self):
+    def open(self, random_access=True):
         uri = self.xnat_session.url_for(self)
+
+        if random_access:
+            # Only transfer the parts of the file that are read, if the server supports it
+            file_like = RangeRequestsFileLike.from_uri(self.xnat_session, uri)
+            if file_like is not None:
+                return file_like
+
         request = self.xnat_session.interface.get(uri, stream=True)
         return RequestsFileLike(request)
 
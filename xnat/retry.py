@@ -0,0 +1,258 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Retry policy for the requests sent by a session. Requests that fail with a
+transient error (a connection error, a timeout or a 429, 502, 503 or 504
+status) are retried with an exponential backoff and jitter. Only idempotent
+requests are retried when the request might have reached the server. A retry
+budget makes sure that a server in trouble is not flooded with retries.
+"""
+
+import datetime
+import email.utils
+import random
+import threading
+import time
+from typing import Callable, Container, Dict, Optional, Union
+
+import requests
+
+from .exceptions import XNATValueError
+
+# Which HTTP methods are safe to send again if the request might have been processed
+IDEMPOTENT_METHODS: Dict[str, bool] = {
+    'GET': True,
+    'HEAD': True,
+    'OPTIONS': True,
+    'PUT': True,
+    'DELETE': True,
+    'POST': False,
+    'PATCH': False,
+}
+
+# Status codes that indicate a transient problem
+RETRY_STATUS = frozenset([429, 502, 503, 504])
+
+
+class RetryBudget(object):
+    """
+    Token bucket limiting the number of retries relative to the number of
+    requests. Every request deposits ``ratio`` tokens (up to ``max_tokens``)
+    and every retry withdraws a token. If the server keeps failing, the
+    tokens run out and requests fail directly instead of being retried.
+
+    :param float ratio: the number of retries allowed per request
+    :param float max_tokens: the maximum number of tokens (and initial tokens)
+    """
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self) -> bool:
+        """
+        Withdraw a token for a retry
+
+        :return: flag indicating if the retry is allowed
+        """
+        with self._lock:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+class RetryPolicy(object):
+    """
+    Policy determining when and after how long requests are retried.
+
+    The delay before retry ``n`` (starting at 1) is drawn uniformly between 0
+    and ``backoff_factor * 2 ** (n - 1)`` seconds (or exactly that value if
+    ``jitter`` is False), but never more than ``max_backoff``. If the server
+    sends a ``Retry-After`` header, that delay is used instead.
+
+    :param int max_retries: the maximum number of retries per request, 0 disables retrying
+    :param float backoff_factor: the base delay in seconds
+    :param float max_backoff: the maximum delay in seconds
+    :param bool jitter: randomize the delays, this avoids many clients retrying at the same time
+    :param retry_status: the status codes to retry, defaults to :py:data:`RETRY_STATUS`
+    :param idempotent_methods: mapping of the HTTP methods to a flag indicating if they are
+                               idempotent, defaults to :py:data:`IDEMPOTENT_METHODS`
+    :param budget: the retry budget to use, None creates a default budget and False disables
+                   the budget
+    """
+    def __init__(self,
+                 max_retries: int = 3,
+                 backoff_factor: float = 0.5,
+                 max_backoff: float = 30.0,
+                 jitter: bool = True,
+                 retry_status: Optional[Container[int]] = None,
+                 idempotent_methods: Optional[Dict[str, bool]] = None,
+                 budget: Union[RetryBudget, bool, None] = None):
+        if max_retries < 0:
+            raise XNATValueError('The maximum number of retries cannot be negative, found {}'.format(max_retries))
+
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_status = RETRY_STATUS if retry_status is None else frozenset(retry_status)
+        self.idempotent_methods = dict(IDEMPOTENT_METHODS if idempotent_methods is None else idempotent_methods)
+
+        if budget is None or budget is True:
+            budget = RetryBudget()
+        self.budget = budget or None
+
+        # Allow replacing the sleep function, e.g. for testing
+        self.sleep: Callable[[float], None] = time.sleep
+
+    def __repr__(self):
+        return '<RetryPolicy max_retries={} backoff_factor={}>'.format(self.max_retries, self.backoff_factor)
+
+    @classmethod
+    def from_parameter(cls, value) -> 'RetryPolicy':
+        """
+        Create a retry policy based on the ``retries`` parameter of :py:func:`xnat.connect`
+
+        :param value: None for the default policy, False to disable retrying, an int for the
+                      maximum number of retries or an existing RetryPolicy
+        :return: the retry policy
+        """
+        if isinstance(value, RetryPolicy):
+            return value
+
+        if value is None or value is True:
+            return cls()
+
+        if value is False:
+            return cls(max_retries=0)
+
+        return cls(max_retries=int(value))
+
+    def is_idempotent(self, method: str) -> bool:
+        return self.idempotent_methods.get(method.upper(), False)
+
+    def record_request(self):
+        """
+        Register that a new (non-retry) request is sent, this refills the budget
+        """
+        if self.budget is not None:
+            self.budget.deposit()
+
+    def should_retry(self,
+                     method: str,
+                     attempt: int,
+                     response: Optional[requests.Response] = None,
+                     exception: Optional[Exception] = None) -> bool:
+        """
+        Determine if a request should be retried
+
+        :param method: the HTTP method of the request
+        :param attempt: the number of retries done so far
+        :param response: the response received (if any)
+        :param exception: the exception raised while sending the request (if any)
+        :return: flag indicating if the request should be retried
+        """
+        if attempt >= self.max_retries:
+            return False
+
+        if exception is not None:
+            if isinstance(exception, requests.exceptions.SSLError):
+                return False
+            if isinstance(exception, requests.exceptions.ConnectTimeout):
+                # The connection was never made, so the request did not reach the server
+                retryable = True
+            elif isinstance(exception, (requests.exceptions.ConnectionError,
+                                        requests.exceptions.ChunkedEncodingError,
+                                        requests.exceptions.Timeout)):
+                retryable = self.is_idempotent(method)
+            else:
+                retryable = False
+        elif response is not None:
+            retryable = response.status_code in self.retry_status and self.is_idempotent(method)
+        else:
+            retryable = False
+
+        if not retryable:
+            return False
+
+        # Check the budget last, so it is only used for actual retries
+        return self.budget is None or self.budget.withdraw()
+
+    def backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """
+        Compute the delay before a retry
+
+        :param attempt: the number of retries done so far
+        :param response: the response that triggered the retry (if any)
+        :return: the delay in seconds
+        """
+        retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+
+        delay = min(self.backoff_factor * 2 ** attempt, self.max_backoff)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def wait(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """
+        Sleep before a retry
+
+        :param attempt: the number of retries done so far
+        :param response: the response that triggered the retry (if any)
+        :return: the delay used in seconds
+        """
+        delay = self.backoff(attempt, response)
+        if delay > 0:
+            self.sleep(delay)
+        return delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse the value of a Retry-After header, which is either a number of
+    seconds or an HTTP date
+
+    :param value: the header value
+    :return: the delay in seconds or None if the value cannot be parsed
+    """
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+
+    return max((date - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
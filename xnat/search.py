@@ -28,29 +28,49 @@ def or_(*args):
 
 def inject_search_fields(session):
     session.logger.info('Injecting display fields to classes')
+    datatypes = session.inspect.datatypes()
+
+    if hasattr(session.XNAT_CLASS_LOOKUP, 'add_create_hook'):
+        # The classes are created lazily, inject the fields when a class is created
+        datatypes = set(datatypes)
+
+        def create_hook(datatype, cls):
+            if datatype in datatypes and not inject_datatype_search_fields(session, datatype, cls):
+                session.logger.warning(f"Encountered errors retrieving display fields for: {datatype}")
+
+        session.XNAT_CLASS_LOOKUP.add_create_hook(create_hook)
+        return
+
     failed_datatypes = []
-    for datatype in session.inspect.datatypes():
+    for datatype in datatypes:
         cls = session.XNAT_CLASS_LOOKUP.get(datatype)
         if cls is None:
             session.logger.warning(f'Cannot find matching class for {datatype}')
             continue
-        session.logger.debug(f'Inject fields for {datatype} to {cls}')
-        try:
-            fields = session.inspect.datafields(datatype)
-        except exceptions.XNATResponseError as exception:
-            failed_datatypes.append(datatype)
-            session.logger.info(f'Could not retrieve display fields for {datatype}: {exception}')
-            continue
 
-        for field in fields:
-            name = field.split('/')[-1]
-            field = DisplayFieldSearchField(cls, name, 'xs:string')
-            setattr(cls, name, field)
+        if not inject_datatype_search_fields(session, datatype, cls):
+            failed_datatypes.append(datatype)
 
     if failed_datatypes:
         session.logger.warning(f"Encountered errors retrieving display fields for: {', '.join(failed_datatypes)}")
 
 
+def inject_datatype_search_fields(session, datatype, cls):
+    session.logger.debug(f'Inject fields for {datatype} to {cls}')
+    try:
+        fields = session.inspect.datafields(datatype)
+    except exceptions.XNATResponseError as exception:
+        session.logger.info(f'Could not retrieve display fields for {datatype}: {exception}')
+        return False
+
+    for field in fields:
+        name = field.split('/')[-1]
+        field = DisplayFieldSearchField(cls, name, 'xs:string')
+        setattr(cls, name, field)
+
+    return True
+
+
 class SearchFieldMap:
     def __init__(self, xsi_type):
         self._xsi_type = xsi_type
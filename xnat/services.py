@@ -13,15 +13,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import csv
 import datetime
 import mimetypes
 import collections
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import tempfile
-from typing import IO, Optional, Union
-from zipfile import ZipFile, ZIP_DEFLATED
+from typing import IO, Callable, Iterable, List, Optional, TextIO, Union
 
+from .archive import stream_zip
+from .constants import IMPORT_WORKERS
 from .core import XNATBaseObject
 from .prearchive import PrearchiveSession
 from .exceptions import XNATResponseError, XNATValueError
@@ -29,6 +31,63 @@ from .mixin import ProjectData, SubjectData, ExperimentData
 
 TokenResult = collections.namedtuple('TokenResult', ('alias', 'secret'))
 
+# A directory to import and the project, subject and experiment to assign it to
+ImportJob = collections.namedtuple('ImportJob', ('directory', 'project', 'subject', 'experiment'))
+
+# The outcome of an import job: the resulting prearchive session or experiment, or the error
+ImportResult = collections.namedtuple('ImportResult', ('job', 'session', 'error'))
+
+IMPORT_RESULT_COLUMNS = ('directory', 'project', 'subject', 'experiment', 'status', 'uri', 'error')
+
+
+def read_import_manifest(path: Union[str, Path]) -> List[ImportJob]:
+    """
+    Read a manifest of directories to import. The manifest is a CSV file
+    with a header and the columns ``directory`` (required), ``project``,
+    ``subject`` and ``experiment``. Relative directories are relative to the
+    location of the manifest and empty values are not passed to XNAT.
+
+    :param path: the path of the manifest
+    :return: the import jobs in the manifest
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path, newline='') as manifest:
+        reader = csv.DictReader(manifest)
+        if reader.fieldnames is None or 'directory' not in reader.fieldnames:
+            raise XNATValueError('Import manifest {} should have a directory column'.format(path))
+
+        for row in reader:
+            if not row['directory']:
+                continue
+            jobs.append(ImportJob(directory=os.path.join(base_dir, row['directory']),
+                                  project=row.get('project') or None,
+                                  subject=row.get('subject') or None,
+                                  experiment=row.get('experiment') or None))
+    return jobs
+
+
+def write_import_results(results: Iterable[ImportResult], output: TextIO):
+    """
+    Write the results of a bulk import as a CSV table
+
+    :param results: the results of :py:meth:`Services.bulk_import`
+    :param output: the text file object to write to
+    """
+    writer = csv.writer(output)
+    writer.writerow(IMPORT_RESULT_COLUMNS)
+    for result in results:
+        job = result.job
+        writer.writerow([
+            job.directory,
+            job.project or '',
+            job.subject or '',
+            job.experiment or '',
+            'failed' if result.error is not None else 'imported',
+            result.session.uri if result.session is not None else '',
+            str(result.error) if result.error is not None else '',
+        ])
+
 
 class DicomBoxImportRequest(object):
     def __init__(self, uri, xnat_session):
@@ -135,7 +194,7 @@ class Services(object):
 
     def import_(self,
                 path: Optional[Union[str, Path]] = None,
-                data: Optional[Union[str, bytes, IO]] = None,
+                data: Optional[Union[str, bytes, IO, Callable[[], Iterable[bytes]]]] = None,
                 overwrite: Optional[str] = None,
                 quarantine: bool = False,
                 destination: Optional[str] = None,
@@ -144,15 +203,17 @@ class Services(object):
                 subject: Optional[str] = None,
                 experiment: Optional[str] = None,
                 content_type: Optional[str] = None,
-                import_handler: Optional[str] = None):
+                import_handler: Optional[str] = None,
+                retries: int = 1):
         """
         Import a file into XNAT using the import service. See the
         `XNAT wiki <https://wiki.xnat.org/pages/viewpage.action?pageId=6226268>`_
         for a detailed explanation.
 
         :param str path: local path of the file to upload and import
-        :param data: either a string containing the data to be uploaded or a open file handle
-                     to read the data from
+        :param data: either a string containing the data to be uploaded, a open file handle
+                     to read the data from or a callable returning an iterable of bytes
+                     (called again for every attempt)
         :param str overwrite: how the handle existing data (none, append, delete)
         :param bool quarantine: flag to indicate session should be quarantined
         :param str destination: the destination to upload the scan to
@@ -166,6 +227,7 @@ class Services(object):
                                  This will often be ``application/zip``.
         :param import_handler: The XNAT import handler to use, see
                                https://wiki.xnat.org/display/XAPI/Image+Session+Import+Service+API
+        :param int retries: amount of times xnatpy should attempt the upload in case of failure
 
         .. note::
             The project has to be given using the project ID and *NOT* the label.
@@ -236,11 +298,14 @@ class Services(object):
             if content_type is None and isinstance(path, str):
                 content_type = self.guess_content_type(path)
 
-            response = self.xnat_session.upload_file(uri=uri, path=path, query=query, content_type=content_type, method='post')
+            response = self.xnat_session.upload_file(uri=uri, path=path, query=query, content_type=content_type,
+                                                     method='post', retries=retries)
         elif data is not None and isinstance(data, str):
-            response = self.xnat_session.upload_string(uri=uri, data=data, query=query, content_type=content_type, method='post')
+            response = self.xnat_session.upload_string(uri=uri, data=data, query=query, content_type=content_type,
+                                                       method='post', retries=retries)
         elif data is not None:
-            response = self.xnat_session.upload_stream(uri=uri, stream=data, query=query, content_type=content_type, method='post')
+            response = self.xnat_session.upload_stream(uri=uri, stream=data, query=query, content_type=content_type,
+                                                       method='post', retries=retries)
         else:
             raise XNATValueError('The data or path argument should be provided!')
 
@@ -254,19 +319,18 @@ class Services(object):
 
         return self.xnat_session.create_object(response_text)
 
-    def _zip_directory(self, directory, fh):
+    @staticmethod
+    def _directory_files(directory):
         """
-        Zip a directory into a file(-like) obj given
+        The files in a directory with their names in the zip of the directory,
+        which includes the name of the directory itself
 
         :param directory: directory to zip
-        :param fh: output file handle
         """
-        with ZipFile(fh, 'w', ZIP_DEFLATED) as zip_file:
-            for dirpath, dirs, files in os.walk(directory):
-                for f in files:
-                    zip_file.write(os.path.join(dirpath, f),
-                                   os.path.relpath(os.path.join(dirpath, f),
-                                                   os.path.dirname(directory)))
+        for dirpath, dirs, filenames in os.walk(directory):
+            for f in filenames:
+                yield (os.path.join(dirpath, f),
+                       os.path.relpath(os.path.join(dirpath, f), os.path.dirname(directory)))
 
     def import_dir(self,
                    directory: Union[str, Path],
@@ -277,9 +341,13 @@ class Services(object):
                    project: Optional[str] = None,
                    subject: Optional[str] = None,
                    experiment: Optional[str] = None,
-                   import_handler: Optional[str] = None):
+                   import_handler: Optional[str] = None,
+                   compression_level: Optional[int] = None,
+                   compression_workers: Optional[int] = None,
+                   retries: int = 1):
         """
-        Import a directory to an XNAT resource.
+        Import a directory to an XNAT resource. The directory is zipped while
+        it is being uploaded, so no temporary copy of the archive is made.
 
         :param directory: local path of the directory to upload and import
         :param overwrite: how the handle existing data (none, append, delete)
@@ -292,6 +360,12 @@ class Services(object):
         :param experiment: the experiment in the archive to assign the session content to
         :param import_handler: The XNAT import handler to use, see
                                https://wiki.xnat.org/display/XAPI/Image+Session+Import+Service+API
+        :param compression_level: the deflate level (1-9) of the zip, 0 stores the files
+                                  which is faster for data that is already compressed
+        :param compression_workers: the number of threads compressing the zip, defaults
+                                    to the number of cores
+        :param retries: amount of times xnatpy should attempt the upload in case of failure,
+                        the zip is created again for every attempt
         """
         # Make sure the directory is an existing directory
         if not os.path.isdir(directory):
@@ -299,16 +373,43 @@ class Services(object):
 
         content_type = 'application/zip'
 
-        # Max-size in memory is 256 MB
-        fh = tempfile.SpooledTemporaryFile(max_size=268435456, mode='wb+')
-        self._zip_directory(directory=directory, fh=fh)
+        def zip_stream():
+            return stream_zip(self._directory_files(directory), compression_level=compression_level,
+                              max_workers=compression_workers)
 
-        fh.seek(0)
-        session = self.import_(data=fh, overwrite=overwrite, quarantine=quarantine, destination=destination,
-                               trigger_pipelines=trigger_pipelines, project=project, subject=subject,
-                               experiment=experiment, content_type=content_type, import_handler=import_handler)
-        fh.close()
-        return session
+        return self.import_(data=zip_stream, overwrite=overwrite, quarantine=quarantine, destination=destination,
+                            trigger_pipelines=trigger_pipelines, project=project, subject=subject,
+                            experiment=experiment, content_type=content_type, import_handler=import_handler,
+                            retries=retries)
+
+    def bulk_import(self,
+                    jobs: Iterable[ImportJob],
+                    max_workers: int = IMPORT_WORKERS,
+                    **kwargs) -> List[ImportResult]:
+        """
+        Import a number of directories concurrently over this session, see
+        :py:meth:`import_dir`. A failing import does not stop the other imports.
+
+        :param jobs: the directories to import with their project, subject and experiment,
+                     see :py:func:`read_import_manifest` to read them from a manifest
+        :param max_workers: the maximum number of concurrent imports
+        :param kwargs: additional arguments for :py:meth:`import_dir` used for every
+                       import, e.g. ``destination`` or ``quarantine``
+        :return: the results in the order of the jobs
+        """
+        def run(job):
+            try:
+                session = self.import_dir(job.directory, project=job.project, subject=job.subject,
+                                          experiment=job.experiment, **kwargs)
+            except Exception as exception:
+                self.xnat_session.logger.error('Failed to import {}: {}'.format(job.directory, exception))
+                return ImportResult(job=job, session=None, error=exception)
+
+            self.xnat_session.logger.info('Imported {} as {}'.format(job.directory, session.uri))
+            return ImportResult(job=job, session=session, error=None)
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='XNATpyImport') as executor:
+            return list(executor.map(run, jobs))
 
     def import_dicom_inbox(self, path, cleanup=False, project=None, subject=None, experiment=None):
         """
@@ -18,18 +18,19 @@ import io
 import netrc
 from pathlib import Path
 import os
+import queue
 import re
 import threading
-from typing import Any, BinaryIO, Callable, Container, Dict, List, Optional, Tuple, Union, IO
+from typing import Any, BinaryIO, Callable, Container, Dict, Iterable, List, Optional, Tuple, Union, IO
 
-from progressbar import AdaptiveETA, AdaptiveTransferSpeed, Bar, BouncingBar, \
-    DataSize, Percentage, ProgressBar, Timer, UnknownLength
 import requests
 from urllib import parse
 
 from . import exceptions
-from .constants import FIELD_HINTS
-from .core import XNATBaseObject, XNATListing, caching
+from .constants import FIELD_HINTS, OBJECT_CACHE_SIZE
+from .core import XNATBaseObject, XNATListing, ObjectCache, caching
+from .download import PARTIAL_SUFFIX, can_resume, default_update_func, parse_content_range, range_validator, \
+    read_download_state, remove_download_state, response_size, write_download_state
 from .inspect import Inspect
 from .plugins import Plugins
 from .prearchive import Prearchive
@@ -37,6 +38,8 @@ from .users import Users
 from .services import Services
 from .type_hints import TimeoutType, JSONType
 from .exceptions import XNATValueError, XNATNotConnectedError
+from .retry import RetryPolicy
+from .utils import normalize_uri
 
 
 class BaseXNATSession(object):
@@ -82,7 +85,7 @@ class BaseXNATSession(object):
     def __init__(self, server, logger, interface=None, user=None,
                  password=None, keepalive=None, debug=False,
                  original_uri=None, logged_in_user=None, default_timeout=300,
-                 jsession=None):
+                 jsession=None, object_cache='unbounded', object_cache_size=OBJECT_CACHE_SIZE, retry_policy=None):
         # Class lookup to populate (session specific, as all session have their
         # own classes based on the server xsd)
         self.XNAT_CLASS_LOOKUP = {}
@@ -98,7 +101,8 @@ class BaseXNATSession(object):
         self._logged_in_user = logged_in_user
         self._jsession = jsession
 
-        self._cache = {'__objects__': {}}
+        self._object_cache = ObjectCache(policy=object_cache, max_size=object_cache_size)
+        self._cache = {'__objects__': self._object_cache}
         self.caching = True
         self._source_code_file = None
         self._services = Services(xnat_session=self)
@@ -109,6 +113,7 @@ class BaseXNATSession(object):
         self.logger = logger
         self.inspect = Inspect(self)
         self.request_timeout = default_timeout
+        self.retry_policy = RetryPolicy.from_parameter(retry_policy)
 
         # Detect mouting for container service/jupyter hub
         self.mount_data_dir = os.environ.get('XNAT_DATA', None)
@@ -279,6 +284,54 @@ class BaseXNATSession(object):
         """
         return self._interface
 
+    @property
+    def connection_pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Statistics of the connection pools of the underlying requests interface,
+        per pool (scheme, host and port) this contains:
+
+        * ``maxsize``: the maximum number of connections kept in the pool
+        * ``idle``: the number of kept-alive connections available for re-use
+        * ``connections``: the number of connections opened so far
+        * ``requests``: the number of requests sent so far
+
+        If the number of opened connections grows much faster than the number
+        of requests, connections are discarded and ``pool_maxsize`` of
+        :py:func:`xnat.connect` should be increased.
+        """
+        stats = {}
+        if self.interface is None:
+            return stats
+
+        for adapter in set(self.interface.adapters.values()):
+            pools = getattr(getattr(adapter, 'poolmanager', None), 'pools', None)
+            if not hasattr(pools, 'keys'):
+                # Not an urllib3 pool manager we can inspect
+                continue
+
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+
+                idle = 0
+                if isinstance(pool.pool, queue.Queue):
+                    # The free slots of the queue without a connection hold None
+                    with pool.pool.mutex:
+                        idle = sum(1 for x in pool.pool.queue if x is not None)
+                elif pool.pool is not None:
+                    idle = pool.pool.qsize()
+
+                name = '{}://{}:{}'.format(pool.scheme, pool.host, pool.port)
+                stats[name] = {
+                    'maxsize': pool.pool.maxsize if pool.pool is not None else 0,
+                    'idle': idle,
+                    'connections': pool.num_connections,
+                    'requests': pool.num_requests,
+                }
+
+        return stats
+
     @property
     def uri(self) -> str:
         return '/data/archive'
@@ -347,6 +400,41 @@ class BaseXNATSession(object):
             self.logger.error(message)
             raise XNATNotConnectedError(message)
 
+    def _send(self, method: str, uri: str, retry: bool = True, **kwargs) -> requests.Response:
+        """
+        Send a request using the interface, transient failures are retried
+        according to the :py:attr:`retry_policy` of the session.
+
+        :param method: the HTTP method to use
+        :param uri: the full uri to send the request to
+        :param retry: flag to allow retrying, needs to be disabled if the body can only be sent once
+        :param kwargs: additional arguments for :py:meth:`requests.Session.request`
+        :returns: the requests response
+        """
+        policy = self.retry_policy
+        policy.record_request()
+        attempt = 0
+
+        while True:
+            try:
+                response = self.interface.request(method, uri, **kwargs)
+            except requests.exceptions.SSLError:
+                raise exceptions.XNATSSLError('Encountered a problem with the SSL connection, are you sure the server is offering https?')
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exception:
+                if not (retry and policy.should_retry(method, attempt, exception=exception)):
+                    raise
+                delay = policy.wait(attempt)
+                self.logger.warning(f'{method} {uri} failed ({exception}), retried after {delay:.1f} seconds')
+            else:
+                if not (retry and policy.should_retry(method, attempt, response=response)):
+                    return response
+                response.close()
+                delay = policy.wait(attempt, response)
+                self.logger.warning(f'{method} {uri} returned status {response.status_code},'
+                                    f' retried after {delay:.1f} seconds')
+
+            attempt += 1
+
     def get(self,
             path: str,
             format: Optional[str] = None,
@@ -374,10 +462,7 @@ class BaseXNATSession(object):
 
         self.logger.info(f'GET URI {uri}')
 
-        try:
-            response = self.interface.get(uri, timeout=timeout, headers=headers)
-        except requests.exceptions.SSLError:
-            raise exceptions.XNATSSLError('Encountered a problem with the SSL connection, are you sure the server is offering https?')
+        response = self._send('GET', uri, timeout=timeout, headers=headers)
         self._check_response(response, accepted_status=accepted_status, uri=uri)  # Allow OK, as we want to get data
         return response
 
@@ -406,10 +491,7 @@ class BaseXNATSession(object):
 
         self.logger.info('HEAD URI {}'.format(uri))
 
-        try:
-            response = self.interface.head(uri, allow_redirects=allow_redirects, timeout=timeout, headers=headers)
-        except requests.exceptions.SSLError:
-            raise exceptions.XNATSSLError('Encountered a problem with the SSL connection, are you sure the server is offering https?')
+        response = self._send('HEAD', uri, allow_redirects=allow_redirects, timeout=timeout, headers=headers)
         self._check_response(response, accepted_status=accepted_status, uri=uri)  # Allow OK, as we want to get data
         return response
 
@@ -446,10 +528,7 @@ class BaseXNATSession(object):
         if self.debug:
             self.logger.debug('POST DATA {}'.format(data))
 
-        try:
-            response = self._interface.post(uri, data=data, json=json, timeout=timeout, headers=headers)
-        except requests.exceptions.SSLError:
-            raise exceptions.XNATSSLError('Encountered a problem with the SSL connection, are you sure the server is offering https?')
+        response = self._send('POST', uri, data=data, json=json, timeout=timeout, headers=headers)
         self._check_response(response, accepted_status=accepted_status, uri=uri)
         return response
 
@@ -493,10 +572,9 @@ class BaseXNATSession(object):
             self.logger.debug('PUT DATA {}'.format(data))
             self.logger.debug('PUT FILES {}'.format(data))
 
-        try:
-            response = self._interface.put(uri, data=data, files=files, json=json, timeout=timeout, headers=headers)
-        except requests.exceptions.SSLError:
-            raise exceptions.XNATSSLError('Encountered a problem with the SSL connection, are you sure the server is offering https?')
+        # File-like bodies are consumed when sending, so the request cannot be repeated
+        retry = not (hasattr(data, 'read') or files is not None)
+        response = self._send('PUT', uri, retry=retry, data=data, files=files, json=json, timeout=timeout, headers=headers)
         self._check_response(response, accepted_status=accepted_status, uri=uri)  # Allow created OK or Create status (OK if already exists)
         return response
 
@@ -527,10 +605,7 @@ class BaseXNATSession(object):
         if self.debug:
             self.logger.debug('DELETE HEADERS {}'.format(headers))
 
-        try:
-            response = self.interface.delete(uri, headers=headers, timeout=timeout)
-        except requests.exceptions.SSLError:
-            raise exceptions.XNATSSLError('Encountered a problem with the SSL connection, are you sure the server is offering https?')
+        response = self._send('DELETE', uri, headers=headers, timeout=timeout)
         self._check_response(response, accepted_status=accepted_status, uri=uri)
         return response
 
@@ -638,6 +713,92 @@ class BaseXNATSession(object):
             else:
                 raise XNATValueError('Could not decode JSON from [{}] {}'.format(uri, response.text))
 
+    def _start_download(self,
+                        uri: str,
+                        offset: int = 0,
+                        if_range: Optional[str] = None,
+                        timeout: TimeoutType = None) -> Tuple[requests.Response, int]:
+        """
+        Send the request for a download, if ``offset`` is given only the
+        remainder of the data is requested.
+
+        :param uri: the full uri to download
+        :param offset: the number of bytes already downloaded
+        :param if_range: validator of the data already downloaded, the server sends
+                         the full data if it does not match
+        :param timeout: timeout in seconds, float or (connection timeout, read timeout)
+        :return: the response and the offset at which the data of the response starts
+        """
+        headers = None
+        if offset > 0:
+            headers = {'Range': 'bytes={}-'.format(offset)}
+            if if_range is not None:
+                headers['If-Range'] = if_range
+
+        response = self._send('GET', uri, stream=True, timeout=timeout, headers=headers)
+
+        if offset > 0 and response.status_code == 206:
+            content_range = parse_content_range(response.headers.get('Content-Range'))
+            if content_range is None or content_range[0] != offset:
+                response.close()
+                raise exceptions.XNATIOError('Invalid Content-Range for url {} when resuming at byte {}: {}'.format(
+                    uri, offset, response.headers.get('Content-Range')
+                ))
+            return response, offset
+
+        if offset > 0 and response.status_code == 416:
+            # The range cannot be satisfied, start over
+            response.close()
+            return self._start_download(uri, timeout=timeout)
+
+        if response.status_code not in self.accepted_status_get:
+            raise exceptions.XNATResponseError('Invalid response from XNATSession for url {} (status {}):\n{}'.format(uri, response.status_code, response.text))
+
+        if offset > 0:
+            self.logger.info('Server did not resume {} at byte {}, downloading from the start'.format(uri, offset))
+
+        return response, 0
+
+    def _write_download(self,
+                        uri: str,
+                        response: requests.Response,
+                        target_stream: BinaryIO,
+                        offset: int = 0,
+                        verbose: bool = False,
+                        chunk_size: int = 524288,
+                        update_func: Optional[Callable[[int, Optional[int], bool], None]] = None) -> int:
+        """
+        Write the body of a download response to a stream
+
+        :return: the total number of bytes in the target (including the offset)
+        """
+        # Get the size of the full data if available
+        content_length = response_size(response, offset)
+
+        if verbose and update_func is None:
+            update_func = default_update_func(content_length)
+        elif update_func is None:
+            update_func = lambda *args: None
+
+        if verbose:
+            self.logger.info('Downloading {}:'.format(uri))
+
+        bytes_read = offset
+        try:
+            update_func(bytes_read, content_length, False)
+            for chunk in response.iter_content(chunk_size):
+                if bytes_read == 0 and chunk[0] == '<' and chunk.startswith(('<!DOCTYPE', '<html>')):
+                    raise ValueError('Invalid response from XNATSession (status {}):\n{}'.format(response.status_code, chunk))
+
+                bytes_read += len(chunk)
+                target_stream.write(chunk)
+
+                update_func(bytes_read, content_length, False)
+        finally:
+            update_func(bytes_read, content_length, True)
+
+        return bytes_read
+
     def download_stream(self,
                         uri: str,
                         target_stream: BinaryIO,
@@ -645,7 +806,9 @@ class BaseXNATSession(object):
                         verbose: bool = False,
                         chunk_size: int = 524288,
                         update_func: Optional[Callable[[int, Optional[int], bool], None]] = None,
-                        timeout: TimeoutType = None):
+                        timeout: TimeoutType = None,
+                        offset: int = 0,
+                        if_range: Optional[str] = None) -> requests.Response:
         """
         Download the given ``uri`` to the given ``target_stream``.
 
@@ -668,6 +831,13 @@ class BaseXNATSession(object):
                                   the download, and ``True`` when the
                                   download has completed (or failed)
         :param timeout: timeout in seconds, float or (connection timeout, read timeout)
+        :param offset: resume a download of which ``offset`` bytes are already written
+                       to ``target_stream``, only the remainder is requested. If the
+                       server sends the full data instead, the stream is truncated
+                       (which requires a seekable stream).
+        :param if_range: validator (ETag or Last-Modified) of the data already written,
+                         if it no longer matches the server sends the full data
+        :return: the response, which contains the headers of the download
         """
         self._check_connection()
 
@@ -675,65 +845,134 @@ class BaseXNATSession(object):
         self.logger.info('DOWNLOAD STREAM {}'.format(uri))
 
         # Stream the get and write to file
-        response = self.interface.get(uri, stream=True, timeout=timeout)
-
-        if response.status_code not in self.accepted_status_get:
-            raise exceptions.XNATResponseError('Invalid response from XNATSession for url {} (status {}):\n{}'.format(uri, response.status_code, response.text))
-
-        # Get the content length if available
-        content_length = response.headers.get('Content-Length', None)
-
-        if isinstance(content_length, str):
-            content_length = int(content_length)
-
-        if verbose and update_func is None:
-            update_func = default_update_func(content_length)
-        elif update_func is None:
-            update_func = lambda *args: None
-
-        if verbose:
-            self.logger.info('Downloading {}:'.format(uri))
-
-        bytes_read = 0
-        try:
-            update_func(0, content_length, False)
-            for chunk in response.iter_content(chunk_size):
-                if bytes_read == 0 and chunk[0] == '<' and chunk.startswith(('<!DOCTYPE', '<html>')):
-                    raise ValueError('Invalid response from XNATSession (status {}):\n{}'.format(response.status_code, chunk))
-
-                bytes_read += len(chunk)
-                target_stream.write(chunk)
-
-                update_func(bytes_read, content_length, False)
-        finally:
-            update_func(bytes_read, content_length, True)
+        response, start = self._start_download(uri, offset=offset, if_range=if_range, timeout=timeout)
+
+        if start != offset:
+            if not target_stream.seekable():
+                response.close()
+                raise exceptions.XNATIOError('Server did not resume the download of {}, and the target stream'
+                                             ' cannot be truncated'.format(uri))
+            target_stream.seek(0)
+            target_stream.truncate()
+
+        self._write_download(uri, response, target_stream, offset=start, verbose=verbose,
+                             chunk_size=chunk_size, update_func=update_func)
+        return response
 
     def download(self,
                  uri: str,
                  target: Union[str, Path],
                  format: Optional[str] = None,
                  verbose: bool = True,
-                 timeout: TimeoutType = None):
+                 timeout: TimeoutType = None,
+                 resume: bool = False,
+                 update_func: Optional[Callable[[int, Optional[int], bool], None]] = None):
         """
         Download uri to a target file
+
+        With ``resume`` enabled the data is first written to a partial file
+        (the target with ``.part`` appended), which is moved in place once the
+        download is complete and its size matches the size sent by the server.
+        An interrupted download is continued with a Range request, both within
+        this call (limited by the retry policy of the session) and by a later
+        call for the same uri and target. The ETag or Last-Modified of the
+        original response ensure the server only resumes an unchanged file.
+        Responses without a validator and size (e.g. generated zips) are not
+        resumed but downloaded again from the start.
+
+        :param uri: Path of the uri to retrieve
+        :param target: path of the file to write to
+        :param format: Request format
+        :param verbose: show progress
+        :param timeout: timeout in seconds, float or (connection timeout, read timeout)
+        :param resume: write to a partial file and resume interrupted downloads
+        :param update_func: progress callback, see :py:meth:`download_stream`
         """
         self._check_connection()
 
-        with open(target, 'wb') as out_fh:
-            self.download_stream(uri, out_fh, format=format, verbose=verbose, timeout=timeout)
+        if not resume:
+            with open(target, 'wb') as out_fh:
+                self.download_stream(uri, out_fh, format=format, verbose=verbose, timeout=timeout, update_func=update_func)
+        else:
+            self._download_resumable(uri, str(target), format=format, verbose=verbose,
+                                     timeout=timeout, update_func=update_func)
 
         if verbose:
             self.logger.info('\nSaved as {}...'.format(target))
 
+    def _download_resumable(self,
+                            uri: str,
+                            target: str,
+                            format: Optional[str],
+                            verbose: bool,
+                            timeout: TimeoutType,
+                            update_func: Optional[Callable[[int, Optional[int], bool], None]]):
+        full_uri = self._format_uri(uri, format=format)
+        partial_target = target + PARTIAL_SUFFIX
+
+        state = read_download_state(partial_target)
+        if state is not None and state.get('uri') != full_uri:
+            state = None
+
+        attempt = 0
+        while True:
+            # Data that cannot be checked is downloaded again from the start
+            offset = os.path.getsize(partial_target) if can_resume(state) else 0
+            if offset > 0:
+                self.logger.info('Resuming download of {} at byte {}'.format(full_uri, offset))
+
+            try:
+                with open(partial_target, 'ab' if offset > 0 else 'wb') as target_stream:
+                    response, start = self._start_download(full_uri,
+                                                           offset=offset,
+                                                           if_range=state.get('validator') if offset > 0 else None,
+                                                           timeout=timeout)
+                    size = response_size(response, start)
+
+                    if start > 0 and state.get('size') is not None and size != state['size']:
+                        # Without a matching size the partial data cannot be trusted
+                        response.close()
+                        self.logger.info('Size of {} changed, downloading from the start'.format(full_uri))
+                        state = None
+                        continue
+
+                    if start != offset:
+                        target_stream.seek(0)
+                        target_stream.truncate()
+
+                    state = {'uri': full_uri, 'validator': range_validator(response.headers), 'size': size}
+                    write_download_state(partial_target, state)
+
+                    bytes_read = self._write_download(full_uri, response, target_stream, offset=start,
+                                                      verbose=verbose, update_func=update_func)
+                break
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.Timeout) as exception:
+                if state is None or not self.retry_policy.should_retry('GET', attempt, exception=exception):
+                    raise
+                delay = self.retry_policy.wait(attempt)
+                self.logger.warning(f'Download of {full_uri} interrupted ({exception}),'
+                                    f' resuming after {delay:.1f} seconds')
+                attempt += 1
+
+        if size is not None and bytes_read != size:
+            raise exceptions.XNATIOError('Downloaded {} bytes of {}, but expected {} bytes, the partial download is'
+                                         ' kept in {}'.format(bytes_read, full_uri, size, partial_target))
+
+        os.replace(partial_target, target)
+        remove_download_state(partial_target)
+
     def download_zip(self,
                      uri: str,
                      target: Union[str, Path],
                      verbose: bool = True,
-                     timeout: TimeoutType = None):
+                     timeout: TimeoutType = None,
+                     resume: bool = False):
         """
         Download uri to a target zip file
         """
-        self.download(uri, target, format='zip', verbose=verbose, timeout=timeout)
+        self.download(uri, target, format='zip', verbose=verbose, timeout=timeout, resume=resume)
 
     def upload_file(self,
                     uri: str,
@@ -849,7 +1088,7 @@ class BaseXNATSession(object):
 
     def upload_stream(self,
                       uri: str,
-                      stream: Union[IO, io.BufferedIOBase, io.TextIOBase],
+                      stream: Union[IO, io.BufferedIOBase, io.TextIOBase, Callable[[], Iterable[bytes]]],
                       retries: int = 1,
                       query: Optional[Dict[str, str]] = None,
                       content_type: Optional[str] = None,
@@ -861,9 +1100,13 @@ class BaseXNATSession(object):
 
         :param uri: uri to upload to
         :param stream: the file handle, path to a file or a string of path
-                      (which should not be the path to an existing file!)
-        :param retries: amount of times xnatpy should retry in case of
-                        failure
+                      (which should not be the path to an existing file!), or a
+                      callable returning an iterable of bytes which is sent as
+                      a chunked request body and called again for every attempt
+        :param retries: amount of times xnatpy should attempt the upload in case of
+                        failure (an error status, connection error or timeout), between
+                        attempts xnatpy backs off according to the :py:attr:`retry_policy`
+                        of the session
         :param query: extra query string content
         :param content_type: the content type of the file, if not given it will
                              default to ``application/octet-stream``
@@ -889,16 +1132,36 @@ class BaseXNATSession(object):
         else:
             headers = {'Content-Type': content_type}
 
+        if method not in ('put', 'post'):
+            raise ValueError('Invalid upload method "{}" should be either put or post.'.format(method))
+
         while attempt < retries:
-            stream.seek(0)
+            if attempt > 0:
+                # Back off before the next attempt, honouring any Retry-After of the server
+                delay = self.retry_policy.wait(attempt - 1, response)
+                self.logger.warning(f'Upload to {uri} failed (attempt {attempt} of {retries}),'
+                                    f' retrying after {delay:.1f} seconds')
+
+            if callable(stream):
+                data = stream()
+            else:
+                stream.seek(0)
+                data = stream
             attempt += 1
 
-            if method == 'put':
-                response = self.interface.put(uri, data=stream, headers=headers, timeout=timeout)
-            elif method == 'post':
-                response = self.interface.post(uri, data=stream, headers=headers, timeout=timeout)
-            else:
-                raise ValueError('Invalid upload method "{}" should be either put or post.'.format(method))
+            # The stream is consumed by the request, so retrying is handled here
+            try:
+                response = self._send(method.upper(), uri, retry=False, data=data, headers=headers, timeout=timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exception:
+                if attempt >= retries:
+                    raise
+                self.logger.warning(f'Upload to {uri} failed ({exception})')
+                response = None
+                continue
+            finally:
+                # Stop producing an abandoned stream (e.g. the writer thread of a generated archive)
+                if callable(stream) and hasattr(data, 'close'):
+                    data.close()
 
             try:
                 self._check_response(response)
@@ -979,14 +1242,11 @@ class BaseXNATSession(object):
         :return: newly created xnatpy object
         """
         # Normalise url here so in the cache lookup it is consistent
-        if uri.startswith('/REST/'):
-            uri = uri.replace('/REST/', '/data/')
-        elif uri.startswith('/data/archive/'):
-            uri = uri.replace('/data/archive/', '/data/')
+        uri = normalize_uri(uri)
 
         # If the object is not in cache, check type and try to see if fieldname needs updating
         datafields = {}
-        if (uri, fieldname) not in self._cache['__objects__']:
+        if (uri, fieldname) not in self._object_cache:
             if type_ is None:
                 if self.xnat_session.debug:
                     self.logger.debug('Type unknown, fetching data to get type')
@@ -997,7 +1257,8 @@ class BaseXNATSession(object):
             fieldname = FIELD_HINTS.get(type_, 'UNKNOWN')
 
         # If object no in cache, create the object and add it to the cache
-        if (uri, fieldname) not in self._cache['__objects__']:
+        obj = self._object_cache.lookup((uri, fieldname))
+        if obj is None:
             if self.xnat_session.debug:
                 self.logger.debug('Looking up type {} [{}]'.format(type_, type(type_).__name__))
             if type_ not in self.XNAT_CLASS_LOOKUP:
@@ -1025,17 +1286,16 @@ class BaseXNATSession(object):
             # Call object constructor based on collected desired class and arguments
             obj = cls(uri, self, datafields=datafields, fieldname=fieldname, overwrites=overwrites, **kwargs)
 
-            self._cache['__objects__'][uri, fieldname] = obj
+            self._object_cache[uri, fieldname] = obj
         elif self.debug:
             self.logger.debug('Fetching object {} from cache'.format(uri))
 
-        # Return the object from cache
-        return self._cache['__objects__'][uri, fieldname]
+        return obj
 
     def remove_object(self, obj: XNATBaseObject):
         # Remove object from cache (so re-creation won't use cache object)
         XNATListing.delete_item_from_listings(obj)
-        del self._cache['__objects__'][obj.uri, obj.fieldname]
+        self._object_cache.pop((obj.uri, obj.fieldname), None)
 
     @property
     @caching
@@ -1112,57 +1372,22 @@ class BaseXNATSession(object):
         """
         return self._plugins
 
+    @property
+    def object_cache(self) -> ObjectCache:
+        """
+        The cache of the objects created by :py:meth:`create_object <xnat.session.BaseXNATSession.create_object>`,
+        see :py:class:`ObjectCache <xnat.core.ObjectCache>`. The hit and miss counts are available via
+        ``object_cache.stats``.
+        """
+        return self._object_cache
+
     def clearcache(self):
         """
         Clear the cache of the listings in the Session object
         """
         self._cache.clear()
-        self._cache['__objects__'] = {}
-
-
-def default_update_func(total) -> Callable[[str, str, bool], None]:
-    """
-    Set up a default update function to be used by the
-    :class:`Session.download_stream` method. This function configures a
-    ``progressbar.ProgressBar`` object which displays progress as a file
-    is downloaded.
-
-    :param int total: Total number of bytes to be downloaded (might be
-                      ``None``)
-
-    :returns: A function to be used as the ``update_func`` by the
-              ``Session.download_stream`` method.
-    """
-
-    if total is not None:
-        widgets = [
-            Percentage(),
-            ' of ', DataSize('max_value'),
-            ' ', Bar(),
-            ' ', AdaptiveTransferSpeed(),
-            ' ', AdaptiveETA(),
-        ]
-    else:
-        total = UnknownLength
-        widgets = [
-            DataSize(),
-            ' ', BouncingBar(),
-            ' ', AdaptiveTransferSpeed(),
-        ]
-
-    progress_bar = ProgressBar(widgets=widgets, max_value=total)
-
-    # The real update function which gets called by download_stream
-    def do_update(nbytes, total, finished, progress_bar=progress_bar):
-
-        if nbytes == 0:
-            progress_bar.start()
-        elif finished:
-            progress_bar.finish()
-        else:
-            progress_bar.update(nbytes)
-
-    return do_update
+        self._object_cache.clear()
+        self._cache['__objects__'] = self._object_cache
 
 
 class XNATSession(BaseXNATSession):
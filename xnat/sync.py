@@ -0,0 +1,234 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Incremental synchronisation of the files in XNAT to a local directory. The
+remote file listings are compared with the local tree and only missing or
+changed files are downloaded. A manifest in the root of the local directory
+records the size, digest and catalog of every synchronised file together with
+the size and modification time of the local copy, so unchanged files are
+recognised on later runs without reading them.
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import namedtuple
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Optional, Tuple
+
+from . import exceptions
+from .constants import DOWNLOAD_WORKERS
+from .download import PARTIAL_SUFFIX, DownloadItem, default_update_func, download_files
+
+if TYPE_CHECKING:
+    from .session import BaseXNATSession
+
+# Name of the manifest file in the root of a synchronised directory
+MANIFEST_NAME = '.xnatpy_sync.json'
+MANIFEST_VERSION = 1
+
+# Part of a file uri up to the experiment, the remainder is used as local path
+EXPERIMENT_PREFIX_REGEX = re.compile(r'^/data/(?:archive/)?(?:projects/[^/]+/subjects/[^/]+/)?experiments/[^/]+/')
+
+# A file listing to synchronise: the uri of the listing and the local directory
+# (relative to the root, using / as separator) to place the files in
+SyncSource = namedtuple('SyncSource', ['listing_uri', 'prefix'])
+
+# Result of a synchronisation, lists of the local paths (relative to the root)
+SyncResult = namedtuple('SyncResult', ['downloaded', 'unchanged', 'deleted'])
+
+
+def remote_signature(row: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """
+    The properties of a remote file that indicate if it changed
+
+    :param row: a row of a file listing
+    :return: dictionary with the size, digest and catalog id of the file
+    """
+    return {
+        'size': row.get('Size') or None,
+        'digest': row.get('digest') or None,
+        'cat_id': row.get('cat_ID') or None,
+    }
+
+
+def file_md5(path: str) -> str:
+    md5 = hashlib.md5()
+    with open(path, 'rb') as input_file:
+        for chunk in iter(lambda: input_file.read(1048576), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def read_manifest(root_dir: str) -> Dict[str, dict]:
+    """
+    Read the manifest of a synchronised directory
+
+    :param root_dir: the root of the synchronised directory
+    :return: mapping of the relative path to the entry of each file
+    """
+    try:
+        with open(os.path.join(root_dir, MANIFEST_NAME)) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return {}
+
+    return manifest.get('files', {})
+
+
+def write_manifest(root_dir: str, files: Dict[str, dict]):
+    manifest_path = os.path.join(root_dir, MANIFEST_NAME)
+    with open(manifest_path + PARTIAL_SUFFIX, 'w') as manifest_file:
+        json.dump({'version': MANIFEST_VERSION, 'files': files}, manifest_file, indent=1, sort_keys=True)
+    os.replace(manifest_path + PARTIAL_SUFFIX, manifest_path)
+
+
+def local_stat(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def is_unchanged(path: str, entry: Optional[dict], signature: Dict[str, Optional[str]]) -> bool:
+    """
+    Check if the local copy of a file matches the remote file
+
+    :param path: the local path
+    :param entry: the manifest entry of the file (None if not in the manifest)
+    :param signature: the remote signature of the file
+    :return: flag indicating the local file is up to date
+    """
+    stat = local_stat(path)
+    if stat is None:
+        return False
+
+    if entry is not None:
+        # Trust the manifest as long as neither the remote nor the local file changed
+        return entry.get('remote') == signature and tuple(entry.get('local', ())) == stat
+
+    # Not synchronised before, only accept the file if the content can be verified
+    if signature['size'] is not None and int(signature['size']) != stat[0]:
+        return False
+
+    return signature['digest'] is not None and file_md5(path) == signature['digest'].lower()
+
+
+def sync_sources(xnat_session: 'BaseXNATSession',
+                 sources: Iterable[SyncSource],
+                 root_dir: str,
+                 delete: bool = False,
+                 max_workers: int = DOWNLOAD_WORKERS,
+                 verbose: bool = False,
+                 update_func: Optional[Callable[[int, Optional[int], bool], None]] = None) -> SyncResult:
+    """
+    Synchronise the files of a number of file listings to a local directory
+
+    :param xnat_session: the session to use
+    :param sources: the file listings to synchronise
+    :param root_dir: the local directory, the manifest is stored here
+    :param delete: remove local files that were synchronised before but no
+                   longer exist remotely, other local files are never removed
+    :param max_workers: the maximum number of concurrent downloads
+    :param verbose: show progress if no update_func is given
+    :param update_func: combined progress callback for the downloads
+    :return: the result of the synchronisation
+    """
+    root_dir = os.path.abspath(root_dir)
+    os.makedirs(root_dir, exist_ok=True)
+    manifest = read_manifest(root_dir)
+
+    remote = {}
+    for source in sources:
+        rows = xnat_session.get_json(source.listing_uri)['ResultSet']['Result']
+        for row in rows:
+            path = EXPERIMENT_PREFIX_REGEX.sub('', row['URI'], 1)
+            path = '/'.join(x for x in (source.prefix, path) if x)
+
+            if path in remote:
+                raise exceptions.XNATValueError('Multiple remote files map to {}'.format(path))
+            remote[path] = row
+
+    files = {}
+    items = []
+    unchanged = []
+    for path, row in sorted(remote.items()):
+        target = os.path.normpath(os.path.join(root_dir, *path.split('/')))
+        if os.path.commonpath([root_dir, target]) != root_dir:
+            raise exceptions.XNATValueError('File {} would be written outside of {}'.format(path, root_dir))
+
+        signature = remote_signature(row)
+        if is_unchanged(target, manifest.get(path), signature):
+            unchanged.append(path)
+            files[path] = {'uri': row['URI'], 'remote': signature, 'local': local_stat(target)}
+        else:
+            size = signature['size']
+            items.append((path, local_stat(target), DownloadItem(uri=row['URI'],
+                                                                 target=target,
+                                                                 size=int(size) if str(size).isdigit() else None)))
+
+    if update_func is None and verbose and items:
+        sizes = [x[2].size for x in items]
+        update_func = default_update_func(sum(sizes) if None not in sizes else None)
+
+    # Files synchronised before that no longer exist remotely, they stay in
+    # the manifest until they are deleted so a later run can still remove them
+    removed = {path: entry for path, entry in manifest.items() if path not in remote}
+    if not delete:
+        files.update(removed)
+
+    downloaded = []
+    try:
+        download_files(xnat_session, [x[2] for x in items], max_workers=max_workers, update_func=update_func)
+    finally:
+        # Record all files that were downloaded, also if some downloads failed
+        for path, previous_stat, item in items:
+            stat = local_stat(item.target)
+            if stat is not None and stat != previous_stat:
+                downloaded.append(path)
+                files[path] = {'uri': item.uri, 'remote': remote_signature(remote[path]), 'local': stat}
+        write_manifest(root_dir, {**files, **removed} if delete else files)
+
+    deleted = []
+    if delete:
+        # Only files written by the synchronisation are removed, other files are left alone
+        for path, entry in sorted(removed.items()):
+            target = os.path.normpath(os.path.join(root_dir, *path.split('/')))
+            if os.path.commonpath([root_dir, target]) != root_dir:
+                continue
+
+            stat = local_stat(target)
+            if stat is not None and tuple(entry.get('local', ())) != stat:
+                xnat_session.logger.warning('Not deleting {}, it was modified locally'.format(target))
+                continue
+
+            if stat is not None:
+                os.remove(target)
+                deleted.append(path)
+
+            # Remove the directories that became empty
+            directory = os.path.dirname(target)
+            while directory != root_dir and os.path.isdir(directory) and not os.listdir(directory):
+                os.rmdir(directory)
+                directory = os.path.dirname(directory)
+
+        write_manifest(root_dir, files)
+
+    return SyncResult(downloaded=downloaded, unchanged=unchanged, deleted=sorted(deleted))
@@ -0,0 +1,217 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import io
+import json
+from typing import Optional
+from urllib import parse
+
+import pytest
+
+from xnat.aio import AsyncXNATSession, create_ssl_context
+from xnat.exceptions import XNATResponseError, XNATValueError
+from xnat.retry import RetryPolicy
+from xnat.session import XNATSession
+
+
+class DummyServer:
+    """
+    Minimal HTTP/1.1 server answering requests using a handler function
+    """
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        self.connections = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.serve, '127.0.0.1', 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def serve(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                method, target, _ = request_line.decode().split(' ')
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode().strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                if headers.get('transfer-encoding') == 'chunked':
+                    body = b''
+                    while True:
+                        size = int((await reader.readline()).strip(), 16)
+                        if size == 0:
+                            await reader.readline()
+                            break
+                        body += await reader.readexactly(size)
+                        await reader.readline()
+                else:
+                    body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                url = parse.urlsplit(target)
+                request = {'method': method, 'path': url.path, 'query': parse.parse_qs(url.query),
+                           'headers': headers, 'body': body}
+                self.requests.append(request)
+
+                status, response_headers, content, chunked = self.handler(request)
+                head = 'HTTP/1.1 {} Status\r\n'.format(status)
+                head += ''.join('{}: {}\r\n'.format(k, v) for k, v in response_headers.items())
+                if chunked:
+                    head += 'Transfer-Encoding: chunked\r\n\r\n'
+                    data = b''.join(b'%x\r\n%s\r\n' % (len(content[x:x + 5]), content[x:x + 5])
+                                    for x in range(0, len(content), 5)) + b'0\r\n\r\n'
+                elif 'Content-Length' in response_headers:
+                    # Announce more data than is sent to simulate a stalled response
+                    head += '\r\n'
+                    data = content
+                else:
+                    head += 'Content-Length: {}\r\n\r\n'.format(len(content))
+                    data = content
+                writer.write(head.encode() + data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+def point_to_server(xnat_session: XNATSession, port: Optional[int]):
+    server = 'http://127.0.0.1:{}'.format(port) if port is not None else 'https://xnat.example.com'
+    xnat_session._server = parse.urlparse(server)
+    xnat_session._original_uri = server
+
+
+def test_async_session(xnatpy_connection: XNATSession):
+    rows = [{'ID': 'XNAT_E{:05d}'.format(x), 'label': 'experiment{}'.format(x), 'xsiType': 'xnat:mrSessionData'}
+            for x in range(25)]
+    uploads = []
+    failures = {'count': 0}
+
+    def handler(request):
+        if request['path'] == '/data/archive/experiments':
+            offset = int(request['query']['offset'][0])
+            limit = int(request['query']['limit'][0])
+            content = json.dumps({'ResultSet': {'Result': rows[offset:offset + limit]}}).encode()
+            return 200, {'Content-Type': 'application/json'}, content, offset == 0
+        elif request['path'] == '/data/files/data.bin' and request['method'] == 'GET':
+            return 200, {}, bytes(range(256)) * 100, True
+        elif request['path'] == '/data/files/upload.bin':
+            uploads.append(request['body'])
+            return 200, {}, b'', False
+        elif request['path'] == '/data/flaky':
+            failures['count'] += 1
+            if failures['count'] < 3:
+                return 503, {}, b'Service Unavailable', False
+            return 200, {}, b'{"result": "ok"}', False
+        return 404, {}, b'Not found', False
+
+    async def main():
+        server = DummyServer(handler)
+        point_to_server(xnatpy_connection, await server.start())
+        xnatpy_connection.retry_policy = RetryPolicy(backoff_factor=0.0)
+
+        try:
+            async with AsyncXNATSession(xnatpy_connection, max_connections=4) as session:
+                # Async listings are retrieved page by page
+                listing = session.listing(xnatpy_connection.experiments, page_size=10)
+                experiments = [x async for x in listing]
+                assert [x.kwargs['id_'] for x in experiments] == [x['ID'] for x in rows]
+                assert [x['query']['offset'] for x in server.requests] == [['0'], ['10'], ['20']]
+                assert all('JSESSIONID=' in x['headers']['cookie'] for x in server.requests)
+
+                # Many requests in flight share the limited pool of connections
+                results = await asyncio.gather(*[session.get_json('/data/flaky' if x == 0 else '/data/archive/experiments',
+                                                                  query={'offset': x, 'limit': 1})
+                                                 for x in range(20)])
+                assert results[0] == {'result': 'ok'}
+                assert results[5] == {'ResultSet': {'Result': [rows[5]]}}
+                assert server.connections <= 4
+                assert all(x['in_use'] == 0 for x in session.connection_pool_stats.values())
+
+                target = io.BytesIO()
+                size = await session.download_stream('/data/files/data.bin', target, chunk_size=1000)
+                assert size == 25600
+                assert target.getvalue() == bytes(range(256)) * 100
+
+                await session.upload_stream('/data/files/upload.bin', io.BytesIO(b'uploaded data'))
+                assert uploads == [b'uploaded data']
+
+                with pytest.raises(XNATResponseError):
+                    await session.get('/data/missing')
+        finally:
+            await server.stop()
+            point_to_server(xnatpy_connection, None)
+
+    asyncio.run(main())
+
+
+def test_async_session_redirect_timeout(xnatpy_connection: XNATSession):
+    def handler(request):
+        if request['path'] == '/data/old':
+            return 302, {'Location': '/data/files/data.bin'}, b'', False
+        elif request['path'] == '/data/files/data.bin':
+            return 200, {}, b'redirected', False
+        elif request['path'] == '/data/stalled':
+            return 200, {'Content-Length': '1000'}, b'partial', False
+        return 404, {}, b'Not found', False
+
+    async def main():
+        server = DummyServer(handler)
+        point_to_server(xnatpy_connection, await server.start())
+
+        try:
+            async with AsyncXNATSession(xnatpy_connection) as session:
+                response = await session.get('/data/old')
+                assert await response.read() == b'redirected'
+                assert [x['path'] for x in server.requests] == ['/data/old', '/data/files/data.bin']
+
+                # A body that stops arriving does not hang forever
+                response = await session.request('GET', '/data/stalled', timeout=0.2)
+                with pytest.raises(asyncio.TimeoutError):
+                    await response.read()
+        finally:
+            await server.stop()
+            point_to_server(xnatpy_connection, None)
+
+    asyncio.run(main())
+
+
+def test_async_session_settings(xnatpy_connection: XNATSession):
+    import requests.certs
+
+    # A CA bundle path is used for verification
+    context = create_ssl_context(requests.certs.where())
+    assert context.cert_store_stats()['x509_ca'] > 0
+    assert create_ssl_context(False).check_hostname is False
+
+    proxies = xnatpy_connection.interface.proxies
+    xnatpy_connection.interface.proxies = {'https': 'http://proxy.example.com:3128'}
+    try:
+        with pytest.raises(XNATValueError):
+            AsyncXNATSession(xnatpy_connection)
+    finally:
+        xnatpy_connection.interface.proxies = proxies
@@ -0,0 +1,186 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import io
+import os
+import tarfile
+import zipfile
+import zlib
+
+import pytest
+
+from xnat import archive
+from xnat.archive import ParallelGzipWriter, ParallelZipWriter, ZipStreamExtractor, download_extract_zip, \
+    sanitize_member_path, write_tar
+from xnat.exceptions import XNATIOError
+
+FILES = {
+    'MR1/scans/1/file1.txt': os.urandom(10000),
+    'MR1/scans/1/file2.txt': b'x' * 3000000,
+    'MR1/empty.txt': b'',
+}
+
+
+class NonSeekableStream(io.RawIOBase):
+    """
+    Output without seek support, makes zipfile write data descriptors like a
+    streaming server does
+    """
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+
+def create_zip(compression, streaming=False):
+    output = NonSeekableStream() if streaming else io.BytesIO()
+    with zipfile.ZipFile(output, 'w', compression) as zip_file:
+        for name, content in FILES.items():
+            with zip_file.open(name, 'w') as entry:
+                entry.write(content)
+    return bytes(output.data) if streaming else output.getvalue()
+
+
+def extract(data, target_dir, chunk_size):
+    with ZipStreamExtractor(str(target_dir)) as extractor:
+        for offset in range(0, len(data), chunk_size):
+            extractor.write(data[offset:offset + chunk_size])
+    return extractor.names
+
+
+@pytest.mark.parametrize('compression,streaming', [
+    (zipfile.ZIP_STORED, False),
+    (zipfile.ZIP_DEFLATED, False),
+    (zipfile.ZIP_DEFLATED, True),
+])
+@pytest.mark.parametrize('chunk_size', [7, 65536, 100000000])
+def test_zip_stream_extractor(tmp_path, compression, streaming, chunk_size):
+    data = create_zip(compression, streaming=streaming)
+
+    assert extract(data, tmp_path, chunk_size) == list(FILES)
+    for name, content in FILES.items():
+        assert (tmp_path / name).read_bytes() == content
+
+
+def test_zip_stream_extractor_errors(tmp_path):
+    data = create_zip(zipfile.ZIP_DEFLATED)
+
+    with pytest.raises(XNATIOError):
+        extract(data[:5000], tmp_path, 1024)
+
+    # Truncated on an entry boundary, the central directory is missing
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        second_entry = zip_file.infolist()[1].header_offset
+    with pytest.raises(XNATIOError):
+        extract(data[:second_entry], tmp_path / 'boundary', 1024)
+
+    with pytest.raises(XNATIOError):
+        extract(b'', tmp_path / 'empty', 1024)
+
+    corrupt = bytearray(data)
+    corrupt[14] ^= 0xFF  # Modify the CRC of the first entry
+    with pytest.raises(XNATIOError):
+        extract(bytes(corrupt), tmp_path / 'corrupt', 1024)
+
+    with pytest.raises(XNATIOError):
+        extract(b'not a zip archive', tmp_path, 1024)
+
+    assert sanitize_member_path('../../etc/passwd') == os.path.join('etc', 'passwd')
+    assert sanitize_member_path('/absolute/path') == os.path.join('absolute', 'path')
+    assert sanitize_member_path('..') is None
+
+
+def test_download_extract_zip(xnatpy_mock, xnatpy_connection, tmp_path):
+    xnatpy_mock.get('/data/experiments/XNAT_E00001/scans/ALL/files',
+                    content=create_zip(zipfile.ZIP_DEFLATED, streaming=True))
+
+    names = download_extract_zip(xnatpy_connection, '/data/experiments/XNAT_E00001/scans/ALL/files', str(tmp_path))
+
+    assert names == list(FILES)
+    assert xnatpy_mock.last_request.qs['format'] == ['zip']
+    assert (tmp_path / 'MR1' / 'scans' / '1' / 'file2.txt').read_bytes() == b'x' * 3000000
+
+
+@pytest.mark.parametrize('data', [b'', b'abc' * 1000, os.urandom(5000) + b'x' * 20000, b'y' * 4096])
+def test_parallel_gzip_writer(data):
+    output = NonSeekableStream()
+    with ParallelGzipWriter(output, max_workers=3, block_size=1024) as writer:
+        for offset in range(0, len(data), 700):
+            writer.write(data[offset:offset + 700])
+
+    assert gzip.decompress(bytes(output.data)) == data
+    assert writer.tell() == len(data)
+
+
+@pytest.mark.parametrize('max_workers,members', [(None, 1), (2, 3)])
+def test_write_tar_gzip_members(tmp_path, max_workers, members):
+    directory = tmp_path / 'data'
+    directory.mkdir()
+    (directory / 'file.bin').write_bytes(os.urandom(2500000))
+
+    output = NonSeekableStream()
+    write_tar(output, str(directory), compress=True, max_workers=max_workers)
+    data = bytes(output.data)
+
+    # Count the concatenated gzip members
+    count = 0
+    while data:
+        decompressor = zlib.decompressobj(31)
+        decompressor.decompress(data)
+        data = decompressor.unused_data
+        count += 1
+    assert count == members
+
+    with tarfile.open(fileobj=io.BytesIO(bytes(output.data))) as tar_file:
+        assert tar_file.extractfile('file.bin').read() == (directory / 'file.bin').read_bytes()
+
+
+@pytest.mark.parametrize('compression_level', [0, 1, 6])
+@pytest.mark.parametrize('zip64', [False, True])
+def test_parallel_zip_writer(tmp_path, monkeypatch, compression_level, zip64):
+    if zip64:
+        # Force zip64 records without creating files of gigabytes
+        monkeypatch.setattr(archive, 'ZIP64_LIMIT', 2000)
+
+    files = dict(FILES)
+    files['MR1/scans/2/block.dcm'] = b'z' * 4096
+    files['MR1/scans/2/caf\u00e9.txt'] = b'unicode name'
+    for name, content in files.items():
+        path = tmp_path / 'input' / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+
+    output = NonSeekableStream()
+    with ParallelZipWriter(output, compression_level=compression_level, max_workers=3, block_size=1024) as writer:
+        for name in files:
+            writer.add_file(str(tmp_path / 'input' / name), name)
+    data = bytes(output.data)
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.namelist() == list(files)
+        for info in zip_file.infolist():
+            assert zip_file.read(info) == files[info.filename]
+            assert info.compress_type == (zipfile.ZIP_STORED if compression_level == 0 else zipfile.ZIP_DEFLATED)
+
+    assert extract(data, tmp_path / 'output', 1000) == list(files)
+    for name, content in files.items():
+        assert (tmp_path / 'output' / name).read_bytes() == content
@@ -0,0 +1,137 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from pathlib import Path
+
+import pytest
+from xml.etree import ElementTree
+
+from xnat.convert_xsd import SchemaParser
+
+TEST_SCHEMA = Path(__file__).parent / 'xnat_test_schema.xsd'
+
+CHAIN_SCHEMA = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema targetNamespace="http://example.com/chain" xmlns:chain="http://example.com/chain"
+           xmlns:xnat="http://nrg.wustl.edu/xnat" xmlns:xs="http://www.w3.org/2001/XMLSchema">
+{types}
+</xs:schema>
+"""
+
+CHAIN_TYPE = """    <xs:complexType name="{name}">
+        <xs:complexContent>
+            <xs:extension base="{base}">
+                <xs:attribute name="{name}Value" type="xs:string"/>
+            </xs:extension>
+        </xs:complexContent>
+    </xs:complexType>"""
+
+
+def chain_schema(length, base='xnat:experimentData', reverse=True, cycle=False):
+    types = []
+    for index in range(length):
+        if index == 0:
+            type_base = 'chain:type{}'.format(length - 1) if cycle else base
+        else:
+            type_base = 'chain:type{}'.format(index - 1)
+        types.append(CHAIN_TYPE.format(name='type{}'.format(index), base=type_base))
+
+    if reverse:
+        types = types[::-1]
+
+    return CHAIN_SCHEMA.format(types='\n'.join(types))
+
+
+def create_parser(*schemas):
+    parser = SchemaParser(logger=logging.getLogger('xnatpy_test'))
+    parser.parse_schema_file(str(TEST_SCHEMA))
+    for index, schema in enumerate(schemas):
+        parser.parse_schema_xmlstring(schema, schema_uri='/xapi/schemas/test{}'.format(index))
+
+    # The ordering works on names, which is what write does as well
+    parser.class_list = {value.name: value for value in parser.class_list.values()}
+    return parser
+
+
+def assert_dependency_order(parser, order):
+    positions = {cls.name: index for index, cls in enumerate(order)}
+    for cls in order:
+        for dependency in parser.dependencies(cls):
+            assert positions[dependency] < positions[cls.name], \
+                '{} is visited before its dependency {}'.format(cls.name, dependency)
+
+
+def test_iter_order():
+    parser = create_parser()
+    order = list(parser)
+
+    assert len(order) == len(parser.class_list)
+    assert_dependency_order(parser, order)
+
+
+def test_iter_long_chain():
+    # A chain defined in reverse order needs a pass per class with a multi-pass approach
+    parser = create_parser(chain_schema(100))
+    order = list(parser)
+
+    assert len(order) == len(parser.class_list)
+    assert_dependency_order(parser, order)
+    assert order[-1].name == 'chain:type99'
+
+
+def test_iter_cycle(caplog: pytest.LogCaptureFixture):
+    parser = create_parser(chain_schema(3, cycle=True), chain_schema(2, base='xnat:unknownData').replace('chain', 'other'))
+    order = [cls.name for cls in parser]
+
+    # Classes in the cycle are skipped, classes depending on an unknown class as well
+    assert not any(x.startswith('chain:') for x in order)
+    assert not any(x.startswith('other:') for x in order)
+    assert len(order) == len(parser.class_list) - 5
+
+    errors = [x.getMessage() for x in caplog.records if x.levelno == logging.ERROR]
+    assert errors == ['Found cyclic dependency between classes: chain:type2 -> chain:type1 -> chain:type0 -> chain:type2']
+
+    warnings = [x.getMessage() for x in caplog.records if x.levelno == logging.WARNING]
+    assert warnings == ['Cannot define other:type0, depends on unknown class(es): xnat:unknownData']
+
+
+def test_parse_schema_stream(monkeypatch: pytest.MonkeyPatch):
+    reference = create_parser(chain_schema(5))
+
+    # Feed the schema in tiny chunks, elements will be split over many chunks
+    monkeypatch.setattr(SchemaParser, 'CHUNK_SIZE', 7)
+    parser = create_parser(chain_schema(5))
+
+    assert list(parser.class_list) == list(reference.class_list)
+    assert parser.namespaces == reference.namespaces
+    assert parser.namespaces['chain'] == 'http://example.com/chain'
+    assert parser.schemas == ['file://{}'.format(TEST_SCHEMA), '/xapi/schemas/test0']
+    assert [x.name for x in parser] == [x.name for x in reference]
+
+
+def test_parse_schema_invalid():
+    parser = create_parser()
+    classes = list(parser.class_list)
+
+    # A schema that is cut off should not leave partially parsed classes behind
+    data = chain_schema(5)
+    with pytest.raises(ElementTree.ParseError):
+        parser.parse_schema_xmlstring(data[:len(data) // 2], schema_uri='/xapi/schemas/broken')
+
+    assert list(parser.class_list) == classes
+    assert '/xapi/schemas/broken' not in parser.schemas
+
+    assert parser.parse_schema_data('<html><body>Login</body>', schema_uri='/xapi/schemas/broken') is False
+    assert list(parser.class_list) == classes
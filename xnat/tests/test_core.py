@@ -13,5 +13,285 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import gc
 
+import pytest
 
+from xnat.core import ListingRegistry, ObjectCache, XNATBaseListing, XNATListing, XNATObject, plan_filters
+from xnat.exceptions import XNATValueError
+from xnat.session import XNATSession
+from xnat.tests.mock import XnatpyRequestsMocker
+
+
+class DummyObject:
+    def __init__(self, uri):
+        self.uri = uri
+
+
+class DummyListing:
+    # Listings are mappings and therefore not hashable
+    __hash__ = None
+
+    def __init__(self, registry):
+        self.LISTING_REGISTRY = registry
+        self._cache = {'data_maps': True}
+        registry.register(self)
+
+    def clearcache(self):
+        self._cache.clear()
+        self.LISTING_REGISTRY.unindex(self)
+
+    delete_item_from_cache = XNATBaseListing.delete_item_from_cache
+
+
+def create_xnat_object(uri):
+    obj = XNATObject.__new__(XNATObject)
+    obj._uri = uri
+    return obj
+
+
+def test_object_cache_unbounded():
+    cache = ObjectCache()
+    objects = [DummyObject('/data/experiments/{}'.format(x)) for x in range(100)]
+    for obj in objects:
+        cache[obj.uri, None] = obj
+
+    assert len(cache) == 100
+    assert cache.lookup(('/data/experiments/0', None)) is objects[0]
+    assert cache.lookup(('/data/experiments/missing', None)) is None
+    assert cache.stats == {'policy': 'unbounded', 'max_size': None, 'size': 100,
+                           'hits': 1, 'misses': 1, 'evictions': 0}
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.hits == 1
+
+
+def test_object_cache_lru():
+    cache = ObjectCache(policy='lru', max_size=3)
+    for index in range(3):
+        cache['/data/experiments/{}'.format(index), None] = DummyObject(index)
+
+    # Touch the first object, so the second is the least recently used
+    assert cache.lookup(('/data/experiments/0', None)) is not None
+    cache['/data/experiments/3', None] = DummyObject(3)
+
+    assert len(cache) == 3
+    assert ('/data/experiments/1', None) not in cache
+    assert list(cache) == [('/data/experiments/2', None), ('/data/experiments/0', None), ('/data/experiments/3', None)]
+    assert cache.stats['evictions'] == 1
+
+    with pytest.raises(XNATValueError):
+        ObjectCache(policy='lru')
+
+    with pytest.raises(XNATValueError):
+        ObjectCache(policy='random')
+
+
+def test_object_cache_weak():
+    cache = ObjectCache(policy='weak')
+    obj = DummyObject('/data/experiments/1')
+    cache[obj.uri, None] = obj
+    cache['/data/experiments/2', None] = DummyObject('/data/experiments/2')
+    gc.collect()
+
+    assert cache.lookup(('/data/experiments/1', None)) is obj
+    assert cache.lookup(('/data/experiments/2', None)) is None
+    assert len(cache) == 1
+
+    del obj
+    gc.collect()
+    assert len(cache) == 0
+
+
+def test_listing_registry():
+    registry = ListingRegistry()
+    experiment1 = create_xnat_object('/data/archive/experiments/1')
+    experiment2 = create_xnat_object('/data/experiments/2')
+    experiment3 = create_xnat_object('/REST/experiments/3')
+
+    listing1 = DummyListing(registry)
+    listing2 = DummyListing(registry)
+    registry.index(listing1, [experiment1, experiment2, DummyObject('/data/experiments/4')])
+    registry.index(listing2, [experiment2])
+
+    assert len(registry) == 2
+    assert registry.listings_for(experiment1) == [listing1]
+    assert registry.listings_for(create_xnat_object('/REST/experiments/1')) == [listing1]
+    assert len(registry.listings_for(experiment2)) == 2
+    assert registry.listings_for(experiment3) == []
+    assert registry.listings_for(DummyObject('/data/experiments/4')) == []
+
+    # Re-indexing replaces the old entries
+    registry.index(listing2, [experiment3])
+    assert registry.listings_for(experiment2) == [listing1]
+    assert registry.contains(listing2, experiment3)
+    assert not registry.contains(listing2, experiment2)
+
+    # Only the listings containing the object are cleared
+    for listing in registry.listings_for(experiment3):
+        listing.delete_item_from_cache(experiment3)
+    del listing
+    assert listing2._cache == {}
+    assert listing1._cache == {'data_maps': True}
+    assert registry.listings_for(experiment3) == []
+
+    # Listings are not kept alive by the registry
+    del listing1
+    gc.collect()
+    assert len(registry) == 1
+    assert registry.listings_for(experiment1) == []
+    assert registry._index == {}
+
+
+def experiment_rows(count):
+    return [{'ID': 'XNAT_E{:05d}'.format(x), 'label': 'experiment{}'.format(x),
+             'xsiType': 'xnat:mrSessionData', 'URI': '/data/experiments/XNAT_E{:05d}'.format(x)} for x in range(count)]
+
+
+def create_experiment_listing(xnat_session, **kwargs):
+    return XNATListing(xnat_session.uri + '/experiments',
+                       xnat_session=xnat_session,
+                       parent=xnat_session,
+                       field_name='experiments',
+                       secondary_lookup_field='label',
+                       **kwargs)
+
+
+def test_listing_paginate(xnatpy_connection: XNATSession, xnatpy_mock: XnatpyRequestsMocker):
+    rows = experiment_rows(25)
+
+    def paged_response(request, context):
+        offset = int(request.qs['offset'][0])
+        limit = int(request.qs['limit'][0])
+        return {'ResultSet': {'Result': rows[offset:offset + limit]}}
+
+    xnatpy_mock.get('/data/archive/experiments', json=paged_response)
+    listing = create_experiment_listing(xnatpy_connection)
+
+    objects = list(listing.paginate(page_size=10))
+    assert [x.kwargs['id_'] for x in objects] == [x['ID'] for x in rows]
+    assert [x.kwargs['label'] for x in objects] == [x['label'] for x in rows]
+    requests = [x for x in xnatpy_mock.request_history if x.path == '/data/archive/experiments']
+    assert [x.qs['offset'] for x in requests] == [['0'], ['10'], ['20']]
+    assert all(x.qs['sortby'] == ['id'] for x in requests)
+
+    # Paginating does not build the cached data maps
+    assert 'data_maps' not in listing._cache
+
+    # Local filters are still applied to every page
+    objects = list(create_experiment_listing(xnatpy_connection, filter={'label': 'experiment1?'}).paginate(page_size=5))
+    assert [x.kwargs['label'] for x in objects] == ['experiment{}'.format(x) for x in range(10, 20)]
+
+    with pytest.raises(XNATValueError):
+        next(listing.paginate(page_size=0))
+
+
+@pytest.mark.parametrize('count', [10, 25])
+def test_listing_paginate_unsupported(xnatpy_connection: XNATSession, xnatpy_mock: XnatpyRequestsMocker, count):
+    # A server that ignores the paging parameters and always returns everything
+    rows = experiment_rows(count)
+    xnatpy_mock.get('/data/archive/experiments', json={'ResultSet': {'Result': rows}})
+    listing = create_experiment_listing(xnatpy_connection)
+
+    objects = list(listing.paginate(page_size=10))
+    assert [x.kwargs['id_'] for x in objects] == [x['ID'] for x in rows]
+    requests = [x for x in xnatpy_mock.request_history if x.path == '/data/archive/experiments']
+    assert len(requests) <= 2
+
+
+def test_listing_lazy_objects(xnatpy_connection: XNATSession, xnatpy_mock: XnatpyRequestsMocker):
+    rows = experiment_rows(20)
+    rows.append(dict(rows[0], ID='XNAT_E99999', URI='/data/experiments/XNAT_E99999'))  # Duplicate label
+    xnatpy_mock.get('/data/archive/experiments', json={'ResultSet': {'Result': rows}})
+
+    created = []
+    create_object = xnatpy_connection.create_object
+
+    def counting_create_object(uri, **kwargs):
+        created.append(uri)
+        return create_object(uri, **kwargs)
+
+    xnatpy_connection.create_object = counting_create_object
+    listing = create_experiment_listing(xnatpy_connection)
+
+    # Inspecting the listing does not create any objects
+    assert len(listing) == 21
+    assert list(listing.keys())[:2] == ['XNAT_E00000', 'XNAT_E00001']
+    assert 'XNAT_E00005' in listing
+    assert 'experiment5' in listing
+    assert 'experiment0' not in listing
+    assert 'missing' not in listing
+    assert 20 in listing
+    assert 21 not in listing
+    assert created == []
+
+    # Objects are created on access and only once
+    assert listing['experiment3'].kwargs['id_'] == 'XNAT_E00003'
+    assert listing['XNAT_E00003'] is listing['experiment3']
+    assert listing[3] is listing['experiment3']
+    assert created == ['/data/archive/experiments/XNAT_E00003']
+
+    assert [x.kwargs['id_'] for x in listing[-2:]] == ['XNAT_E00019', 'XNAT_E99999']
+    assert len(created) == 3
+
+    with pytest.raises(KeyError):
+        listing['experiment0']
+
+    with pytest.raises(IndexError):
+        listing[21]
+
+
+def test_plan_filters():
+    plan = plan_filters('experiments', {'label': 'experiment*', 'project': 'test*', 'xsiType': 'xnat:mrSessionData',
+                                        'ID': 'XNAT_E0000?', 'insert_user': 'admin'})
+
+    assert plan.server == {'label': 'experiment*', 'xsiType': 'xnat:mrSessionData'}
+    assert [key for key, _ in plan.local] == ['project', 'ID', 'insert_user']
+
+    matches = dict(plan.local)
+    assert matches['project']('test_project')
+    assert not matches['project']('other_test')
+    assert matches['ID']('XNAT_E00001')
+    assert not matches['ID']('XNAT_E000011')
+
+    # Listings without server side filtering support filter everything locally
+    plan = plan_filters('scans', {'type': 'T1*'})
+    assert plan.server == {}
+    assert [key for key, _ in plan.local] == ['type']
+
+
+def test_listing_filter_pushdown(xnatpy_connection: XNATSession, xnatpy_mock: XnatpyRequestsMocker):
+    rows = experiment_rows(20)
+    for row in rows:
+        row['project'] = 'project{}'.format(int(row['ID'][-1]) % 2)
+
+    def filtered_response(request, context):
+        # Mimic the server applying the label and project filters and only returning the requested columns
+        label = request.qs.get('label', ['*'])[0].rstrip('*')
+        project = request.qs.get('project')
+        columns = request.qs['columns'][0].split(',')
+        return {'ResultSet': {'Result': [{k: v for k, v in x.items() if k.lower() in columns}
+                                         for x in rows if x['label'].lower().startswith(label)
+                                         and (project is None or x['project'] == project[0])]}}
+
+    xnatpy_mock.get('/data/archive/experiments', json=filtered_response)
+    listing = create_experiment_listing(xnatpy_connection, filter={'label': 'experiment1*', 'project': 'project?'})
+
+    assert set(listing.keys()) == {'XNAT_E{:05d}'.format(x) for x in [1] + list(range(10, 20))}
+    request = xnatpy_mock.request_history[-1]
+    assert request.qs['label'] == ['experiment1*']
+    assert 'project' not in request.qs
+    assert request.qs['columns'] == ['id,uri,label,xsitype,project']
+
+    # Filters on keys that are missing from the rows do not match
+    listing = create_experiment_listing(xnatpy_connection, filter={'insert_user': 'admin'})
+    assert len(listing) == 0
+    assert xnatpy_mock.request_history[-1].qs['columns'] == ['id,uri,label,xsitype,insert_user']
+
+    listing = create_experiment_listing(xnatpy_connection, filter={'label': 'experiment1*'})
+    table = listing.tabulate(columns=('ID', 'label', 'project'), filter={'project': 'project1'})
+    assert [x.ID for x in table] == ['XNAT_E{:05d}'.format(x) for x in [1, 11, 13, 15, 17, 19]]
+    request = xnatpy_mock.request_history[-1]
+    assert request.qs['label'] == ['experiment1*']
+    assert request.qs['project'] == ['project1']
@@ -0,0 +1,107 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+
+import pytest
+
+from xnat.dicom import HeaderSource, first_scan_files, harvest_headers
+
+pydicom = pytest.importorskip('pydicom')
+
+EXPERIMENT_URI = '/data/experiments/XNAT_E00001'
+
+
+def create_dicom(series_description, pixel_bytes=1000000):
+    from pydicom.dataset import Dataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+    dataset = Dataset()
+    dataset.file_meta = FileMetaDataset()
+    dataset.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    dataset.file_meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.4'
+    dataset.file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    dataset.preamble = bytes(128)
+    dataset.PatientName = 'Test^Patient'
+    dataset.SeriesDescription = series_description
+    dataset.ImageType = ['ORIGINAL', 'PRIMARY']
+    dataset.BitsAllocated = 8
+    dataset.PixelData = bytes(pixel_bytes)
+
+    output = io.BytesIO()
+    pydicom.dcmwrite(output, dataset)
+    return output.getvalue()
+
+
+def mock_range_file(xnatpy_mock, uri, data):
+    def callback(request, context):
+        first, last = request.headers['Range'][len('bytes='):].split('-')
+        first, last = int(first), int(last)
+        context.status_code = 206
+        context.headers['Content-Range'] = 'bytes {}-{}/{}'.format(first, last, len(data))
+        return data[first:last + 1]
+
+    xnatpy_mock.head(uri, headers={'Accept-Ranges': 'bytes', 'ETag': '"abc"', 'Content-Length': str(len(data))})
+    xnatpy_mock.get(uri, content=callback)
+
+
+def file_row(scan, resource, name):
+    return {
+        'URI': '{}/scans/{}/resources/{}/files/{}'.format(EXPERIMENT_URI, scan, resource, name),
+        'collection': resource,
+        'Name': name,
+    }
+
+
+def test_first_scan_files():
+    rows = [
+        file_row('10', 'DICOM', '2.dcm'),
+        file_row('10', 'DICOM', '1.dcm'),
+        file_row('2', 'SNAPSHOTS', 'a.gif'),
+        file_row('2', 'secondary', 'b.dcm'),
+        file_row('3', 'NIFTI', 'image.nii'),
+    ]
+
+    assert list(first_scan_files(rows).items()) == [
+        ('2', EXPERIMENT_URI + '/scans/2/resources/secondary/files/b.dcm'),
+        ('10', EXPERIMENT_URI + '/scans/10/resources/DICOM/files/1.dcm'),
+    ]
+
+
+def test_harvest_headers(xnatpy_mock, xnatpy_connection):
+    rows = [file_row('1', 'DICOM', '1.dcm'), file_row('2', 'DICOM', '1.dcm'), file_row('3', 'DICOM', '1.dcm')]
+    xnatpy_mock.get(EXPERIMENT_URI + '/scans/ALL/files', json={'ResultSet': {'Result': rows}})
+
+    data = {}
+    for scan in ['1', '2']:
+        data[scan] = create_dicom('Series {}'.format(scan))
+        mock_range_file(xnatpy_mock, rows[int(scan) - 1]['URI'], data[scan])
+    xnatpy_mock.head(rows[2]['URI'], status_code=404)
+
+    table = harvest_headers(xnatpy_connection,
+                            [HeaderSource(experiment='MR1', uri=EXPERIMENT_URI)],
+                            fields=['PatientName', 'SeriesDescription', 'ImageType', 'Rows'])
+
+    assert [(x.scan, x.SeriesDescription) for x in table] == [('1', 'Series 1'), ('2', 'Series 2'), ('3', None)]
+    assert table[0].experiment == 'MR1'
+    assert table[0].PatientName == 'Test^Patient'
+    assert table[0].ImageType == ['ORIGINAL', 'PRIMARY']
+    assert table[0].Rows is None
+    assert table[0].error is None
+    assert table[2].error is not None
+
+    # Only the header is transferred, not the pixel data
+    ranges = [x.headers['Range'][len('bytes='):].split('-') for x in xnatpy_mock.request_history if 'Range' in x.headers]
+    assert sum(int(last) - int(first) + 1 for first, last in ranges) < sum(len(x) for x in data.values()) // 10
@@ -0,0 +1,406 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+
+import pytest
+from urllib3.exceptions import ProtocolError
+
+from xnat.core import XNATObject
+from xnat.download import DownloadItem, DownloadScheduler, download_files, download_ranged, parse_content_range
+from xnat.exceptions import XNATIOError, XNATValueError
+from xnat.mixin import AbstractResource, ImageScanData, ImageSessionData, ProjectData, SubjectData
+
+RESOURCE_URI = '/data/experiments/XNAT_E00001/resources/1'
+
+
+class DummyResource(AbstractResource):
+    xpath = 'xnat:resourceCatalog'
+
+
+def mock_resource_files(xnatpy_mock, files):
+    rows = []
+    for path, content in files.items():
+        uri = '{}/files/{}'.format(RESOURCE_URI, path)
+        xnatpy_mock.get(uri, content=content)
+        rows.append({'Name': path.rsplit('/', 1)[-1], 'URI': uri, 'Size': str(len(content))})
+
+    xnatpy_mock.get(RESOURCE_URI + '/files', json={'ResultSet': {'Result': rows}})
+
+
+def test_download_files(xnatpy_mock, xnatpy_connection, tmp_path):
+    files = {'a.txt': b'a' * 100, 'sub/b.txt': b'b' * 50}
+    mock_resource_files(xnatpy_mock, files)
+
+    items = [DownloadItem(uri='{}/files/{}'.format(RESOURCE_URI, path),
+                          target=str(tmp_path / path),
+                          size=len(content)) for path, content in files.items()]
+
+    progress = []
+    targets = download_files(xnatpy_connection, items, max_workers=2,
+                             update_func=lambda *args: progress.append(args))
+
+    assert targets == [x.target for x in items]
+    for path, content in files.items():
+        assert (tmp_path / path).read_bytes() == content
+    assert progress[0] == (0, 150, False)
+    assert progress[-1] == (150, 150, True)
+    assert not any(x.endswith('.part') for _, _, names in os.walk(tmp_path) for x in names)
+
+    # A size mismatch fails the download and leaves no partial file behind
+    bad_item = DownloadItem(uri=items[0].uri, target=str(tmp_path / 'bad.txt'), size=10)
+    with pytest.raises(XNATIOError):
+        download_files(xnatpy_connection, [items[1], bad_item])
+
+    assert not (tmp_path / 'bad.txt').exists()
+    assert not (tmp_path / 'bad.txt.part').exists()
+
+
+def test_resource_download_dir_parallel(xnatpy_mock, xnatpy_connection, tmp_path):
+    files = {'a.txt': b'a' * 100, 'sub/b.txt': b'b' * 50, 'other/b.txt': b'c' * 10}
+    mock_resource_files(xnatpy_mock, files)
+
+    resource = DummyResource(uri=RESOURCE_URI, xnat_session=xnatpy_connection, id_='1')
+    target_dir = resource.download_dir(str(tmp_path / 'out'), verbose=False, method='parallel')
+
+    assert target_dir == str(tmp_path / 'out')
+    for path, content in files.items():
+        assert (tmp_path / 'out' / path).read_bytes() == content
+
+    # Flattening would write two files to b.txt
+    with pytest.raises(XNATValueError):
+        resource.download_dir(str(tmp_path / 'flat'), verbose=False, method='parallel', flatten_dirs=True)
+
+    with pytest.raises(XNATValueError):
+        resource.download_dir(str(tmp_path / 'out'), method='unknown')
+
+
+def range_callback(data, etag='"abc"'):
+    def callback(request, context):
+        context.headers['ETag'] = etag
+        range_header = request.headers.get('Range')
+        if range_header is None or request.headers.get('If-Range') != etag:
+            context.status_code = 200
+            return data
+
+        first, last = range_header[len('bytes='):].split('-')
+        first = int(first)
+        last = int(last) if last else len(data) - 1
+        context.status_code = 206
+        context.headers['Content-Range'] = 'bytes {}-{}/{}'.format(first, last, len(data))
+        return data[first:last + 1]
+    return callback
+
+
+class InterruptedStream(io.RawIOBase):
+    """
+    Body that fails after sending a number of bytes
+    """
+    def __init__(self, data, fail_after):
+        self.data = io.BytesIO(data)
+        self.fail_after = fail_after
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if self.data.tell() >= self.fail_after:
+            raise ProtocolError('Connection broken')
+        size = self.fail_after - self.data.tell() if size is None or size < 0 else min(size, self.fail_after - self.data.tell())
+        return self.data.read(size)
+
+
+def test_parse_content_range():
+    assert parse_content_range('bytes 100-199/1000') == (100, 199, 1000)
+    assert parse_content_range('bytes */1000') == (None, None, 1000)
+    assert parse_content_range('bytes 0-9/*') == (0, 9, None)
+    assert parse_content_range('invalid') is None
+
+
+def test_download_resume(xnatpy_mock, xnatpy_connection, tmp_path):
+    uri = RESOURCE_URI + '/files/large.bin'
+    data = bytes(range(256)) * 4
+    xnatpy_mock.get(uri, content=range_callback(data))
+
+    # Resume a partial download with a matching state
+    target = tmp_path / 'large.bin'
+    partial = tmp_path / 'large.bin.part'
+    partial.write_bytes(data[:300])
+    (tmp_path / 'large.bin.part.json').write_text(json.dumps({
+        'uri': 'https://xnat.example.com' + uri, 'validator': '"abc"', 'size': len(data)
+    }))
+
+    xnatpy_connection.download(uri, target, verbose=False, resume=True)
+
+    assert target.read_bytes() == data
+    assert not partial.exists()
+    assert not (tmp_path / 'large.bin.part.json').exists()
+    assert xnatpy_mock.last_request.headers['Range'] == 'bytes=300-'
+    assert xnatpy_mock.last_request.headers['If-Range'] == '"abc"'
+
+    # The file changed on the server, so it is downloaded from the start
+    partial.write_bytes(b'x' * 300)
+    (tmp_path / 'large.bin.part.json').write_text(json.dumps({
+        'uri': 'https://xnat.example.com' + uri, 'validator': '"old"', 'size': len(data)
+    }))
+    target.unlink()
+
+    xnatpy_connection.download(uri, target, verbose=False, resume=True)
+    assert target.read_bytes() == data
+
+    # A partial file without state is not trusted
+    partial.write_bytes(b'x' * 300)
+    target.unlink()
+    xnatpy_connection.download(uri, target, verbose=False, resume=True)
+    assert target.read_bytes() == data
+    assert 'Range' not in xnatpy_mock.last_request.headers
+
+    # A partial file without a validator and size (e.g. a generated zip) is not trusted either
+    partial.write_bytes(b'x' * 300)
+    (tmp_path / 'large.bin.part.json').write_text(json.dumps({
+        'uri': 'https://xnat.example.com' + uri, 'validator': None, 'size': None
+    }))
+    target.unlink()
+    xnatpy_connection.download(uri, target, verbose=False, resume=True)
+    assert target.read_bytes() == data
+    assert 'Range' not in xnatpy_mock.last_request.headers
+
+    # Resume on the same stream
+    stream = io.BytesIO(data[:500])
+    stream.seek(0, io.SEEK_END)
+    response = xnatpy_connection.download_stream(uri, stream, offset=500, if_range='"abc"')
+    assert response.status_code == 206
+    assert stream.getvalue() == data
+
+
+def test_download_resume_interrupted(xnatpy_mock, xnatpy_connection, tmp_path):
+    uri = RESOURCE_URI + '/files/large.bin'
+    data = bytes(range(256)) * 4096
+    xnatpy_connection.retry_policy.sleep = lambda delay: None
+
+    # Break the connection after the first chunk of the download
+    xnatpy_mock.get(uri, response_list=[
+        {'body': InterruptedStream(data, 524288), 'headers': {'ETag': '"abc"', 'Content-Length': str(len(data))}},
+        {'content': range_callback(data)},
+    ])
+
+    target = tmp_path / 'large.bin'
+    xnatpy_connection.download(uri, target, verbose=False, resume=True)
+
+    assert target.read_bytes() == data
+    assert xnatpy_mock.last_request.headers['Range'] == 'bytes=524288-'
+
+
+def test_download_ranged(xnatpy_mock, xnatpy_connection, tmp_path):
+    uri = RESOURCE_URI + '/files/large.bin'
+    data = bytes(range(256)) * 40
+    xnatpy_mock.head(uri, headers={'Accept-Ranges': 'bytes', 'ETag': '"abc"', 'Content-Length': str(len(data))})
+    xnatpy_mock.get(uri, content=range_callback(data))
+
+    progress = []
+    target = tmp_path / 'large.bin'
+    assert download_ranged(xnatpy_connection, uri, target, chunk_size=1000, max_workers=4,
+                           update_func=lambda *args: progress.append(args))
+    assert target.read_bytes() == data
+    assert progress[-1] == (len(data), len(data), True)
+
+    ranges = sorted(x.headers['Range'] for x in xnatpy_mock.request_history
+                    if x.method == 'GET' and x.path.endswith('large.bin'))
+    assert len(ranges) == 11
+    assert 'bytes=10000-10239' in ranges
+
+    # Files smaller than two chunks are not split
+    assert not download_ranged(xnatpy_connection, uri, tmp_path / 'small.bin', chunk_size=8000)
+
+    # A server not honouring the ranges results in a fallback
+    xnatpy_mock.get(uri, content=data, headers={'ETag': '"abc"'})
+    assert not download_ranged(xnatpy_connection, uri, tmp_path / 'fallback.bin', chunk_size=1000)
+    assert not (tmp_path / 'fallback.bin').exists()
+    assert not (tmp_path / 'fallback.bin.part').exists()
+
+    # A server rejecting HEAD requests results in a fallback
+    xnatpy_mock.head(uri, status_code=405)
+    assert not download_ranged(xnatpy_connection, uri, tmp_path / 'rejected.bin', chunk_size=1000)
+
+
+def create_zip(files):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as zip_file:
+        for name, content in files.items():
+            zip_file.writestr(name, content)
+    return data.getvalue()
+
+
+def files_or_zip_callback(files, zip_callback=None):
+    # The scheduler requests the file listing before the zip of the same uri
+    def callback(request, context):
+        if request.qs.get('format') == ['zip']:
+            return zip_callback(request, context) if zip_callback else create_zip(files)
+
+        rows = [{'Name': name, 'URI': '/' + name} for name in files]
+        return json.dumps({'ResultSet': {'Result': rows}}).encode()
+    return callback
+
+
+def test_download_scheduler(xnatpy_mock, xnatpy_connection, tmp_path):
+    active = {'current': 0, 'max': 0}
+    lock = threading.Lock()
+
+    def zip_callback(data):
+        def callback(request, context):
+            with lock:
+                active['current'] += 1
+                active['max'] = max(active['max'], active['current'])
+            time.sleep(0.05)
+            with lock:
+                active['current'] -= 1
+            return data
+        return callback
+
+    for index in range(4):
+        files = {'MR{}/scans/1/file.txt'.format(index): b'data'}
+        xnatpy_mock.get('/data/experiments/XNAT_E0000{}/scans/ALL/files'.format(index),
+                        content=files_or_zip_callback(files, zip_callback(create_zip(files))))
+    xnatpy_mock.get('/data/experiments/XNAT_E00009/scans/ALL/files', status_code=500)
+
+    messages = []
+    scheduler = DownloadScheduler(xnatpy_connection, max_workers=4, max_per_host=2,
+                                  progress_callback=messages.append)
+    for index in [0, 1, 9, 2, 3]:
+        scheduler.add('experiment {}'.format(index),
+                      '/data/experiments/XNAT_E0000{}/scans/ALL/files'.format(index),
+                      str(tmp_path))
+
+    with pytest.raises(XNATIOError):
+        scheduler.run()
+
+    # The failure does not stop the other jobs
+    for index in range(4):
+        assert (tmp_path / 'MR{}'.format(index) / 'scans' / '1' / 'file.txt').read_bytes() == b'data'
+    assert [job.description for job, _ in scheduler.failures] == ['experiment 9']
+    assert len(messages) == 5
+    assert active['max'] <= 2
+
+
+class DummySession(ImageSessionData, XNATObject):
+    xpath = 'xnat:mrSessionData'
+
+    def __init__(self, xnat_session, id_, label, scans=()):
+        super().__init__(uri='/data/experiments/' + id_, xnat_session=xnat_session, id_=id_)
+        self._label = label
+        self._scans = {scan: DummyScan(self.uri + '/scans/' + scan, xnat_session, id_=scan) for scan in scans}
+
+    @property
+    def fulluri(self):
+        return self.uri
+
+    @property
+    def label(self):
+        return self._label
+
+    @property
+    def scans(self):
+        return self._scans
+
+
+class DummyScan(ImageScanData, XNATObject):
+    xpath = 'xnat:mrScanData'
+
+
+class DummySubject(SubjectData, XNATObject):
+    xpath = 'xnat:subjectData'
+
+    def __init__(self, xnat_session, label, experiments):
+        super().__init__(uri='/data/subjects/' + label, xnat_session=xnat_session, id_=label)
+        self._overwrites['label'] = label
+        self._experiments = {x.label: x for x in experiments}
+
+    @property
+    def experiments(self):
+        return self._experiments
+
+
+class DummyProject(ProjectData, XNATObject):
+    xpath = 'xnat:projectData'
+
+    def __init__(self, xnat_session, name, subjects):
+        super().__init__(uri='/data/projects/' + name, xnat_session=xnat_session, id_=name)
+        self._name = name
+        self._subjects = {x.label: x for x in subjects}
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def subjects(self):
+        return self._subjects
+
+
+def test_project_download_dir(xnatpy_mock, xnatpy_connection, tmp_path):
+    experiment_uri = '/data/experiments/XNAT_E0000{}/scans/ALL/files'
+    xnatpy_mock.get(experiment_uri.format(1), content=files_or_zip_callback({'MR1/scans/1/file.txt': b'data'}))
+    xnatpy_mock.get(experiment_uri.format(2), content=files_or_zip_callback({}))
+
+    subjects = [
+        DummySubject(xnatpy_connection, 'S1', [DummySession(xnatpy_connection, 'XNAT_E00001', 'MR1'),
+                                               DummySession(xnatpy_connection, 'XNAT_E00002', 'MR2')]),
+        DummySubject(xnatpy_connection, 'S2', []),
+    ]
+    project = DummyProject(xnatpy_connection, 'PROJ', subjects)
+    project.download_dir(str(tmp_path), verbose=False)
+
+    assert (tmp_path / 'PROJ' / 'S1' / 'MR1' / 'scans' / '1' / 'file.txt').read_bytes() == b'data'
+    assert (tmp_path / 'PROJ' / 'S2').is_dir()
+
+    # The experiment without files is not requested as a zip
+    zips = [x.path for x in xnatpy_mock.request_history if x.qs.get('format') == ['zip']]
+    assert zips == [experiment_uri.format(1).lower()]
+
+
+def test_subject_download_dir_per_scan(xnatpy_mock, xnatpy_connection, tmp_path):
+    scan_uri = '/data/experiments/XNAT_E00001/scans/{}/files'
+    xnatpy_mock.get(scan_uri.format(1), content=files_or_zip_callback({'MR1/scans/1/a.txt': b'a'}))
+    xnatpy_mock.get(scan_uri.format(2), content=files_or_zip_callback({'MR1/scans/2/b.txt': b'b'}))
+
+    experiment = DummySession(xnatpy_connection, 'XNAT_E00001', 'MR1', scans=['1', '2'])
+    subject = DummySubject(xnatpy_connection, 'S1', [experiment])
+    subject.download_dir(str(tmp_path), verbose=False, per_scan=True)
+
+    assert (tmp_path / 'S1' / 'MR1' / 'scans' / '1' / 'a.txt').read_bytes() == b'a'
+    assert (tmp_path / 'S1' / 'MR1' / 'scans' / '2' / 'b.txt').read_bytes() == b'b'
+
+
+def test_download_resume_unvalidated(xnatpy_mock, xnatpy_connection, tmp_path):
+    uri = RESOURCE_URI + '/files/generated.zip'
+    data = bytes(range(256)) * 4096
+    xnatpy_connection.retry_policy.sleep = lambda delay: None
+
+    # Without validator and size an interrupted download restarts from the start
+    xnatpy_mock.get(uri, response_list=[
+        {'body': InterruptedStream(data, 524288)},
+        {'content': data},
+    ])
+
+    target = tmp_path / 'generated.zip'
+    xnatpy_connection.download(uri, target, verbose=False, resume=True)
+
+    assert target.read_bytes() == data
+    assert 'Range' not in xnatpy_mock.last_request.headers
@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import logging
+import time
 from unittest.mock import ANY, call
 
 import pytest
@@ -124,18 +125,40 @@ def test_parse_schemas_17(mocker: MockerFixture, caplog: pytest.LogCaptureFixtur
                     'xdat',
                     'xdat/instance']
 
-    # Create mock parser
+    # Create mock parser, make the first schemas slowest to check the parse order is retained
+    delays = {
+        '/xapi/schemas/security': 0.05,
+        '/xapi/schemas/xnat': 0.04,
+        '/xapi/schemas/xdat/display': 0.03,
+        '/xapi/schemas/xdat': 0.02,
+        '/xapi/schemas/xdat/instance': 0.01,
+    }
+
+    def retrieve_schema(xnat_session, schema_uri):
+        time.sleep(delays[schema_uri])
+        return f'<schema {schema_uri}>'
+
     parser = mocker.Mock()
+    parser.retrieve_schema.side_effect = retrieve_schema
     session = FakeSession()
     parse_schemas_17(parser=parser, xnat_session=session)
-    assert len(parser.parse_schema_uri.mock_calls) == 5
+    assert len(parser.retrieve_schema.mock_calls) == 5
+    assert len(parser.parse_schema_data.mock_calls) == 5
 
-    parser.parse_schema_uri.assert_has_calls([
+    parser.retrieve_schema.assert_has_calls([
         call(xnat_session=session, schema_uri='/xapi/schemas/security'),
         call(xnat_session=session, schema_uri='/xapi/schemas/xnat'),
         call(xnat_session=session, schema_uri='/xapi/schemas/xdat/display'),
         call(xnat_session=session, schema_uri='/xapi/schemas/xdat'),
         call(xnat_session=session, schema_uri='/xapi/schemas/xdat/instance')
+    ], any_order=True)
+
+    parser.parse_schema_data.assert_has_calls([
+        call('<schema /xapi/schemas/security>', schema_uri='/xapi/schemas/security'),
+        call('<schema /xapi/schemas/xnat>', schema_uri='/xapi/schemas/xnat'),
+        call('<schema /xapi/schemas/xdat/display>', schema_uri='/xapi/schemas/xdat/display'),
+        call('<schema /xapi/schemas/xdat>', schema_uri='/xapi/schemas/xdat'),
+        call('<schema /xapi/schemas/xdat/instance>', schema_uri='/xapi/schemas/xdat/instance')
     ])
 
     # Test error test call
@@ -160,9 +183,15 @@ def test_parse_schemas_17(mocker: MockerFixture, caplog: pytest.LogCaptureFixtur
     parser = mocker.Mock()
     session = mocker.Mock()
     parse_schemas_17(parser=parser, xnat_session=session, extension_types=False)
-    assert len(parser.parse_schema_uri.mock_calls) == 2
+    assert len(parser.retrieve_schema.mock_calls) == 2
+    assert len(parser.parse_schema_data.mock_calls) == 2
 
-    parser.parse_schema_uri.assert_has_calls([
+    parser.retrieve_schema.assert_has_calls([
         call(xnat_session=session, schema_uri='/xapi/schemas/xnat'),
         call(xnat_session=session, schema_uri='/xapi/schemas/xdat'),
+    ], any_order=True)
+
+    parser.parse_schema_data.assert_has_calls([
+        call(ANY, schema_uri='/xapi/schemas/xnat'),
+        call(ANY, schema_uri='/xapi/schemas/xdat'),
     ])
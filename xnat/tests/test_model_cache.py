@@ -0,0 +1,141 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from xnat import build_model
+from xnat.convert_xsd import SchemaParser
+from xnat.model_cache import ModelCache, MODEL_CACHE_ENV
+from xnat.session import XNATSession
+from xnat.tests.mock import XnatpyRequestsMocker
+
+TEST_SCHEMA = Path(__file__).parent / 'xnat_test_schema.xsd'
+
+
+@pytest.fixture()
+def schema_server(xnatpy_mock: XnatpyRequestsMocker):
+    xnatpy_mock.get('/xapi/schemas', json=['xnat'])
+    xnatpy_mock.get('/xapi/schemas/xnat', text=TEST_SCHEMA.read_text())
+    xnatpy_mock.get('/data/search/elements', json={'ResultSet': {'Result': []}})
+    yield xnatpy_mock
+
+
+def test_compute_key():
+    schemas = [('/xapi/schemas/xnat', '<xs:schema/>')]
+    key = ModelCache.compute_key('https://xnat.example.com', '1.8.5', '0.5.1', schemas, extension_types=True)
+
+    assert key == ModelCache.compute_key('https://xnat.example.com/', '1.8.5', '0.5.1', schemas, extension_types=True)
+    assert key != ModelCache.compute_key('https://other.example.com', '1.8.5', '0.5.1', schemas, extension_types=True)
+    assert key != ModelCache.compute_key('https://xnat.example.com', '1.8.6', '0.5.1', schemas, extension_types=True)
+    assert key != ModelCache.compute_key('https://xnat.example.com', '1.8.5', '0.5.1', schemas, extension_types=False)
+    assert key != ModelCache.compute_key('https://xnat.example.com', '1.8.5', '0.5.1',
+                                         [('/xapi/schemas/xnat', '<xs:schema />')], extension_types=True)
+
+
+def test_from_parameter(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv(MODEL_CACHE_ENV, raising=False)
+    assert ModelCache.from_parameter(None) is None
+    assert ModelCache.from_parameter(False) is None
+    assert ModelCache.from_parameter(str(tmp_path)).path == str(tmp_path)
+
+    monkeypatch.setenv(MODEL_CACHE_ENV, str(tmp_path))
+    assert ModelCache.from_parameter(None).path == str(tmp_path)
+
+    monkeypatch.setenv(MODEL_CACHE_ENV, '0')
+    assert ModelCache.from_parameter(None) is None
+
+    cache = ModelCache(str(tmp_path))
+    assert ModelCache.from_parameter(cache) is cache
+
+
+def test_build_model_cached(xnatpy_connection: XNATSession,
+                            schema_server: XnatpyRequestsMocker,
+                            mocker: MockerFixture,
+                            tmp_path: Path):
+    cache = ModelCache(str(tmp_path))
+    parse_spy = mocker.spy(SchemaParser, 'parse_schema_data')
+
+    build_model(xnatpy_connection, extension_types=True, connection_id='cache_test_1', model_cache=cache)
+    assert parse_spy.call_count == 1
+    assert len(cache.entries()) == 1
+    assert xnatpy_connection._source_code_file is None
+    first_module = xnatpy_connection.classes
+    assert xnatpy_connection.XNAT_CLASS_LOOKUP['xnat:mrSessionData'] is first_module.MrSessionData
+
+    # Second build should be served from the cache without parsing
+    build_model(xnatpy_connection, extension_types=True, connection_id='cache_test_2', model_cache=cache)
+    assert parse_spy.call_count == 1
+    assert xnatpy_connection.classes is not first_module
+    assert xnatpy_connection.classes._SOURCE_CODE_FILE == first_module._SOURCE_CODE_FILE
+    assert xnatpy_connection.XNAT_CLASS_LOOKUP['xnat:mrSessionData'] is xnatpy_connection.classes.MrSessionData
+
+    # A changed schema results in a new entry
+    schema_server.get('/xapi/schemas/xnat', text=TEST_SCHEMA.read_text().replace('fieldStrength', 'fieldStrength2'))
+    build_model(xnatpy_connection, extension_types=True, connection_id='cache_test_3', model_cache=cache)
+    assert parse_spy.call_count == 2
+    assert len(cache.entries()) == 2
+
+    # Cached files should survive disconnecting
+    xnatpy_connection.disconnect()
+    assert os.path.isfile(first_module._SOURCE_CODE_FILE)
+
+    cache.clear()
+    assert cache.entries() == []
+
+
+def test_build_model_lazy(xnatpy_connection: XNATSession,
+                          schema_server: XnatpyRequestsMocker,
+                          tmp_path: Path):
+    schema_server.get('/data/search/elements', json={'ResultSet': {'Result': [
+        {'ELEMENT_NAME': 'xnat:mrSessionData'}
+    ]}})
+    schema_server.get('/data/search/elements/xnat:mrSessionData', json={'ResultSet': {'Result': [
+        {'FIELD_ID': 'SCANNER'}
+    ]}})
+
+    cache = ModelCache(str(tmp_path))
+    build_model(xnatpy_connection, extension_types=True, connection_id='lazy_test', model_cache=cache, lazy=True)
+    lookup = xnatpy_connection.XNAT_CLASS_LOOKUP
+    module = xnatpy_connection.classes
+
+    # Nothing but the FileData is created up front
+    assert list(lookup.created) == ['xnat:fileData']
+    assert 'xnat:mrSessionData' in lookup
+    assert 'MrSessionData' not in vars(module)
+    assert 'MrSessionData' in dir(module)
+
+    # Creating a class creates the classes it depends on
+    cls = lookup['xnat:mrSessionData']
+    assert cls.__name__ == 'MrSessionData'
+    assert issubclass(cls, module.ImageSessionData)
+    assert set(lookup.created) == {'xnat:fileData', 'xnat:mrSessionData',
+                                   'xnat:imageSessionData', 'xnat:experimentData'}
+    assert module.MrSessionData is cls
+    assert 'xnat:projectData' not in lookup.created
+
+    # Display fields are injected when the class is created
+    assert hasattr(cls, 'SCANNER')
+
+    with pytest.raises(KeyError):
+        lookup['xnat:doesNotExist']
+
+    with pytest.raises(AttributeError):
+        module.DoesNotExist
+
+    assert len(lookup) == len(list(lookup))
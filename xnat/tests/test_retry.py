@@ -0,0 +1,129 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+
+import pytest
+import requests
+
+from xnat.exceptions import XNATResponseError, XNATUploadError
+from xnat.retry import RetryBudget, RetryPolicy, parse_retry_after
+from xnat.session import XNATSession
+from xnat.tests.mock import XnatpyRequestsMocker
+
+
+def create_policy(**kwargs):
+    policy = RetryPolicy(**kwargs)
+    policy.delays = []
+    policy.sleep = policy.delays.append
+    return policy
+
+
+def create_response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return response
+
+
+def test_retry_policy():
+    policy = create_policy(max_retries=2, budget=False)
+
+    assert policy.should_retry('GET', 0, response=create_response(503))
+    assert policy.should_retry('put', 1, response=create_response(502))
+    assert not policy.should_retry('GET', 2, response=create_response(503))
+    assert not policy.should_retry('GET', 0, response=create_response(500))
+    assert not policy.should_retry('POST', 0, response=create_response(503))
+
+    # Non-idempotent requests are only retried if they never reached the server
+    assert policy.should_retry('POST', 0, exception=requests.exceptions.ConnectTimeout())
+    assert not policy.should_retry('POST', 0, exception=requests.exceptions.ReadTimeout())
+    assert policy.should_retry('GET', 0, exception=requests.exceptions.ReadTimeout())
+    assert not policy.should_retry('GET', 0, exception=requests.exceptions.SSLError())
+
+    assert RetryPolicy.from_parameter(False).max_retries == 0
+    assert RetryPolicy.from_parameter(5).max_retries == 5
+    assert RetryPolicy.from_parameter(policy) is policy
+
+
+def test_retry_backoff():
+    policy = create_policy(backoff_factor=1.0, max_backoff=5.0, jitter=False)
+    assert [policy.backoff(x) for x in range(5)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+    assert policy.backoff(0, create_response(503, {'Retry-After': '3'})) == 3.0
+    assert policy.backoff(0, create_response(503, {'Retry-After': '120'})) == 5.0
+
+    policy = create_policy(backoff_factor=1.0, max_backoff=5.0)
+    assert all(0 <= policy.backoff(2) <= 4.0 for _ in range(100))
+
+    assert parse_retry_after('10') == 10.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert parse_retry_after('soon') is None
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, max_tokens=2)
+    assert budget.withdraw()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+    policy = create_policy(max_retries=5, budget=RetryBudget(ratio=0.0, max_tokens=1))
+    assert policy.should_retry('GET', 0, response=create_response(503))
+    assert not policy.should_retry('GET', 1, response=create_response(503))
+
+
+def test_session_retry(xnatpy_connection: XNATSession, xnatpy_mock: XnatpyRequestsMocker):
+    xnatpy_connection.retry_policy = create_policy(max_retries=3, backoff_factor=1.0, jitter=False)
+
+    xnatpy_mock.get('/data/projects', response_list=[
+        {'status_code': 503},
+        {'status_code': 502, 'headers': {'Retry-After': '7'}},
+        {'status_code': 200, 'json': {'ResultSet': {'Result': []}}},
+    ])
+    assert xnatpy_connection.get_json('/data/projects') == {'ResultSet': {'Result': []}}
+    assert xnatpy_connection.retry_policy.delays == [1.0, 7.0]
+
+    # Give up after the maximum number of retries
+    xnatpy_mock.delete('/data/projects/test', status_code=503)
+    with pytest.raises(XNATResponseError):
+        xnatpy_connection.delete('/data/projects/test')
+    assert xnatpy_mock.request_history[-4:] == [x for x in xnatpy_mock.request_history if x.method == 'DELETE']
+
+    # Posts are not idempotent and are not retried
+    xnatpy_mock.post('/data/projects', status_code=503)
+    with pytest.raises(XNATResponseError):
+        xnatpy_connection.post('/data/projects')
+    assert len([x for x in xnatpy_mock.request_history if x.method == 'POST']) == 1
+
+
+def test_upload_stream_backoff(xnatpy_connection: XNATSession, xnatpy_mock: XnatpyRequestsMocker):
+    xnatpy_connection.retry_policy = create_policy(backoff_factor=1.0, jitter=False)
+
+    xnatpy_mock.put('/data/files/test.txt', response_list=[
+        {'status_code': 503},
+        {'status_code': 500},
+        {'status_code': 200},
+    ])
+    xnatpy_connection.upload_stream('/data/files/test.txt', io.BytesIO(b'data'), retries=3)
+    assert xnatpy_connection.retry_policy.delays == [1.0, 2.0]
+    assert len([x for x in xnatpy_mock.request_history if x.method == 'PUT']) == 3
+
+    xnatpy_mock.put('/data/files/test.txt', status_code=503)
+    with pytest.raises(XNATUploadError):
+        xnatpy_connection.upload_stream('/data/files/test.txt', io.BytesIO(b'data'), retries=2)
@@ -0,0 +1,126 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import zipfile
+
+import pytest
+
+from xnat.prearchive import PrearchiveSession
+from xnat.services import ImportJob, read_import_manifest, write_import_results
+
+PREARCHIVE_URI = '/data/prearchive/projects/PROJ/20230101_120000000/MR1'
+
+
+def create_session_dir(path):
+    files = {
+        'MR1/1/1.dcm': b'a' * 100000,
+        'MR1/1/2.dcm': b'b' * 100,
+        'MR1/2/image.nii.gz': b'c' * 5000,
+    }
+    for name, content in files.items():
+        file_path = path / name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(content)
+    return files
+
+
+@pytest.mark.parametrize('compression_level,compress_type', [(None, zipfile.ZIP_DEFLATED), (0, zipfile.ZIP_STORED)])
+def test_import_dir(xnatpy_mock, xnatpy_connection, tmp_path, compression_level, compress_type):
+    files = create_session_dir(tmp_path)
+    bodies = []
+
+    def callback(request, context):
+        # The zip is generated while it is sent
+        assert request.headers['Transfer-Encoding'] == 'chunked'
+        bodies.append(b''.join(request.body))
+        return PREARCHIVE_URI + '\r\n'
+
+    xnatpy_mock.post('/data/services/import', text=callback)
+
+    session = xnatpy_connection.services.import_dir(str(tmp_path / 'MR1'), project='PROJ',
+                                                    compression_level=compression_level, compression_workers=2)
+
+    assert isinstance(session, PrearchiveSession)
+    assert xnatpy_mock.last_request.qs['project'] == ['proj']
+    assert xnatpy_mock.last_request.headers['Content-Type'] == 'application/zip'
+
+    with zipfile.ZipFile(io.BytesIO(bodies[0])) as zip_file:
+        assert zip_file.testzip() is None
+        assert sorted(zip_file.namelist()) == sorted(files)
+        assert all(x.compress_type == compress_type for x in zip_file.infolist())
+        for name, content in files.items():
+            assert zip_file.read(name) == content
+
+
+def test_import_dir_retry(xnatpy_mock, xnatpy_connection, tmp_path):
+    xnatpy_connection.retry_policy.sleep = lambda delay: None
+    create_session_dir(tmp_path)
+    bodies = []
+
+    def callback(request, context):
+        bodies.append(b''.join(request.body))
+        context.status_code = 503 if len(bodies) == 1 else 200
+        return PREARCHIVE_URI
+
+    xnatpy_mock.post('/data/services/import', text=callback)
+
+    session = xnatpy_connection.services.import_dir(str(tmp_path / 'MR1'), retries=2)
+
+    # The zip is generated again for the second attempt
+    assert isinstance(session, PrearchiveSession)
+    assert len(bodies) == 2
+    assert bodies[0] == bodies[1]
+    assert zipfile.ZipFile(io.BytesIO(bodies[1])).testzip() is None
+
+
+def test_bulk_import(xnatpy_mock, xnatpy_connection, tmp_path):
+    for name in ['MR1', 'MR2', 'MR3']:
+        create_session_dir(tmp_path / name)
+    (tmp_path / 'manifest.csv').write_text('directory,project,subject,experiment\n'
+                                           'MR1/MR1,PROJ,SUBJ1,MR1\n'
+                                           'MR2/MR1,PROJ,SUBJ2,\n'
+                                           'MR3/MR1,PROJ,,\n')
+
+    jobs = read_import_manifest(str(tmp_path / 'manifest.csv'))
+    assert jobs[0] == ImportJob(directory=str(tmp_path / 'MR1' / 'MR1'), project='PROJ', subject='SUBJ1', experiment='MR1')
+    assert jobs[1].experiment is None
+
+    def callback(request, context):
+        b''.join(request.body)
+        if request.qs.get('subject') == ['subj2']:
+            context.status_code = 500
+            return 'Import failed'
+        return '/data/prearchive/projects/PROJ/20230101_120000000/{}'.format(request.qs.get('subject', ['MR3'])[0])
+
+    xnatpy_mock.post('/data/services/import', text=callback)
+
+    results = xnatpy_connection.services.bulk_import(jobs, max_workers=2, quarantine=True)
+
+    assert [x.job for x in results] == jobs
+    assert results[0].session.uri == '/data/prearchive/projects/PROJ/20230101_120000000/subj1'
+    assert results[1].session is None
+    assert results[1].error is not None
+    assert results[2].error is None
+    imports = [x for x in xnatpy_mock.request_history if x.path == '/data/services/import']
+    assert len(imports) == 3
+    assert all(x.qs['quarantine'] == ['true'] for x in imports)
+
+    output = io.StringIO()
+    write_import_results(results, output)
+    lines = output.getvalue().splitlines()
+    assert lines[0] == 'directory,project,subject,experiment,status,uri,error'
+    assert lines[1].endswith(',PROJ,SUBJ1,MR1,imported,/data/prearchive/projects/PROJ/20230101_120000000/subj1,')
+    assert ',PROJ,SUBJ2,,failed,,' in lines[2]
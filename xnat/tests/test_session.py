@@ -0,0 +1,50 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import queue
+
+from pytest_mock import MockerFixture
+
+from xnat.session import XNATSession
+
+
+class DummyPool:
+    def __init__(self, host, maxsize, idle, connections, requests):
+        self.scheme = 'https'
+        self.host = host
+        self.port = 443
+        # Like urllib3 the free slots hold None until a connection is returned
+        self.pool = queue.LifoQueue(maxsize)
+        for _ in range(maxsize - idle - 1):
+            self.pool.put(None)
+        for _ in range(idle):
+            self.pool.put(object())
+        self.num_connections = connections
+        self.num_requests = requests
+
+
+def test_connection_pool_stats(xnatpy_connection: XNATSession, mocker: MockerFixture):
+    pools = {
+        'key1': DummyPool('xnat.example.com', maxsize=32, idle=4, connections=5, requests=120),
+        'key2': DummyPool('other.example.com', maxsize=32, idle=1, connections=1, requests=1),
+    }
+    adapter = mocker.Mock()
+    adapter.poolmanager.pools = pools
+    mocker.patch.dict(xnatpy_connection.interface.adapters, {'https://': adapter, 'http://': adapter}, clear=True)
+
+    assert xnatpy_connection.connection_pool_stats == {
+        'https://xnat.example.com:443': {'maxsize': 32, 'idle': 4, 'connections': 5, 'requests': 120},
+        'https://other.example.com:443': {'maxsize': 32, 'idle': 1, 'connections': 1, 'requests': 1},
+    }
@@ -0,0 +1,113 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+
+from xnat.sync import MANIFEST_NAME, SyncSource, sync_sources
+
+EXPERIMENT_URI = '/data/experiments/XNAT_E00001'
+LISTING_URI = EXPERIMENT_URI + '/scans/ALL/files'
+
+
+def mock_experiment_files(xnatpy_mock, files):
+    rows = []
+    for path, (content, cat_id) in files.items():
+        uri = '{}/scans/1/resources/DICOM/files/{}'.format(EXPERIMENT_URI, path)
+        xnatpy_mock.get(uri, content=content)
+        rows.append({
+            'Name': path,
+            'URI': uri,
+            'Size': str(len(content)),
+            'digest': hashlib.md5(content).hexdigest(),
+            'cat_ID': cat_id,
+        })
+
+    xnatpy_mock.get(LISTING_URI, json={'ResultSet': {'Result': rows}})
+
+
+def downloaded_paths(xnatpy_mock):
+    return sorted(x.path.rsplit('/', 1)[-1] for x in xnatpy_mock.request_history if '/files/' in x.path)
+
+
+def test_sync_sources(xnatpy_mock, xnatpy_connection, tmp_path):
+    sources = [SyncSource(listing_uri=LISTING_URI, prefix='MR1')]
+    root = tmp_path / 'subject'
+    local_dir = root / 'MR1' / 'scans' / '1' / 'resources' / 'DICOM' / 'files'
+
+    mock_experiment_files(xnatpy_mock, {'1.dcm': (b'a' * 10, '1'), '2.dcm': (b'b' * 20, '1')})
+    result = sync_sources(xnatpy_connection, sources, str(root))
+
+    assert sorted(result.downloaded) == ['MR1/scans/1/resources/DICOM/files/1.dcm',
+                                         'MR1/scans/1/resources/DICOM/files/2.dcm']
+    assert (local_dir / '2.dcm').read_bytes() == b'b' * 20
+    manifest = json.loads((root / MANIFEST_NAME).read_text())
+    assert len(manifest['files']) == 2
+
+    # Nothing changed, so nothing is downloaded
+    xnatpy_mock.reset_mock()
+    result = sync_sources(xnatpy_connection, sources, str(root))
+    assert result.downloaded == []
+    assert len(result.unchanged) == 2
+    assert downloaded_paths(xnatpy_mock) == []
+
+    # A changed remote file, a new remote file and a locally modified file are downloaded
+    mock_experiment_files(xnatpy_mock, {'1.dcm': (b'c' * 10, '2'), '2.dcm': (b'b' * 20, '1'), '3.dcm': (b'd', '1')})
+    (local_dir / '2.dcm').write_bytes(b'x' * 5)
+    (local_dir / 'extra.txt').write_bytes(b'extra')
+    xnatpy_mock.reset_mock()
+    result = sync_sources(xnatpy_connection, sources, str(root))
+
+    assert downloaded_paths(xnatpy_mock) == ['1.dcm', '2.dcm', '3.dcm']
+    assert (local_dir / '1.dcm').read_bytes() == b'c' * 10
+    assert (local_dir / '2.dcm').read_bytes() == b'b' * 20
+    assert (local_dir / 'extra.txt').exists()
+
+    # Without a manifest, files with a matching digest are kept
+    (root / MANIFEST_NAME).unlink()
+    xnatpy_mock.reset_mock()
+    result = sync_sources(xnatpy_connection, sources, str(root))
+    assert downloaded_paths(xnatpy_mock) == []
+    assert len(result.unchanged) == 3
+
+    # Synchronised files that no longer exist remotely are deleted on request,
+    # files that were not written by the synchronisation are kept
+    mock_experiment_files(xnatpy_mock, {'3.dcm': (b'd', '1')})
+    result = sync_sources(xnatpy_connection, sources, str(root), delete=True)
+    assert result.deleted == ['MR1/scans/1/resources/DICOM/files/1.dcm',
+                              'MR1/scans/1/resources/DICOM/files/2.dcm']
+    assert sorted(x.name for x in local_dir.iterdir()) == ['3.dcm', 'extra.txt']
+    assert list(json.loads((root / MANIFEST_NAME).read_text())['files']) == ['MR1/scans/1/resources/DICOM/files/3.dcm']
+
+
+def test_sync_sources_delete(xnatpy_mock, xnatpy_connection, tmp_path):
+    sources = [SyncSource(listing_uri=LISTING_URI, prefix='')]
+    local_dir = tmp_path / 'scans' / '1' / 'resources' / 'DICOM' / 'files'
+
+    mock_experiment_files(xnatpy_mock, {'1.dcm': (b'a' * 10, '1'), '2.dcm': (b'b' * 20, '1'), '3.dcm': (b'c', '1')})
+    sync_sources(xnatpy_connection, sources, str(tmp_path))
+
+    # Without delete, removed files stay in the manifest so a later run can delete them
+    mock_experiment_files(xnatpy_mock, {})
+    result = sync_sources(xnatpy_connection, sources, str(tmp_path))
+    assert result.deleted == []
+    assert len(json.loads((tmp_path / MANIFEST_NAME).read_text())['files']) == 3
+
+    # Locally modified files are not deleted
+    (local_dir / '2.dcm').write_bytes(b'modified')
+    result = sync_sources(xnatpy_connection, sources, str(tmp_path), delete=True)
+    assert result.deleted == ['scans/1/resources/DICOM/files/1.dcm', 'scans/1/resources/DICOM/files/3.dcm']
+    assert sorted(x.name for x in local_dir.iterdir()) == ['2.dcm']
+    assert json.loads((tmp_path / MANIFEST_NAME).read_text())['files'] == {}
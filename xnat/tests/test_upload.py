@@ -0,0 +1,177 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import os
+import tarfile
+
+import pytest
+import requests
+
+from xnat.archive import generate_stream
+from xnat.exceptions import XNATUploadError
+from xnat.mixin import AbstractResource
+
+RESOURCE_URI = '/data/experiments/XNAT_E00001/resources/1'
+
+
+class DummyResource(AbstractResource):
+    xpath = 'xnat:resourceCatalog'
+
+
+def create_directory(path, files):
+    for name, content in files.items():
+        file_path = path / name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(content)
+
+
+def test_upload_dir_parallel_per_file(xnatpy_mock, xnatpy_connection, tmp_path):
+    create_directory(tmp_path, {'a.dcm': b'a' * 100, 'sub/b.dcm': b'b' * 200, 'empty.txt': b''})
+    xnatpy_mock.put(RESOURCE_URI + '/files/a.dcm')
+    xnatpy_mock.put(RESOURCE_URI + '/files/sub/b.dcm')
+
+    resource = DummyResource(uri=RESOURCE_URI, xnat_session=xnatpy_connection, id_='1')
+    cleared = []
+    resource.files.clearcache = lambda: cleared.append(True)
+    result = resource.upload_dir(tmp_path, method='parallel_per_file', overwrite=True, max_workers=2)
+
+    assert sorted(x.uri for x in result.uploaded) == [RESOURCE_URI + '/files/a.dcm', RESOURCE_URI + '/files/sub/b.dcm']
+    assert result.bytes_uploaded == 300
+    assert result.failed == []
+    assert cleared == [True]
+
+    puts = [x for x in xnatpy_mock.request_history if x.method == 'PUT']
+    assert len(puts) == 2
+    assert all(x.qs['overwrite'] == ['true'] for x in puts)
+
+
+def test_upload_dir_parallel_per_file_query(xnatpy_mock, xnatpy_connection, tmp_path):
+    create_directory(tmp_path, {'a.dcm': b'a' * 100, 'sub/b.dcm': b'b' * 200})
+    xnatpy_mock.put(RESOURCE_URI + '/files/a.dcm')
+    xnatpy_mock.put(RESOURCE_URI + '/files/sub/b.dcm')
+
+    resource = DummyResource(uri=RESOURCE_URI, xnat_session=xnatpy_connection, id_='1')
+    result = resource.upload_dir(tmp_path, method='parallel_per_file', file_tags='T1', file_format='DICOM')
+    assert len(result.uploaded) == 2
+
+    # The file attributes are sent as query parameters, like the per_file method does
+    puts = [x for x in xnatpy_mock.request_history if x.method == 'PUT']
+    assert len(puts) == 2
+    assert all(x.qs['tags'] == ['t1'] and x.qs['format'] == ['dicom'] for x in puts)
+
+
+def test_upload_dir_parallel_per_file_failure(xnatpy_mock, xnatpy_connection, tmp_path):
+    xnatpy_connection.retry_policy.sleep = lambda delay: None
+    create_directory(tmp_path, {'a.dcm': b'a' * 100, 'b.dcm': b'b' * 200, 'c.dcm': b'c' * 300})
+    xnatpy_mock.put(RESOURCE_URI + '/files/a.dcm')
+    xnatpy_mock.put(RESOURCE_URI + '/files/b.dcm', status_code=500)
+    xnatpy_mock.put(RESOURCE_URI + '/files/c.dcm')
+
+    resource = DummyResource(uri=RESOURCE_URI, xnat_session=xnatpy_connection, id_='1')
+    with pytest.raises(XNATUploadError, match='b.dcm'):
+        resource.upload_dir(tmp_path, method='parallel_per_file')
+
+    # The other files are still uploaded
+    uploaded = {x.path for x in xnatpy_mock.request_history if x.method == 'PUT'}
+    assert uploaded == {RESOURCE_URI.lower() + '/files/{}.dcm'.format(x) for x in 'abc'}
+
+
+@pytest.mark.parametrize('method,remote_name', [('tar_stream', 'upload.tar'), ('tgz_stream', 'upload.tar.gz')])
+def test_upload_dir_stream(xnatpy_mock, xnatpy_connection, tmp_path, method, remote_name):
+    xnatpy_connection.retry_policy.sleep = lambda delay: None
+    files = {'a.dcm': os.urandom(3000000), 'sub/b.dcm': b'b' * 200}
+    create_directory(tmp_path, files)
+
+    bodies = []
+
+    def callback(request, context):
+        # The archive is sent as a chunked body produced by a generator
+        assert request.headers['Transfer-Encoding'] == 'chunked'
+        bodies.append(b''.join(request.body))
+        context.status_code = 500 if len(bodies) == 1 else 200
+        return ''
+
+    xnatpy_mock.put(RESOURCE_URI + '/files/' + remote_name, text=callback)
+
+    resource = DummyResource(uri=RESOURCE_URI, xnat_session=xnatpy_connection, id_='1')
+    resource.upload_dir(tmp_path, method=method, retries=2)
+
+    # The failed attempt is retried with a regenerated archive
+    assert len(bodies) == 2
+    assert bodies[0] == bodies[1]
+    assert xnatpy_mock.last_request.qs['extract'] == ['true']
+
+    with tarfile.open(fileobj=io.BytesIO(bodies[1])) as tar_file:
+        assert sorted(x.name for x in tar_file.getmembers() if x.isfile()) == sorted(files)
+        for name, content in files.items():
+            assert tar_file.extractfile(name).read() == content
+
+
+def test_upload_stream_connection_error(xnatpy_mock, xnatpy_connection):
+    xnatpy_connection.retry_policy.sleep = lambda delay: None
+    closed = []
+
+    def stream():
+        try:
+            for _ in range(10):
+                yield b'x' * 100
+        finally:
+            closed.append(True)
+
+    bodies = []
+
+    def callback(request, context):
+        if not bodies:
+            # The connection is reset while the body is being sent
+            bodies.append(next(iter(request.body)))
+            raise requests.exceptions.ConnectionError('Connection reset by peer')
+        bodies.append(b''.join(request.body))
+        return ''
+
+    uri = RESOURCE_URI + '/files/upload.bin'
+    xnatpy_mock.put(uri, text=callback)
+    xnatpy_connection.upload_stream(uri, stream, retries=2)
+
+    # The abandoned stream is closed and a regenerated stream is sent
+    assert bodies[1] == b'x' * 1000
+    assert closed == [True, True]
+
+    xnatpy_mock.put(uri, exc=requests.exceptions.ConnectTimeout)
+    # The error of the last attempt is raised
+    xnatpy_mock.reset_mock()
+    with pytest.raises(requests.exceptions.ConnectTimeout):
+        xnatpy_connection.upload_stream(uri, stream, retries=2)
+    assert xnatpy_mock.call_count == 2
+
+
+def test_generate_stream():
+    def write(fileobj):
+        for _ in range(10):
+            fileobj.write(b'x' * 300)
+
+    assert [len(x) for x in generate_stream(write, chunk_size=1000, queue_chunks=1)] == [1000, 1000, 1000]
+
+    def fail(fileobj):
+        fileobj.write(b'x' * 100)
+        raise OSError('cannot read file')
+
+    with pytest.raises(OSError, match='cannot read file'):
+        list(generate_stream(fail, chunk_size=10))
+
+    # Stopping the consumer early stops the writer
+    stream = generate_stream(lambda fileobj: fileobj.write(b'x' * 10000000), chunk_size=10, queue_chunks=1)
+    assert next(stream) == b'x' * 10
+    stream.close()
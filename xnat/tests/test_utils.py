@@ -0,0 +1,99 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import os
+
+import pytest
+
+from xnat.utils import RangeRequestsFileLike
+
+FILE_URI = '/data/experiments/XNAT_E00001/scans/1/resources/DICOM/files/1.dcm'
+
+
+def mock_range_file(xnatpy_mock, data, etag='"abc"'):
+    def callback(request, context):
+        context.headers['ETag'] = etag
+        first, last = request.headers['Range'][len('bytes='):].split('-')
+        first, last = int(first), int(last)
+        context.status_code = 206
+        context.headers['Content-Range'] = 'bytes {}-{}/{}'.format(first, last, len(data))
+        return data[first:last + 1]
+
+    xnatpy_mock.head(FILE_URI, headers={'Accept-Ranges': 'bytes', 'ETag': etag, 'Content-Length': str(len(data))})
+    xnatpy_mock.get(FILE_URI, content=callback)
+
+
+def test_range_requests_file_like(xnatpy_mock, xnatpy_connection):
+    data = os.urandom(100000)
+    mock_range_file(xnatpy_mock, data)
+
+    file_like = RangeRequestsFileLike.from_uri(xnatpy_connection, FILE_URI, block_size=1000, cache_blocks=4)
+    assert file_like.size == len(data)
+
+    assert file_like.read(10) == data[:10]
+    assert file_like.read(10) == data[10:20]
+    assert file_like.requests_sent == 1
+
+    assert file_like.seek(-50, io.SEEK_END) == len(data) - 50
+    assert file_like.read() == data[-50:]
+    assert file_like.read() == b''
+
+    # Spanning multiple blocks only requests the missing blocks, in a single request
+    file_like.seek(500)
+    assert file_like.read(3000) == data[500:3500]
+    assert file_like.requests_sent == 3
+    assert file_like.bytes_fetched == 1000 + 1000 + 3000
+
+    assert xnatpy_mock.last_request.headers['If-Range'] == '"abc"'
+    file_like.close()
+    with pytest.raises(ValueError):
+        file_like.read()
+
+
+def test_range_requests_file_like_unsupported(xnatpy_mock, xnatpy_connection):
+    xnatpy_mock.head(FILE_URI, headers={'Content-Length': '100'})
+    assert RangeRequestsFileLike.from_uri(xnatpy_connection, FILE_URI) is None
+
+    xnatpy_mock.head(FILE_URI, status_code=405)
+    assert RangeRequestsFileLike.from_uri(xnatpy_connection, FILE_URI) is None
+
+
+def test_range_requests_dicom_header(xnatpy_mock, xnatpy_connection):
+    pydicom = pytest.importorskip('pydicom')
+    from pydicom.dataset import Dataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+    dataset = Dataset()
+    dataset.file_meta = FileMetaDataset()
+    dataset.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    dataset.file_meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.4'
+    dataset.file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    dataset.preamble = bytes(128)
+    dataset.PatientName = 'Test^Patient'
+    dataset.Rows = 1000
+    dataset.Columns = 1000
+    dataset.BitsAllocated = 16
+    dataset.PixelData = bytes(2000000)
+
+    output = io.BytesIO()
+    pydicom.dcmwrite(output, dataset)
+    data = output.getvalue()
+    mock_range_file(xnatpy_mock, data)
+
+    with RangeRequestsFileLike.from_uri(xnatpy_connection, FILE_URI) as file_like:
+        header = pydicom.dcmread(file_like, stop_before_pixels=True)
+        assert header.PatientName == 'Test^Patient'
+        assert file_like.bytes_fetched < len(data) // 10
@@ -0,0 +1,112 @@
+# Copyright 2011-2015 Biomedical Imaging Group Rotterdam, Departments of
+# Medical Informatics and Radiology, Erasmus MC, Rotterdam, The Netherlands
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Upload many files concurrently. Every file is uploaded with its own request,
+the requests share the connection pool of the session so kept-alive
+connections are re-used and the latency of the requests overlaps.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from .constants import UPLOAD_WORKERS
+
+if TYPE_CHECKING:
+    from .session import BaseXNATSession
+
+# A file to upload: the local path, the uri to upload to and the size in bytes
+UploadItem = namedtuple('UploadItem', ['path', 'uri', 'size'])
+
+
+class UploadResult(object):
+    """
+    Summary of a number of uploads
+
+    :param uploaded: the items that were uploaded
+    :param failed: the items that failed with their exception
+    :param duration: the wall clock time of the uploads in seconds
+    """
+    def __init__(self,
+                 uploaded: List[UploadItem],
+                 failed: List[Tuple[UploadItem, BaseException]],
+                 duration: float):
+        self.uploaded = uploaded
+        self.failed = failed
+        self.duration = duration
+
+    def __repr__(self):
+        return '<UploadResult {} uploaded, {} failed, {:.1f} MB/s>'.format(
+            len(self.uploaded), len(self.failed), self.throughput / 1e6
+        )
+
+    @property
+    def bytes_uploaded(self) -> int:
+        return sum(x.size for x in self.uploaded)
+
+    @property
+    def throughput(self) -> float:
+        """
+        The aggregate throughput in bytes per second
+        """
+        return self.bytes_uploaded / self.duration if self.duration > 0 else 0.0
+
+
+def upload_files(xnat_session: 'BaseXNATSession',
+                 items: Iterable[UploadItem],
+                 max_workers: int = UPLOAD_WORKERS,
+                 overwrite: bool = False,
+                 query: Optional[Dict[str, str]] = None,
+                 **kwargs) -> UploadResult:
+    """
+    Upload files concurrently using a pool of threads. A failing upload does
+    not stop the other uploads.
+
+    :param xnat_session: the session to use
+    :param items: the files to upload
+    :param max_workers: the maximum number of concurrent uploads
+    :param overwrite: flag to force overwriting of files
+    :param query: extra query string content for every upload
+    :param kwargs: additional arguments for
+                   :py:meth:`BaseXNATSession.upload_file <xnat.session.BaseXNATSession.upload_file>`
+    :return: the result with the uploaded and failed files
+    """
+    items = list(items)
+    uploaded = []
+    failed = []
+    lock = threading.Lock()
+
+    def upload(item):
+        try:
+            # Every upload gets its own copy of the query, upload_stream modifies it
+            xnat_session.upload_file(item.uri, path=item.path, overwrite=overwrite,
+                                     query=dict(query) if query else None, **kwargs)
+        except Exception as exception:
+            xnat_session.logger.error('Failed to upload {}: {}'.format(item.path, exception))
+            with lock:
+                failed.append((item, exception))
+        else:
+            with lock:
+                uploaded.append(item)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='XNATpyUpload') as executor:
+        for item in items:
+            executor.submit(upload, item)
+
+    return UploadResult(uploaded=uploaded, failed=failed, duration=time.monotonic() - start)
@@ -15,12 +15,17 @@
 
 import re
 import keyword
+from collections import OrderedDict
 from functools import update_wrapper
-from io import BytesIO, BufferedIOBase, SEEK_SET, SEEK_END
+from io import BytesIO, BufferedIOBase, SEEK_SET, SEEK_CUR, SEEK_END
+from typing import Dict, Optional, Tuple
 
 import requests
 from requests.auth import AuthBase
 
+from .constants import RANGE_FILE_BLOCK_SIZE, RANGE_FILE_CACHE_BLOCKS
+from .exceptions import XNATResponseError
+
 
 class JSessionAuth(AuthBase):
     def __init__(self, jsession_id=None):
@@ -88,6 +93,22 @@ class mixedproperty:
         return type(self)(self.fcget, self.fget, self.fset, fdel)
 
 
+def normalize_uri(uri: str) -> str:
+    """
+    Normalise a REST uri, so that the different prefixes the XNAT REST API
+    accepts (``/REST/``, ``/data/archive/`` and ``/data/``) map to the same uri
+
+    :param uri: the uri to normalise
+    :return: the uri using the ``/data/`` prefix
+    """
+    if uri.startswith('/REST/'):
+        uri = uri.replace('/REST/', '/data/')
+    elif uri.startswith('/data/archive/'):
+        uri = uri.replace('/data/archive/', '/data/')
+
+    return uri
+
+
 def pythonize_class_name(name: str) -> str:
     """
     Turns string into a valid PEP8 class name, meaning camel cased
@@ -189,6 +210,207 @@ class RequestsFileLike(BufferedIOBase):
         self._request_response.close()
 
 
+def range_validator(headers: Dict[str, str]) -> Optional[str]:
+    """
+    Get the validator to send in an ``If-Range`` header, a strong ``ETag`` is
+    preferred over ``Last-Modified``; weak ETags cannot be used for ranges
+
+    :param headers: the headers of the response
+    :return: the validator or None if the response has none
+    """
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+
+    return headers.get('Last-Modified') or None
+
+
+def probe_range_support(xnat_session, uri: str) -> Optional[Tuple[int, Optional[str]]]:
+    """
+    Check with a HEAD request whether the server supports range requests for a uri
+
+    :param xnat_session: the session to use
+    :param uri: the uri of the file
+    :return: the size and validator (None if there is none) of the file, or None
+             if the server does not support ranges or rejects the HEAD request
+    """
+    try:
+        response = xnat_session.head(uri, allow_redirects=True)
+    except XNATResponseError:
+        # Some servers do not allow HEAD requests, the caller falls back to a normal download
+        return None
+
+    size = response.headers.get('Content-Length', '')
+    if response.headers.get('Accept-Ranges', '').lower() != 'bytes' or not size.isdigit():
+        return None
+
+    return int(size), range_validator(response.headers)
+
+
+class RangeRequestsFileLike(BufferedIOBase):
+    """
+    Seekable read-only file object for a remote file, backed by HTTP Range
+    requests. Data is requested in blocks which are kept in a small LRU
+    cache, so random access only transfers the parts of the file that are
+    actually read. Missing blocks that are adjacent are fetched in a single
+    request.
+
+    :param xnat_session: the session to use
+    :param uri: the uri of the file
+    :param size: the size of the file in bytes
+    :param validator: ETag or Last-Modified of the file, ensures all blocks
+                      come from the same version of the file
+    :param block_size: the size of the blocks requested
+    :param cache_blocks: the maximum number of blocks kept in the cache
+    """
+    def __init__(self,
+                 xnat_session,
+                 uri: str,
+                 size: int,
+                 validator: str = None,
+                 block_size: int = RANGE_FILE_BLOCK_SIZE,
+                 cache_blocks: int = RANGE_FILE_CACHE_BLOCKS):
+        super().__init__()
+        self._xnat_session = xnat_session
+        self._uri = uri
+        self._size = size
+        self._validator = validator
+        self._block_size = block_size
+        self._cache_blocks = cache_blocks
+        self._cache = OrderedDict()
+        self._position = 0
+        self.requests_sent = 0
+        self.bytes_fetched = 0
+
+    @classmethod
+    def from_uri(cls, xnat_session, uri: str, **kwargs):
+        """
+        Create a file object for a uri if the server supports range requests
+
+        :param xnat_session: the session to use
+        :param uri: the uri of the file
+        :param kwargs: additional arguments for the constructor
+        :return: the file object or None if the server does not support ranges
+        """
+        probe = probe_range_support(xnat_session, uri)
+        if probe is None:
+            return None
+
+        size, validator = probe
+        return cls(xnat_session, uri, size, validator=validator, **kwargs)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def fileno(self) -> int:
+        raise OSError('No fileno used for RangeRequestsFileLike')
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, position: int, whence: int = SEEK_SET) -> int:
+        if whence == SEEK_SET:
+            new_position = position
+        elif whence == SEEK_CUR:
+            new_position = self._position + position
+        elif whence == SEEK_END:
+            new_position = self._size + position
+        else:
+            raise ValueError('Invalid whence ({}, should be 0, 1 or 2)'.format(whence))
+
+        if new_position < 0:
+            raise ValueError('Negative seek position {}'.format(new_position))
+
+        self._position = new_position
+        return self._position
+
+    def _fetch(self, first_block: int, last_block: int):
+        """
+        Fetch a run of blocks in a single request
+
+        :return: dictionary with the data of each block
+        """
+        first = first_block * self._block_size
+        last = min((last_block + 1) * self._block_size, self._size) - 1
+
+        headers = {'Range': 'bytes={}-{}'.format(first, last)}
+        if self._validator is not None:
+            headers['If-Range'] = self._validator
+
+        response = self._xnat_session.get(self._uri, headers=headers, accepted_status=[200, 206])
+        self.requests_sent += 1
+
+        data = response.content
+        if response.status_code != 206 or len(data) != last - first + 1:
+            raise OSError('Server did not return bytes {}-{} of {}, the file might have changed'.format(
+                first, last, self._uri
+            ))
+        self.bytes_fetched += len(data)
+
+        return {block: data[(block - first_block) * self._block_size:(block - first_block + 1) * self._block_size]
+                for block in range(first_block, last_block + 1)}
+
+    def _get_blocks(self, first_block: int, last_block: int):
+        blocks = {}
+        missing = []
+        for block in range(first_block, last_block + 1):
+            if block in self._cache:
+                self._cache.move_to_end(block)
+                blocks[block] = self._cache[block]
+            else:
+                missing.append(block)
+
+        # Group the missing blocks in runs of adjacent blocks
+        runs = []
+        for block in missing:
+            if runs and runs[-1][1] == block - 1:
+                runs[-1][1] = block
+            else:
+                runs.append([block, block])
+
+        for run_first, run_last in runs:
+            fetched = self._fetch(run_first, run_last)
+            blocks.update(fetched)
+            self._cache.update(fetched)
+
+        while len(self._cache) > self._cache_blocks:
+            self._cache.popitem(last=False)
+
+        return blocks
+
+    def read(self, size=-1) -> bytes:
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+        start = self._position
+        end = self._size if size is None or size < 0 else min(start + size, self._size)
+        if start >= end:
+            return b''
+
+        first_block = start // self._block_size
+        last_block = (end - 1) // self._block_size
+        blocks = self._get_blocks(first_block, last_block)
+
+        data = b''.join(blocks[x] for x in range(first_block, last_block + 1))
+        offset = start - first_block * self._block_size
+        self._position = end
+        return data[offset:offset + end - start]
+
+    def read1(self, size=-1) -> bytes:
+        return self.read(size)
+
+    def close(self):
+        self._cache.clear()
+        super().close()
+
+
 def full_class_name(cls) -> str:
     module = cls.__module__
 